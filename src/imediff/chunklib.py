@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+Module chunklib -- compact storage of diff chunks
+
+Class ChunkStore:
+    A columnar list of chunks used as TextData.chunk_list.
+
+Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+from array import array
+
+import sys
+
+
+class ChunkStore:
+    """
+    Columnar list of chunks
+
+    Each chunk has a tag, 6 indexes to list_a, list_b and list_c, an action
+    and a merge buffer.  Indexes are kept in array('i') columns.  Tags and
+    actions are single ASCII characters kept in bytearray columns.  Only
+    non-empty merge buffers are kept in a dictionary keyed by chunk_index.
+
+    Indexing a ChunkStore returns the chunk as a 9-tuple:
+
+        (tag, i1, i2, j1, j2, k1, k2, action, merge_buffer)
+
+    >>> chunks = ChunkStore()
+    >>> chunks.append("E", 0, 2, 0, 2)
+    >>> chunks.append("N", 2, 3, 2, 4)
+    >>> chunks.set_action(0, "=")
+    >>> chunks.set_action(1, "d")
+    >>> len(chunks)
+    2
+    >>> chunks[1]
+    ('N', 2, 3, 2, 4, 0, 0, 'd', [])
+    >>> chunks.set_merge_buffer(1, ["edited\\n"])
+    >>> chunks.get_tag(1), chunks.get_action(1), chunks.get_merge_buffer(1)
+    ('N', 'd', ['edited\\n'])
+    >>> chunks.get_range(1)
+    (2, 3, 2, 4, 0, 0)
+    >>> chunks.get_indexes("E")
+    [1]
+    >>> chunks.count_tags()
+    {'E': 1, 'N': 1}
+    >>> chunks.count_actions("NF")
+    {'d': 1}
+    """
+
+    def __init__(self):
+        self.tags = bytearray()
+        self.i1 = array("i")
+        self.i2 = array("i")
+        self.j1 = array("i")
+        self.j2 = array("i")
+        self.k1 = array("i")
+        self.k2 = array("i")
+        self.actions = bytearray()  # 0 for no action yet
+        self.merge_buffers = dict()
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __getitem__(self, chunk_index):
+        return (
+            chr(self.tags[chunk_index]),
+            self.i1[chunk_index],
+            self.i2[chunk_index],
+            self.j1[chunk_index],
+            self.j2[chunk_index],
+            self.k1[chunk_index],
+            self.k2[chunk_index],
+            self.get_action(chunk_index),
+            self.get_merge_buffer(chunk_index),
+        )
+
+    def __iter__(self):
+        for chunk_index in range(len(self.tags)):
+            yield self[chunk_index]
+
+    def append(self, tag, i1, i2, j1, j2, k1=0, k2=0):
+        """Append a chunk without action nor merge buffer"""
+        self.tags.append(ord(tag))
+        self.i1.append(i1)
+        self.i2.append(i2)
+        self.j1.append(j1)
+        self.j2.append(j2)
+        self.k1.append(k1)
+        self.k2.append(k2)
+        self.actions.append(0)
+
+    def get_tag(self, chunk_index):
+        return chr(self.tags[chunk_index])
+
+    def set_tag(self, chunk_index, tag):
+        self.tags[chunk_index] = ord(tag)
+
+    def get_range(self, chunk_index):
+        """Return (i1, i2, j1, j2, k1, k2) of a chunk"""
+        return (
+            self.i1[chunk_index],
+            self.i2[chunk_index],
+            self.j1[chunk_index],
+            self.j2[chunk_index],
+            self.k1[chunk_index],
+            self.k2[chunk_index],
+        )
+
+    def get_action(self, chunk_index):
+        action = self.actions[chunk_index]
+        if action == 0:
+            return ""
+        return chr(action)
+
+    def set_action(self, chunk_index, action):
+        if action == "":
+            self.actions[chunk_index] = 0
+        else:
+            self.actions[chunk_index] = ord(action)
+
+    def get_merge_buffer(self, chunk_index):
+        return self.merge_buffers.get(chunk_index, [])
+
+    def set_merge_buffer(self, chunk_index, merge_buffer):
+        if len(merge_buffer) == 0:
+            self.merge_buffers.pop(chunk_index, None)
+        else:
+            self.merge_buffers[chunk_index] = merge_buffer
+
+    def get_indexes(self, tags_excluded):
+        """Return list of chunk_index of chunks with tag not in tags_excluded"""
+        codes = tags_excluded.encode()
+        return [
+            chunk_index for chunk_index, tag in enumerate(self.tags) if tag not in codes
+        ]
+
+    def count_tags(self):
+        """Return dictionary of the number of chunks for each tag"""
+        return {chr(tag): self.tags.count(tag) for tag in sorted(set(self.tags))}
+
+    def count_actions(self, tags):
+        """Return dictionary of the number of chunks for each action of
+        chunks with tag in tags"""
+        codes = tags.encode()
+        counts = dict()
+        for tag, action in zip(self.tags, self.actions):
+            if tag in codes:
+                counts[action] = counts.get(action, 0) + 1
+        return {
+            ("" if action == 0 else chr(action)): count
+            for action, count in sorted(counts.items())
+        }
+
+
+if __name__ == "__main__":
+    import doctest
+
+    flags = doctest.REPORT_NDIFF | doctest.FAIL_FAST
+    fail, total = doctest.testmod(optionflags=flags)
+    print("{} failures out of {} tests -- ".format(fail, total), end="")
+    if fail == 0:
+        sys.exit(0)
+    else:
+        sys.exit(1)
@@ -25,10 +25,13 @@ Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301, USA.
 """
 
-from difflib import SequenceMatcher
-from imediff.utils import read_lines, write_file
+from imediff.utils import read_lines, run_parallel, write_lines
+from imediff.chunklib import ChunkStore
+from imediff.filelib import LineStore
 from imediff.lines2lib import LineMatcher
 from imediff.diff3lib import SequenceMatcher3
+from imediff.wordlib import WDIFF_MODES, wdiff2_opcodes, wdiff3_opcodes
+from bisect import bisect_left
 
 import tempfile
 import os
@@ -39,6 +42,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# maximum number of unchanged lines in a list slice written at once
+WRITE_BLOCK_LINES = 4096
+
 
 class TextData:  # Non-TUI data
     """
@@ -67,6 +73,10 @@ class TextData:  # Non-TUI data
           "args.diff_mode == 3"
         cases to ease common handling of them under TUI.
 
+        self.chunk_list is a ChunkStore keeping each field in a compact
+        column.  It is updated field by field with its set_action(),
+        set_tag() and set_merge_buffer() methods.  Its item is read as:
+
             self.chunk_list[chunk_index] = (
                 tag,             # diff opcode tag EeNACn / ENF
                 i1,              # self.list_a (start)-index
@@ -82,6 +92,9 @@ class TextData:  # Non-TUI data
         Internally, tag is extended to add 'n' which is 1-line clean wdiff3 merge.
         Merge result is automatically stored in merge_buffer.
 
+        Contiguous exactly matching lines are coalesced into a single range
+        chunk with tag == 'E', so i2 - i1 of such chunk can be larger than 1.
+
             self.usr_chunk_list: list of user accessible chunk_index
 
             content = list of strings
@@ -97,6 +110,8 @@ class TextData:  # Non-TUI data
         self.list_c = list_c
         self.init_args(args)
         self.init_config(confs)
+        self.wdiff_cache = dict()  # chunk_index -> (chunk_range, get_wdiff())
+        self.defer_reindex = False  # True while set_action_all() runs
         self.init_chunk_list()
         logger.debug("finished initialization")
         return
@@ -113,6 +128,10 @@ class TextData:  # Non-TUI data
         self.line_min = args.line_min
         self.line_max = args.line_max
         self.line_factor = args.line_factor
+        self.engine = args.engine
+        self.jobs = args.jobs
+        self.partition = args.partition
+        self.fuzzy = args.fuzzy
         self.edit_cmd = args.edit_cmd
         self.macro = args.macro
         self.default_action = args.default_action  # 2: abdf / 3:abcdfg
@@ -135,79 +154,54 @@ class TextData:  # Non-TUI data
         self.ws1 = confs["word_separator"]["ws1"]
         self.ws2 = confs["word_separator"]["ws2"]
         self.ws3 = confs["word_separator"]["ws3"]
-        # set up command key translation table
-        # kc converts actual input command keyname to default key bindings command keyname
-        # This affects terminal input only (MACRO uses system key map only)
-        self.kc = dict()  # customized key code to original key code
-        self.rkc = dict()  # original key chr to customized key char
-        for select_key, effective_key in confs["key"].items():
-            if select_key[:7] == "select_":
-                typed_key = select_key[7:]
-            else:
-                logger.error("E: unknown select_key: {}".format(select_key))
-                sys.exit(2)
-            if typed_key == "":
-                typed_key = " "
-            if len(typed_key) > 1:
-                typed_key = typed_key.upper()
-            if effective_key == "":
-                effective_key = " "
-            self.kc[typed_key] = effective_key
-            self.rkc[effective_key] = typed_key
-            if (
-                len(typed_key) == 1
-                and len(effective_key) == 1
-                and ord(typed_key) >= ord("a")
-                and ord(typed_key) <= ord("z")
-                and ord(effective_key) >= ord("a")
-                and ord(effective_key) <= ord("z")
-            ):
-                cap_typed_key = typed_key.upper()
-                cap_effective_key = effective_key.upper()
-                self.kc[cap_typed_key] = cap_effective_key
-                self.rkc[cap_effective_key] = cap_typed_key
-        # Enable debug output of key remapping
-        # for key, value in self.kc.items():
-        #     logger.debug("kc['{}']='{}'".format(key, value))
-        # for key, value in self.rkc.items():
-        #     logger.debug("** rkc['{}']='{}'".format(key, value))
+        # older configuration files lack wdiff_mode
+        self.wdiff_mode = confs["config"].get("wdiff_mode", "char")
+        if self.wdiff_mode not in WDIFF_MODES:
+            logger.error(
+                "E: wdiff_mode should be one of %s but %s",
+                WDIFF_MODES,
+                self.wdiff_mode,
+            )
+            sys.exit(2)
+        # command key translation tables compiled by initialize_confs()
+        self.kc = confs.kc  # customized key code to original key code
+        self.rkc = confs.rkc  # original key chr to customized key char
 
     def init_chunk_list(self):
         # update self.chunk_list and self.usr_chunk_list
+        debug = logger.isEnabledFor(logging.DEBUG)
         if self.diff_mode == 2:
-            matcher_internal = LineMatcher(self.list_a, self.list_b)
-            chunk_list_internal = matcher_internal.get_opcodes()
+            matcher_internal = LineMatcher(
+                self.list_a,
+                self.list_b,
+                coalesce=True,
+                engine=self.engine,
+                jobs=self.jobs,
+                partition=self.partition,
+                fuzzy=self.fuzzy,
+            )
+            chunk_list_internal = matcher_internal.iter_opcodes()
             # Set initial action to "a" or "d"
-            self.chunk_list = [
-                (
+            self.chunk_list = ChunkStore()
+            for tag, i1, i2, j1, j2 in chunk_list_internal:
+                self.chunk_list.append(tag, i1, i2, j1, j2)
+            # This set to "d"
+            for chunk_index in range(len(self.chunk_list)):
+                self.set_action(chunk_index, self.default_action)
+            if debug:
+                for chunk_index, (
                     tag,
                     i1,
                     i2,
                     j1,
                     j2,
-                    0,  # dummy
-                    0,  # dummy
-                    "",  # dummy
-                    [],
-                )  # chunk_list item tuple (9 param)
-                for (tag, i1, i2, j1, j2) in chunk_list_internal
-            ]
-            # This set to "d"
-            for chunk_index in range(len(self.chunk_list)):
-                self.set_action(chunk_index, self.default_action)
-            for chunk_index, (
-                tag,
-                i1,
-                i2,
-                j1,
-                j2,
-                _,
-                _,
-                action,
-                merge_buffer,
-            ) in enumerate(self.chunk_list):
-                logger.debug(
-                    "chunk[{}]: tag={} === a[{}:{}], b[{}:{}] === action='{}' len(merge_buffer)={}".format(
+                    _,
+                    _,
+                    action,
+                    merge_buffer,
+                ) in enumerate(self.chunk_list):
+                    logger.debug(
+                        "chunk[%s]: tag=%s === a[%s:%s], b[%s:%s] === action='%s' len(merge_buffer)=%s",
                         chunk_index,
                         tag,
                         i1,
@@ -217,7 +211,6 @@ class TextData:  # Non-TUI data
                         action,
                         len(merge_buffer),
                     )
-                )
         else:  # self.diff_mode == 3
             if self.default_action in ["a", "b", "c"]:
                 check_same_ac = False
@@ -236,11 +229,24 @@ class TextData:  # Non-TUI data
                 1,  # final   length to compare (lower limit)
                 8,  # length shortening factor
                 check_same_ac,  # check a vs c for tag == 'e'
+                True,  # coalesce contiguous 'E' lines into a range chunk
+                self.engine,  # diff2 engine for line matching
+                self.jobs,  # number of processes for line matching
+                self.partition,  # partition large inputs at anchor lines
+                self.fuzzy,  # fuzzy line matching mode
             )
-            chunk_list_internal = matcher_internal.get_opcodes()
+            chunk_list_internal = matcher_internal.iter_opcodes()
             # Set initial action to "a" or "d"
-            self.chunk_list = [
-                (
+            self.chunk_list = ChunkStore()
+            for tag, i1, i2, j1, j2, k1, k2 in chunk_list_internal:
+                self.chunk_list.append(tag, i1, i2, j1, j2, k1, k2)
+            # This set to "g"
+            if self.default_action in ["f", "g"]:
+                self.precompute_merge_wdiff3(range(len(self.chunk_list)))
+            for chunk_index in range(len(self.chunk_list)):
+                self.set_action(chunk_index, self.default_action)
+            if debug:
+                for chunk_index, (
                     tag,
                     i1,
                     i2,
@@ -248,27 +254,11 @@ class TextData:  # Non-TUI data
                     j2,
                     k1,
                     k2,
-                    "",  # dummy
-                    [],
-                )  # chunk_list item tuple (9 param)
-                for (tag, i1, i2, j1, j2, k1, k2) in chunk_list_internal
-            ]
-            # This set to "g"
-            for chunk_index in range(len(self.chunk_list)):
-                self.set_action(chunk_index, self.default_action)
-            for chunk_index, (
-                tag,
-                i1,
-                i2,
-                j1,
-                j2,
-                k1,
-                k2,
-                action,
-                merge_buffer,
-            ) in enumerate(self.chunk_list):
-                logger.debug(
-                    "chunk[{}]: tag={} === a[{}:{}], b[{}:{}], c[{}:{}] === action='{}' len(merge_buffer)={}".format(
+                    action,
+                    merge_buffer,
+                ) in enumerate(self.chunk_list):
+                    logger.debug(
+                        "chunk[%s]: tag=%s === a[%s:%s], b[%s:%s], c[%s:%s] === action='%s' len(merge_buffer)=%s",
                         chunk_index,
                         tag,
                         i1,
@@ -280,51 +270,20 @@ class TextData:  # Non-TUI data
                         action,
                         len(merge_buffer),
                     )
-                )
         if self.diff_mode == 2:
-            self.usr_chunk_list = [
-                chunk_index
-                for chunk_index, (
-                    tag,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                ) in enumerate(self.chunk_list)
-                if tag != "E"
-            ]
+            self.usr_chunk_list = self.chunk_list.get_indexes("E")
         else:  # diff_mode == 3
             if self.default_action in ["a", "b", "c"]:
-                tag_resolved = ["E"]
+                tag_resolved = "E"
             else:
-                tag_resolved = ["E", "e", "n", "A", "C"]
-            self.usr_chunk_list = [
-                chunk_index
-                for chunk_index, (
-                    tag,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                ) in enumerate(self.chunk_list)
-                if tag not in tag_resolved
-            ]
+                tag_resolved = "EenAC"
+            self.usr_chunk_list = self.chunk_list.get_indexes(tag_resolved)
         # debug
         for usr_chunk_index, chunk_index in enumerate(self.usr_chunk_list):
-            logger.debug(
-                "usr_chunk_index={} --> chunk[{}]".format(
-                    usr_chunk_index,
-                    chunk_index,
+            if debug:
+                logger.debug(
+                    "usr_chunk_index=%s --> chunk[%s]", usr_chunk_index, chunk_index
                 )
-            )
         if len(self.usr_chunk_list) == 0:
             self.focused_usr_chunk_index = None
         else:
@@ -338,17 +297,17 @@ class TextData:  # Non-TUI data
     ####################################################################
     def main(self):  # overridden for TUI by subclassing
         """Non-interactive driven by MACRO"""
-        logger.debug("start with macro = '{}'".format(self.macro))
+        logger.debug("start with macro = '%s'", self.macro)
         # data update flag
         chunk_index = 0
         while True:
             ch = self.get_macro_command()
-            logger.debug("macro ='{}' >> ch='{}')".format(self.macro, ch))
+            logger.debug("macro ='%s' >> ch='%s')", self.macro, ch)
             if ch in ["QUIT", "q"]:
                 # No prompt for CLI
                 break
             elif ch in ["w", "x"] or len(self.macro) == 0:
-                write_file(self.file_o, self.get_string_from_content_for_file())
+                write_lines(self.file_o, self.iter_content_for_file())
                 break
             else:
                 # get user accessible chunk
@@ -357,9 +316,10 @@ class TextData:  # Non-TUI data
                     self.focused_usr_chunk_index
                 )
                 logger.debug(
-                    "usr_chunk_index = {}, chunk_index = {}, ch='{}'".format(
-                        self.focused_usr_chunk_index, chunk_index, ch
-                    ),
+                    "usr_chunk_index = %s, chunk_index = %s, ch='%s'",
+                    self.focused_usr_chunk_index,
+                    chunk_index,
+                    ch,
                 )
                 if ch in ["a", "b", "c", "d", "e", "f", "g"]:
                     self.set_action(chunk_index, ch)
@@ -399,16 +359,13 @@ class TextData:  # Non-TUI data
     # Internally used utility methods (class data get-access)
     ####################################################################
     def get_tag(self, chunk_index):
-        (tag, _, _, _, _, _, _, _, _) = self.chunk_list[chunk_index]
-        return tag
+        return self.chunk_list.get_tag(chunk_index)
 
     def get_action(self, chunk_index):
-        (_, _, _, _, _, _, _, action, _) = self.chunk_list[chunk_index]
-        return action
+        return self.chunk_list.get_action(chunk_index)
 
     def get_merge_buffer(self, chunk_index):
-        (_, _, _, _, _, _, _, _, merge_buffer) = self.chunk_list[chunk_index]
-        return merge_buffer
+        return self.chunk_list.get_merge_buffer(chunk_index)
 
     def get_content_for_chunk(self, chunk_index):
         """Return content as string based on action"""
@@ -427,9 +384,17 @@ class TextData:  # Non-TUI data
             chunk_index
         ]  # chunk_list item tuple (9 param)
         logger.debug(
-            "chunk[{}]: tag={} a[{}:{}]/b[{}:{}]/c[{}:{}] action='{}' len(merge_buffer)={}".format(
-                chunk_index, tag, i1, i2, j1, j2, k1, k2, action, len(merge_buffer)
-            ),
+            "chunk[%s]: tag=%s a[%s:%s]/b[%s:%s]/c[%s:%s] action='%s' len(merge_buffer)=%s",
+            chunk_index,
+            tag,
+            i1,
+            i2,
+            j1,
+            j2,
+            k1,
+            k2,
+            action,
+            len(merge_buffer),
         )
         if action == "=" or action == "#":
             content = self.list_a[i1:i2]
@@ -446,9 +411,9 @@ class TextData:  # Non-TUI data
                 content = merge_buffer
             else:
                 logger.error(
-                    "chunk[{}]: Bad action='{}' with missing edited merge_buffer".format(
-                        chunk_index, action
-                    )
+                    "chunk[%s]: Bad action='%s' with missing edited merge_buffer",
+                    chunk_index,
+                    action,
                 )
                 sys.exit(2)
         elif action == "f" and self.diff_mode == 2 and i2 - i1 == 1 and j2 - j1 == 1:
@@ -462,9 +427,7 @@ class TextData:  # Non-TUI data
         ):  # wdiff
             (clean_merge, content) = self.get_merge_wdiff3(chunk_index)
             if clean_merge:
-                logger.error(
-                    "chunk[{}]: Bad action='f' for clean_merge".format(chunk_index)
-                )
+                logger.error("chunk[%s]: Bad action='f' for clean_merge", chunk_index)
                 sys.exit(2)
         elif (
             action == "g"
@@ -475,25 +438,22 @@ class TextData:  # Non-TUI data
         ):
             (clean_merge, content) = self.get_merge_wdiff3(chunk_index)
             if not clean_merge:
-                logger.error(
-                    "chunk[{}]: Bad action='g' for unclean_merge".format(chunk_index)
-                )
+                logger.error("chunk[%s]: Bad action='g' for unclean_merge", chunk_index)
                 sys.exit(2)
             if len(merge_buffer) != 0:
                 content = merge_buffer
             else:
                 logger.error(
-                    "chunk[{}]: Bad action='g' with missing pre-loaded merge_buffer".format(
-                        chunk_index
-                    )
+                    "chunk[%s]: Bad action='g' with missing pre-loaded merge_buffer",
+                    chunk_index,
                 )
                 sys.exit(2)
         else:
-            logger.error("chunk[{}]: Bad action='{}'".format(chunk_index, action))
+            logger.error("chunk[%s]: Bad action='%s'", chunk_index, action)
             sys.exit(2)
         # content is at least [] (at least empty list)
         if content is None:
-            logger.error("chunk[{}]: content can't be None".format(chunk_index))
+            logger.error("chunk[%s]: content can't be None", chunk_index)
             sys.exit(2)
         return content
 
@@ -501,21 +461,15 @@ class TextData:  # Non-TUI data
         if usr_chunk_index is None:
             chunk_index = None
         elif usr_chunk_index < 0:
-            logger.debug(
-                "underflow usr_chunk_index={}".format(usr_chunk_index),
-            )
+            logger.debug("underflow usr_chunk_index=%s", usr_chunk_index)
             chunk_index = None
         elif usr_chunk_index >= len(self.usr_chunk_list):
-            logger.debug(
-                "overflow usr_chunk_index={}".format(usr_chunk_index),
-            )
+            logger.debug("overflow usr_chunk_index=%s", usr_chunk_index)
             chunk_index = None
         elif len(self.usr_chunk_list) != 0:
             chunk_index = self.usr_chunk_list[usr_chunk_index]
             logger.debug(
-                "usr_chunk_index={} >> chunk_index={}".format(
-                    usr_chunk_index, chunk_index
-                ),
+                "usr_chunk_index=%s >> chunk_index=%s", usr_chunk_index, chunk_index
             )
         else:
             chunk_index = None
@@ -550,16 +504,52 @@ class TextData:  # Non-TUI data
                     self.macro = self.macro[1 + pos :]
         if keyname == "":  # interactive
             keyname = "QUIT"  # quit w/o saving for ^C
-        logger.debug("key={}".format(keyname))
+        logger.debug("key=%s", keyname)
         return keyname
 
-    def get_string_from_content_for_file(self):
-        """Return output of all content"""
-        output = ""
+    def iter_content_for_file(self):
+        """Yield output of all content as lists of lines
+
+        Lines taken unchanged from list_a, list_b or list_c are yielded in
+        slices of up to WRITE_BLOCK_LINES lines to avoid copying large ranges.
+        For a LineStore, they are yielded as raw bytes without decoding.
+        """
         for chunk_index in range(len(self.chunk_list)):
-            content = self.get_content_for_chunk(chunk_index)
-            output += "".join(content)
-        return output
+            action = self.chunk_list.get_action(chunk_index)
+            (i1, i2, j1, j2, k1, k2) = self.chunk_list.get_range(chunk_index)
+            if action in ["=", "#", "a", "A"]:
+                (lines, x1, x2) = (self.list_a, i1, i2)
+            elif action in ["b", "B"]:
+                (lines, x1, x2) = (self.list_b, j1, j2)
+            elif action in ["c", "C"]:
+                (lines, x1, x2) = (self.list_c, k1, k2)
+            else:
+                yield self.get_content_for_chunk(chunk_index)
+                continue
+            if isinstance(lines, LineStore):
+                yield lines.get_raw(x1, x2)
+                continue
+            for x in range(x1, x2, WRITE_BLOCK_LINES):
+                yield lines[x : min(x + WRITE_BLOCK_LINES, x2)]
+
+    def iter_split_content(self):
+        """Yield output of all content split into hunks
+
+        All user accessible chunks are set to action 'a' and then set to
+        action 'b' one by one from the top.  After each of them, the output
+        of all content is yielded as iter_content_for_file() of lists of
+        lines.  It reads the current actions lazily, so consume it before
+        resuming this generator.  For 2 files, the last one is the same as
+        list_b.
+
+        This computes the diff only once for the same result as running
+        "--macro Abw" repeatedly until the output is the same as list_b.
+        """
+        usr_chunk_list = list(self.usr_chunk_list)
+        self.set_action_all("a")
+        for chunk_index in usr_chunk_list:
+            self.set_action(chunk_index, "b")
+            yield self.iter_content_for_file()
 
     ####################################################################
     # Internally used utility methods (class data merge get operation)
@@ -580,9 +570,17 @@ class TextData:  # Non-TUI data
             chunk_index
         ]  # chunk_list item tuple (9 param)
         logger.debug(
-            "chunk[{}]: tag={} a[{}:{}]/b[{}:{}]/c[{}:{}] action='{}' len(merge_buffer)={}".format(
-                chunk_index, tag, i1, i2, j1, j2, k1, k2, action, merge_buffer
-            ),
+            "chunk[%s]: tag=%s a[%s:%s]/b[%s:%s]/c[%s:%s] action='%s' len(merge_buffer)=%s",
+            chunk_index,
+            tag,
+            i1,
+            i2,
+            j1,
+            j2,
+            k1,
+            k2,
+            action,
+            merge_buffer,
         )
         # mark up for diff display
         content = list()
@@ -603,6 +601,22 @@ class TextData:  # Non-TUI data
     def whitespace_is_junk(self, c):
         return c in " \t"
 
+    def get_wdiff2_opcodes(self, line_a, line_b):
+        """Return opcodes for wdiff of 2 lines"""
+        if self.isjunk:
+            isjunk = None
+        else:
+            isjunk = self.whitespace_is_junk
+        return wdiff2_opcodes(line_a, line_b, self.wdiff_mode, isjunk)
+
+    def get_wdiff3_opcodes(self, line_a, line_b, line_c):
+        """Return opcodes for wdiff of 3 lines"""
+        if self.isjunk:
+            isjunk = None
+        else:
+            isjunk = self.whitespace_is_junk
+        return wdiff3_opcodes(line_a, line_b, line_c, self.wdiff_mode, isjunk)
+
     def get_merge_wdiff2(self, chunk_index):
         """Return content for wdiff by line (2 files)"""
         (
@@ -620,37 +634,30 @@ class TextData:  # Non-TUI data
         ]  # chunk_list item tuple (9 param)
         if i2 - i1 != 1 or j2 - j1 != 1:
             logger.error(
-                "chunk[{}]: tag={} a[{}:{}]/b[{}:{}] not for wdiff2".format(
-                    chunk_index, tag, i1, i2, j1, j2
-                ),
+                "chunk[%s]: tag=%s a[%s:%s]/b[%s:%s] not for wdiff2",
+                chunk_index,
+                tag,
+                i1,
+                i2,
+                j1,
+                j2,
             )
             sys.exit(2)
         logger.debug(
-            "chunk[{}]: tag={} === a[{}:{}]/b[{}:{}]/_[{}:{}] action='{}' len(merge_buffer)={}".format(
-                chunk_index, tag, i1, i2, j1, j2, k1, k2, action, len(merge_buffer)
-            ),
+            "chunk[%s]: tag=%s === a[%s:%s]/b[%s:%s]/_[%s:%s] action='%s' len(merge_buffer)=%s",
+            chunk_index,
+            tag,
+            i1,
+            i2,
+            j1,
+            j2,
+            k1,
+            k2,
+            action,
+            len(merge_buffer),
         )
-        line_a = self.list_a[i1]
-        line_b = self.list_b[j1]
-        if self.isjunk:
-            isjunk = None
-        else:
-            isjunk = self.whitespace_is_junk
-        matcher_internal = SequenceMatcher(isjunk, line_a, line_b, False)
-        chunk_list_internal = matcher_internal.get_opcodes()
-        line_string = ""
-        for tag, i1, i2, j1, j2 in chunk_list_internal:
-            if tag == "equal":
-                line_string += line_a[i1:i2]
-            else:  # other tags (mark up with word separator)
-                line_string += self.ws0
-                line_string += line_a[i1:i2]
-                line_string += self.ws1
-                line_string += line_b[j1:j2]
-                line_string += self.ws3
-        del chunk_list_internal
-        del matcher_internal
-        return [line_string]
+        (_, content, _) = self.get_wdiff(chunk_index)
+        return content
 
     def get_merge_wdiff3(self, chunk_index):
         """Return content for wdiff by line (3 files)"""
@@ -669,43 +676,102 @@ class TextData:  # Non-TUI data
         ]  # chunk_list item tuple (9 param)
         if i2 - i1 != 1 or j2 - j1 != 1 or k2 - k1 != 1:
             logger.error(
-                "chunk[{}]: tag={} === a[{}:{}]/b[{}:{}]/c[{}:{}] not for wdiff3".format(
-                    chunk_index, tag, i1, i2, j1, j2, k1, k2
-                ),
+                "chunk[%s]: tag=%s === a[%s:%s]/b[%s:%s]/c[%s:%s] not for wdiff3",
+                chunk_index,
+                tag,
+                i1,
+                i2,
+                j1,
+                j2,
+                k1,
+                k2,
             )
             sys.exit(2)
         logger.debug(
-            "chunk[{}]: tag={} a[{}:{}]/b[{}:{}]/c[{}:{}] action='{}' wdiff3-merge-try".format(
-                chunk_index, tag, i1, i2, j1, j2, k1, k2, action
-            ),
+            "chunk[%s]: tag=%s a[%s:%s]/b[%s:%s]/c[%s:%s] action='%s' wdiff3-merge-try",
+            chunk_index,
+            tag,
+            i1,
+            i2,
+            j1,
+            j2,
+            k1,
+            k2,
+            action,
+        )
+        (clean_merge, content, _) = self.get_wdiff(chunk_index)
+        logger.debug(
+            "chunk[%s]: clean_merge=%s === tag=%s a[%s:%s]/b[%s:%s]/c[%s:%s] action='%s'",
+            chunk_index,
+            clean_merge,
+            tag,
+            i1,
+            i2,
+            j1,
+            j2,
+            k1,
+            k2,
+            action,
         )
+        return (clean_merge, content)
+
+    def get_wdiff(self, chunk_index):
+        """Return (clean_merge, content, segments) of wdiff for a 1-line chunk
+
+        content is the merged line as a list for get_merge_wdiff2() and
+        get_merge_wdiff3(), and segments is the list of (text, attribute
+        name) to display it.  They are cached per chunk_index and computed
+        again only when the range of the chunk changes.
+        """
+        chunk_range = self.chunk_list.get_range(chunk_index)
+        cached = self.wdiff_cache.get(chunk_index)
+        if cached is not None and cached[0] == chunk_range:
+            return cached[1]
+        if self.diff_mode == 2:
+            wdiff = self.compute_wdiff2(chunk_range)
+        else:
+            wdiff = self.compute_wdiff3(chunk_range)
+        self.wdiff_cache[chunk_index] = (chunk_range, wdiff)
+        return wdiff
+
+    def compute_wdiff2(self, chunk_range):
+        """Return (clean_merge, content, segments) of wdiff2 for chunk_range"""
+        (i1, _, j1, _, _, _) = chunk_range
+        line_a = self.list_a[i1]
+        line_b = self.list_b[j1]
+        line_string = ""
+        segments = []
+        clean_merge = True
+        for tag, i1, i2, j1, j2 in self.get_wdiff2_opcodes(line_a, line_b):
+            if tag == "equal":
+                line_string += line_a[i1:i2]
+                segments.append((line_a[i1:i2], "color_wdiff_ab"))
+            else:  # other tags (mark up with word separator)
+                clean_merge = False
+                line_string += self.ws0
+                line_string += line_a[i1:i2]
+                line_string += self.ws1
+                line_string += line_b[j1:j2]
+                line_string += self.ws3
+                segments.append((self.ws0, "color_wdiff_marker"))
+                segments.append((line_a[i1:i2], "color_a"))
+                segments.append((self.ws1, "color_wdiff_marker"))
+                segments.append((line_b[j1:j2], "color_b2"))
+                segments.append((self.ws3, "color_wdiff_marker"))
+        return (clean_merge, [line_string], segments)
+
+    def compute_wdiff3(self, chunk_range):
+        """Return (clean_merge, content, segments) of wdiff3 for chunk_range"""
+        (i1, _, j1, _, k1, _) = chunk_range
         line_a = self.list_a[i1]
         line_b = self.list_b[j1]
         line_c = self.list_c[k1]
-        if self.isjunk:
-            isjunk = None
-        else:
-            isjunk = self.whitespace_is_junk
-        # wdiff uses SequenceMatcher
-        use_SequenceMatcher = 0
-        matcher_internal = SequenceMatcher3(
-            line_a,
-            line_b,
-            line_c,
-            use_SequenceMatcher,  # matcher
-            isjunk,  #  isjunk
-            True,  # autojunk
-            2,  # line_rule (NOT USED)
-            128,  # initial length to compare (upper limit) (NOT USED)
-            1,  # final   length to compare (lower limit) (NOT USED)
-            8,  # length shortening factor (NOT USED)
-            True,  # check a vs. c foe tag == 'e' (NOT USED)
-        )
-        chunk_list_internal = matcher_internal.get_opcodes()
-        # logger.debug("wdiff3: \nwchunk_list_internal >>>>> {}".format(wchunk_list_internal))
         line_string = ""
+        segments = []
         clean_merge = True
-        for tag, i1, i2, j1, j2, k1, k2 in chunk_list_internal:
+        for tag, i1, i2, j1, j2, k1, k2 in self.get_wdiff3_opcodes(
+            line_a, line_b, line_c
+        ):
             if tag == "E" or tag == "e" or tag == "A":
                 line_string += line_a[i1:i2]
             elif tag == "C":
@@ -719,14 +785,59 @@ class TextData:  # Non-TUI data
                 line_string += self.ws2
                 line_string += line_c[k1:k2]
                 line_string += self.ws3
-        del matcher_internal
-        del chunk_list_internal
-        logger.debug(
-            "chunk[{}]: clean_merge={} === tag={} a[{}:{}]/b[{}:{}]/c[{}:{}] action='{}'".format(
-                chunk_index, clean_merge, tag, i1, i2, j1, j2, k1, k2, action
-            ),
-        )
-        return (clean_merge, [line_string])
+            if tag == "A":
+                segments.append((line_a[i1:i2], "color_a"))
+            elif tag == "C":
+                segments.append((line_c[k1:k2], "color_c"))
+            elif tag == "E":
+                segments.append((line_c[k1:k2], "color_wdiff_abc"))
+            elif tag == "e":
+                segments.append((line_c[k1:k2], "color_wdiff_ac"))
+            else:  # tag == "N"
+                segments.append((self.ws0, "color_wdiff_marker"))
+                segments.append((line_a[i1:i2], "color_a"))
+                segments.append((self.ws1, "color_wdiff_marker"))
+                segments.append((line_b[j1:j2], "color_b3"))
+                segments.append((self.ws2, "color_wdiff_marker"))
+                segments.append((line_c[k1:k2], "color_c"))
+                segments.append((self.ws3, "color_wdiff_marker"))
+        return (clean_merge, [line_string], segments)
+
+    def compute_wdiff3_batch(self, chunk_ranges):
+        """Return list of compute_wdiff3() for chunk_ranges"""
+        return [self.compute_wdiff3(chunk_range) for chunk_range in chunk_ranges]
+
+    def precompute_merge_wdiff3(self, chunk_indexes):
+        """Compute get_wdiff() of 1-line 'N' chunks in chunk_indexes in up to
+        self.jobs processes for set_action() to use"""
+        if self.jobs < 2:
+            return
+        candidates = []
+        for chunk_index in chunk_indexes:
+            i1, i2, j1, j2, k1, k2 = self.chunk_list.get_range(chunk_index)
+            if (
+                self.chunk_list.get_tag(chunk_index) == "N"
+                and i2 - i1 == 1
+                and j2 - j1 == 1
+                and k2 - k1 == 1
+                and chunk_index not in self.wdiff_cache
+            ):
+                candidates.append(chunk_index)
+        batches = [candidates[n :: self.jobs] for n in range(self.jobs)]
+        batches = [batch for batch in batches if batch]
+        tasks = [
+            (
+                self.compute_wdiff3_batch,
+                ([self.chunk_list.get_range(chunk_index) for chunk_index in batch],),
+            )
+            for batch in batches
+        ]
+        for batch, wdiffs in zip(batches, run_parallel(tasks, self.jobs)):
+            for chunk_index, wdiff in zip(batch, wdiffs):
+                chunk_range = self.chunk_list.get_range(chunk_index)
+                self.wdiff_cache[chunk_index] = (chunk_range, wdiff)
+        logger.debug("precomputed %s wdiff3 merges", len(candidates))
+        return
 
     ####################################################################
     # Internally used utility methods (class data set-access)
@@ -735,19 +846,10 @@ class TextData:  # Non-TUI data
     # action request:         (g/f)  a b c d e f g    m/M   (user input)
     # action:         = # A C  E     a b c d e f
     def set_action(self, chunk_index, action_request):
-        (
-            tag,
-            i1,
-            i2,
-            j1,
-            j2,
-            k1,
-            k2,
-            action_old,
-            merge_buffer,
-        ) = self.chunk_list[
-            chunk_index
-        ]  # chunk_list item tuple (9 param)
+        tag = self.chunk_list.get_tag(chunk_index)
+        (i1, i2, j1, j2, k1, k2) = self.chunk_list.get_range(chunk_index)
+        action_old = self.chunk_list.get_action(chunk_index)
+        merge_buffer = self.chunk_list.get_merge_buffer(chunk_index)
         if self.diff_mode == 2:
             # for 2 file merge/pick
             #   incoming tag is E or N or F
@@ -768,24 +870,22 @@ class TextData:  # Non-TUI data
                 action = "e"
             elif action_request == "e" and len(merge_buffer) == 0:
                 logger.warning(
-                    "chunk[{}]: diff_mode={} action_request='{}' len(merge_buffer)={} --> keep action_old='{}'".format(
-                        chunk_index,
-                        self.diff_mode,
-                        action_request,
-                        len(merge_buffer),
-                        action_old,
-                    ),
+                    "chunk[%s]: diff_mode=%s action_request='%s' len(merge_buffer)=%s --> keep action_old='%s'",
+                    chunk_index,
+                    self.diff_mode,
+                    action_request,
+                    len(merge_buffer),
+                    action_old,
                 )
                 action = action_old
             else:
                 logger.warning(
-                    "chunk[{}]: diff_mode={} action_request='{}' len(merge_buffer)={} action_old='{}' (very odd) --> force action='d'".format(
-                        chunk_index,
-                        self.diff_mode,
-                        action_request,
-                        len(merge_buffer),
-                        action_old,
-                    ),
+                    "chunk[%s]: diff_mode=%s action_request='%s' len(merge_buffer)=%s action_old='%s' (very odd) --> force action='d'",
+                    chunk_index,
+                    self.diff_mode,
+                    action_request,
+                    len(merge_buffer),
+                    action_old,
                 )
                 action = "d"
         else:  # self.diff_mode == 3
@@ -807,13 +907,12 @@ class TextData:  # Non-TUI data
                 action = "e"
             elif action_request == "e" and len(merge_buffer) == 0:
                 logger.warning(
-                    "chunk[{}]: diff_mode={} action_request='{}' len(merge_buffer)={} --> keep action_old='{}'".format(
-                        chunk_index,
-                        self.diff_mode,
-                        action_request,
-                        len(merge_buffer),
-                        action_old,
-                    ),
+                    "chunk[%s]: diff_mode=%s action_request='%s' len(merge_buffer)=%s --> keep action_old='%s'",
+                    chunk_index,
+                    self.diff_mode,
+                    action_request,
+                    len(merge_buffer),
+                    action_old,
                 )
                 action = action_old
             elif self.default_action in ["a", "b", "c"]:
@@ -828,42 +927,7 @@ class TextData:  # Non-TUI data
                     tag = "n"  # update
                     merge_buffer = content
                     if self.default_action == "d":
-                        self.usr_chunk_list = [
-                            chunk_index
-                            for chunk_index, (
-                                tag,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                            ) in enumerate(self.chunk_list)
-                            if tag not in ["E", "e", "n", "A", "C"]
-                        ]
-                        # debug
-                        if len(self.usr_chunk_list) == 0:
-                            self.focused_usr_chunk_index = None
-                            logger.debug(
-                                "reindex(f) at chunk[{}] usr_chunk[*]".format(
-                                    chunk_index
-                                )
-                            )
-                        elif self.focused_usr_chunk_index == len(self.usr_chunk_list):
-                            self.focused_usr_chunk_index = len(self.usr_chunk_list) - 1
-                            logger.debug(
-                                "reindex(f) at chunk[{}] usr_chunk[{} (avoid overflow)]".format(
-                                    chunk_index, self.focused_usr_chunk_index
-                                )
-                            )
-                        else:
-                            logger.debug(
-                                "reindex(f) at chunk[{}] usr_chunk[{}]".format(
-                                    chunk_index, self.focused_usr_chunk_index
-                                )
-                            )
+                        self.remove_usr_chunk(chunk_index, action_request)
                 else:
                     action = "f"  # non-clean merge
             elif action_request == "f":
@@ -878,42 +942,7 @@ class TextData:  # Non-TUI data
                     tag = "n"  # update
                     merge_buffer = content
                     if self.default_action == "d":
-                        self.usr_chunk_list = [
-                            chunk_index
-                            for chunk_index, (
-                                tag,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                                _,
-                            ) in enumerate(self.chunk_list)
-                            if tag not in ["E", "e", "n", "A", "C"]
-                        ]
-                        # debug
-                        if len(self.usr_chunk_list) == 0:
-                            self.focused_usr_chunk_index = None
-                            logger.debug(
-                                "reindex(g) at chunk[{}] usr_chunk[*]".format(
-                                    chunk_index
-                                )
-                            )
-                        elif self.focused_usr_chunk_index == len(self.usr_chunk_list):
-                            self.focused_usr_chunk_index = len(self.usr_chunk_list) - 1
-                            logger.debug(
-                                "reindex(g) at chunk[{}] usr_chunk[{} (avoid overflow)]".format(
-                                    chunk_index, self.focused_usr_chunk_index
-                                )
-                            )
-                        else:
-                            logger.debug(
-                                "reindex(g) at chunk[{}] usr_chunk[{}]".format(
-                                    chunk_index, self.focused_usr_chunk_index
-                                )
-                            )
+                        self.remove_usr_chunk(chunk_index, action_request)
                 else:
                     action = "d"  # non-clean merge
             elif action_request == "g":
@@ -922,64 +951,111 @@ class TextData:  # Non-TUI data
                 action = "d"
             else:  # N
                 logger.warning(
-                    "chunk[{}]: diff_mode={} action_request='{}' len(merge_buffer)={} action_old='{}' (very odd) --> force action='d'".format(
-                        chunk_index,
-                        self.diff_mode,
-                        action_request,
-                        len(merge_buffer),
-                        action_old,
-                    ),
+                    "chunk[%s]: diff_mode=%s action_request='%s' len(merge_buffer)=%s action_old='%s' (very odd) --> force action='d'",
+                    chunk_index,
+                    self.diff_mode,
+                    action_request,
+                    len(merge_buffer),
+                    action_old,
                 )
                 action = "d"
-        self.chunk_list[chunk_index] = (
-            tag,
-            i1,
-            i2,
-            j1,
-            j2,
-            k1,
-            k2,
-            action,
-            merge_buffer,
-        )  # chunk_list item tuple (9 param)
+        self.chunk_list.set_tag(chunk_index, tag)
+        self.chunk_list.set_action(chunk_index, action)
+        self.chunk_list.set_merge_buffer(chunk_index, merge_buffer)
         return
 
-    def set_action_all(self, action_request):
-        for usr_chunk_index in range(len(self.usr_chunk_list)):
-            chunk_index = self.usr_chunk_list[usr_chunk_index]
+    def remove_usr_chunk(self, chunk_index, action_request):
+        """Remove a resolved chunk from usr_chunk_list keeping the focus"""
+        if self.defer_reindex:
+            return  # set_action_all() reindexes once at the end
+        usr_chunk_index = bisect_left(self.usr_chunk_list, chunk_index)
+        if (
+            usr_chunk_index == len(self.usr_chunk_list)
+            or self.usr_chunk_list[usr_chunk_index] != chunk_index
+        ):
+            return  # already removed
+        del self.usr_chunk_list[usr_chunk_index]
+        if len(self.usr_chunk_list) == 0:
+            self.focused_usr_chunk_index = None
+            logger.debug(
+                "reindex(%s) at chunk[%s] usr_chunk[*]", action_request, chunk_index
+            )
+            return
+        if self.focused_usr_chunk_index is None:
+            self.focused_usr_chunk_index = 0
+        elif usr_chunk_index < self.focused_usr_chunk_index:
+            # keep focus on the same chunk
+            self.focused_usr_chunk_index -= 1
+        elif self.focused_usr_chunk_index == len(self.usr_chunk_list):
+            self.focused_usr_chunk_index = len(self.usr_chunk_list) - 1
             logger.debug(
-                "usr_chunk_index={} >> chunk_index={} >> action_request={}".format(
-                    usr_chunk_index, chunk_index, action_request
-                ),
+                "reindex(%s) at chunk[%s] usr_chunk[%s (avoid overflow)]",
+                action_request,
+                chunk_index,
+                self.focused_usr_chunk_index,
+            )
+            return
+        logger.debug(
+            "reindex(%s) at chunk[%s] usr_chunk[%s]",
+            action_request,
+            chunk_index,
+            self.focused_usr_chunk_index,
+        )
+        return
+
+    def reindex_usr_chunk_list(self, focused_chunk_index):
+        """Rebuild usr_chunk_list after resolving chunks in bulk and focus on
+        focused_chunk_index or the next remaining chunk"""
+        self.usr_chunk_list = self.chunk_list.get_indexes("EenAC")
+        if len(self.usr_chunk_list) == 0:
+            self.focused_usr_chunk_index = None
+        elif focused_chunk_index is None:
+            self.focused_usr_chunk_index = 0
+        else:
+            self.focused_usr_chunk_index = min(
+                bisect_left(self.usr_chunk_list, focused_chunk_index),
+                len(self.usr_chunk_list) - 1,
             )
-            self.set_action(chunk_index, action_request)
+        logger.debug(
+            "reindex at chunk[%s] usr_chunk[%s]",
+            focused_chunk_index,
+            self.focused_usr_chunk_index,
+        )
+        return
+
+    def set_action_all(self, action_request):
+        debug = logger.isEnabledFor(logging.DEBUG)
+        # iterate over a snapshot since set_action() may resolve chunks
+        usr_chunk_list = list(self.usr_chunk_list)
+        if self.diff_mode == 3 and action_request in ["f", "g"]:
+            self.precompute_merge_wdiff3(usr_chunk_list)
+        focused_chunk_index = self.get_chunk_index_from_usr_chunk_list(
+            self.focused_usr_chunk_index
+        )
+        self.defer_reindex = True
+        try:
+            for usr_chunk_index, chunk_index in enumerate(usr_chunk_list):
+                if debug:
+                    logger.debug(
+                        "usr_chunk_index=%s >> chunk_index=%s >> action_request=%s",
+                        usr_chunk_index,
+                        chunk_index,
+                        action_request,
+                    )
+                self.set_action(chunk_index, action_request)
+        finally:
+            # also for chunks resolved before an error
+            self.defer_reindex = False
+            if (
+                self.diff_mode == 3
+                and self.default_action == "d"
+                and action_request in ["f", "g"]
+            ):
+                self.reindex_usr_chunk_list(focused_chunk_index)
         return
 
     def set_merge_buffer(self, chunk_index, merge_buffer):
-        (
-            tag,
-            i1,
-            i2,
-            j1,
-            j2,
-            k1,
-            k2,
-            action,
-            _,
-        ) = self.chunk_list[
-            chunk_index
-        ]  # chunk_list item tuple (9 param)
-        self.chunk_list[chunk_index] = (
-            tag,
-            i1,
-            i2,
-            j1,
-            j2,
-            k1,
-            k2,
-            action,
-            merge_buffer,
-        )  # chunk_list item tuple (9 param)
+        self.chunk_list.set_merge_buffer(chunk_index, merge_buffer)
         return
 
     def set_updated_merge_buffer(self, chunk_index):
@@ -987,6 +1063,7 @@ class TextData:  # Non-TUI data
         with tempfile.NamedTemporaryFile(
             mode="w",
             buffering=io.DEFAULT_BUFFER_SIZE,
+            errors="surrogateescape",
             suffix=".tmp",
             prefix="imediff.",
             dir=".",
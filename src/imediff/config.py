@@ -46,6 +46,7 @@ version = 3.1       # DON'T EDIT THIS.  This is for future upgrade tracking.
 confirm_exit = True # Set as "False" to save and exit without pause
 confirm_quit = True # Set as "False" to quit without pause
 #editor = vim       # Set this to override /usr/bin/editor and $EDITOR
+wdiff_mode = char   # Set as "word" to compare words instead of characters
 
 # key remapping is used only for TUI user input.  MACRO need to use the
 # original bindings.
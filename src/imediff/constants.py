@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+IMEDIFF - Interactive Merge Editor for DIFF2 and DIFF3
+          Curses based single-pane fullscreen interactive tool
+          and CLI based non-interactive tool with --macro
+
+Copyright (C) 2003, 2004 Jarno Elonen <elonen@iki.fi>
+Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+# NO IMPORTS HERE: initialize_args() uses these without loading the matchers
+
+# engine names accepted by get_sequence_matcher() (the first one is default)
+ENGINES = ["difflib", "myers", "patience", "histogram"]
+
+# fuzzy matching modes for lines not matched after filtering (the first one
+# is default)
+FUZZY_MODES = ["shrink", "sketch", "ratio"]
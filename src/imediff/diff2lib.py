@@ -0,0 +1,535 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+Module diff2lib -- alternative diff2 engines
+
+Class MyersMatcher:
+    A SequenceMatcher compatible class using the Myers O(ND) algorithm.
+
+Class PatienceMatcher:
+    A MyersMatcher variant anchoring on lines unique in both sequences.
+
+Class HistogramMatcher:
+    A MyersMatcher variant anchoring on the least frequent common lines.
+
+Function get_sequence_matcher:
+    A factory to select the diff2 engine by its name.
+
+Function longest_increasing:
+    Find the longest increasing subsequence.
+
+Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+from difflib import SequenceMatcher
+from bisect import bisect_left
+from imediff.constants import ENGINES
+
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# HistogramMatcher ignores lines occurring more often than this as anchors
+HISTOGRAM_MAX_CHAIN = 64
+
+
+def get_sequence_matcher(engine="difflib", isjunk=None, a="", b="", autojunk=True):
+    """
+    Return a SequenceMatcher compatible object for the engine name
+
+    * "difflib" -- difflib.SequenceMatcher (Ratcliff-Obershelp)
+    * "myers"   -- MyersMatcher (Myers O(ND) with linear space refinement)
+    * "patience" -- PatienceMatcher (anchor on unique lines, then Myers)
+    * "histogram" -- HistogramMatcher (anchor on rare lines, then Myers)
+
+    >>> get_sequence_matcher("myers", None, "abcd", "acbd").get_opcodes()
+    [('equal', 0, 1, 0, 1), ('delete', 1, 2, 1, 1), ('equal', 2, 3, 1, 2), ('insert', 3, 3, 2, 3), ('equal', 3, 4, 3, 4)]
+    """
+    if engine == "difflib":
+        matcher = SequenceMatcher(isjunk, a, b, autojunk)
+    elif engine == "myers":
+        matcher = MyersMatcher(isjunk, a, b, autojunk)
+    elif engine == "patience":
+        matcher = PatienceMatcher(isjunk, a, b, autojunk)
+    elif engine == "histogram":
+        matcher = HistogramMatcher(isjunk, a, b, autojunk)
+    else:
+        logger.error("E: engine should be one of %s but %s", ENGINES, engine)
+        sys.exit(2)
+    return matcher
+
+
+def longest_increasing(values):
+    """
+    Return list of indexes of the longest strictly increasing subsequence
+    of values using the patience sorting
+
+    >>> longest_increasing([3, 1, 4, 1, 5, 9, 2, 6])
+    [1, 2, 4, 7]
+    """
+    tails = []  # smallest last value for each length
+    tails_index = []  # index in values for tails
+    back = []  # index in values of the previous value
+    for n, value in enumerate(values):
+        k = bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tails_index.append(n)
+        else:
+            tails[k] = value
+            tails_index[k] = n
+        back.append(tails_index[k - 1] if k > 0 else -1)
+    result = []
+    n = tails_index[-1] if tails_index else -1
+    while n >= 0:
+        result.append(n)
+        n = back[n]
+    result.reverse()
+    return result
+
+
+class MyersMatcher:
+    """
+    MyersMatcher
+
+    A public class to compare 2 sequences of hashable elements with the
+    Myers O(ND) difference algorithm using the linear space refinement
+    (divide and conquer on the middle snake).
+
+      * Eugene W. Myers, An O(ND) Difference Algorithm and Its Variations,
+        Algorithmica 1 (1986), 251-266.
+
+    This returns the shortest edit script, i.e. the longest common
+    subsequence.  This is not always the same as difflib.SequenceMatcher
+    which looks for the longest contiguous matching subsequence first.  This
+    is much faster than difflib.SequenceMatcher for large sequences with
+    small number of differences.
+
+    The API is compatible with difflib.SequenceMatcher for set_seqs(),
+    set_seq1(), set_seq2(), get_matching_blocks() and get_opcodes().  The
+    isjunk and autojunk arguments are accepted for compatibility but ignored.
+
+    Example:
+    >>> a = "qabxcd"
+    >>> b = "abycdf"
+    >>> s = MyersMatcher(None, a, b)
+    >>> for tag, i1, i2, j1, j2 in s.get_opcodes():
+    ...     print("{:7}   a[{}:{}] --> b[{}:{}] {!r:>8} --> {!r}".format(
+    ...         tag, i1, i2, j1, j2, a[i1:i2], b[j1:j2]))
+    delete    a[0:1] --> b[0:0]      'q' --> ''
+    equal     a[1:3] --> b[0:2]     'ab' --> 'ab'
+    replace   a[3:4] --> b[2:3]      'x' --> 'y'
+    equal     a[4:6] --> b[3:5]     'cd' --> 'cd'
+    insert    a[6:6] --> b[5:6]       '' --> 'f'
+    >>> s.get_matching_blocks()
+    [(1, 0, 2), (4, 3, 2), (6, 6, 0)]
+    """
+
+    def __init__(self, isjunk=None, a="", b="", autojunk=True):
+        """
+        Construct a MyersMatcher
+
+        """
+        self.isjunk = isjunk  # NOT USED
+        self.autojunk = autojunk  # NOT USED
+        self.a = self.b = None
+        self.set_seqs(a, b)
+
+    def set_seqs(self, a, b):
+        """Set the two sequences to be compared."""
+
+        self.set_seq1(a)
+        self.set_seq2(b)
+
+    def set_seq1(self, a):
+        """Set the first sequence to be compared."""
+
+        if a is self.a:
+            return
+        self.a = a
+        self.matching_blocks = self.opcodes = None
+
+    def set_seq2(self, b):
+        """Set the second sequence to be compared."""
+
+        if b is self.b:
+            return
+        self.b = b
+        self.matching_blocks = self.opcodes = None
+
+    def get_matching_blocks(self):
+        """Return list of triples describing matching subsequences.
+
+        Each triple is of the form (i, j, n), and means that
+        a[i:i+n] == b[j:j+n].  The triples are monotonically increasing in i
+        and in j.  Adjacent triples are merged.  The last triple is a dummy,
+        (len(a), len(b), 0), and is the only triple with n == 0.
+        """
+
+        if self.matching_blocks is not None:
+            return self.matching_blocks
+        blocks = []
+        self._find_blocks(0, len(self.a), 0, len(self.b), blocks)
+        self.matching_blocks = self._merge_blocks(blocks)
+        return self.matching_blocks
+
+    def _merge_blocks(self, blocks):
+        """
+        Sort and merge adjacent blocks, and append the sentinel
+        """
+        blocks.sort()
+        i1 = j1 = k1 = 0
+        non_adjacent = []
+        for i2, j2, k2 in blocks:
+            if i1 + k1 == i2 and j1 + k1 == j2:
+                k1 += k2
+            else:
+                if k1:
+                    non_adjacent.append((i1, j1, k1))
+                i1, j1, k1 = i2, j2, k2
+        if k1:
+            non_adjacent.append((i1, j1, k1))
+        non_adjacent.append((len(self.a), len(self.b), 0))
+        return non_adjacent
+
+    def _trim(self, alo, ahi, blo, bhi, blocks):
+        """
+        Append common prefix and suffix of a[alo:ahi] and b[blo:bhi] to
+        blocks and return the remaining range (alo, ahi, blo, bhi)
+        """
+        a = self.a
+        b = self.b
+        # common prefix
+        n = 0
+        while alo + n < ahi and blo + n < bhi and a[alo + n] == b[blo + n]:
+            n += 1
+        if n:
+            blocks.append((alo, blo, n))
+            alo += n
+            blo += n
+        # common suffix
+        n = 0
+        while alo < ahi - n and blo < bhi - n and a[ahi - n - 1] == b[bhi - n - 1]:
+            n += 1
+        if n:
+            blocks.append((ahi - n, bhi - n, n))
+            ahi -= n
+            bhi -= n
+        return (alo, ahi, blo, bhi)
+
+    def _find_blocks(self, alo, ahi, blo, bhi, blocks):
+        """
+        Append matching blocks of a[alo:ahi] and b[blo:bhi] to blocks using
+        the Myers algorithm
+        """
+        # explicit stack of (alo, ahi, blo, bhi) to avoid deep recursion
+        stack = [(alo, ahi, blo, bhi)]
+        while stack:
+            alo, ahi, blo, bhi = self._trim(*stack.pop(), blocks)
+            if alo == ahi or blo == bhi:
+                # only deletion or insertion remains
+                continue
+            split = self._find_split(alo, ahi, blo, bhi)
+            if split is None:
+                # no common element
+                continue
+            x, y = split
+            stack.append((x, ahi, y, bhi))
+            stack.append((alo, x, blo, y))
+        return
+
+    def _find_split(self, alo, ahi, blo, bhi):
+        """
+        Find the middle snake of a[alo:ahi] and b[blo:bhi] by running the
+        forward and reverse searches simultaneously in linear space, and
+        return the split point (x, y) on it.  Return None if there is no
+        common element.
+        """
+        a = self.a
+        b = self.b
+        n = ahi - alo
+        m = bhi - blo
+        max_d = (n + m + 1) // 2
+        v_offset = max_d
+        v_length = 2 * max_d + 2
+        # furthest reaching x on diagonal k (forward: vf, reverse: vr)
+        vf = [-1] * v_length
+        vr = [-1] * v_length
+        vf[v_offset + 1] = 0
+        vr[v_offset + 1] = 0
+        delta = n - m
+        # if the total number of elements is odd, the forward path will
+        # collide with the reverse path
+        front = delta % 2 != 0
+        # offsets for the start and end of k loop to skip out of range
+        kf_start = kf_end = kr_start = kr_end = 0
+        for d in range(max_d):
+            # forward path
+            for kf in range(-d + kf_start, d + 1 - kf_end, 2):
+                kf_offset = v_offset + kf
+                if kf == -d or (kf != d and vf[kf_offset - 1] < vf[kf_offset + 1]):
+                    xf = vf[kf_offset + 1]
+                else:
+                    xf = vf[kf_offset - 1] + 1
+                yf = xf - kf
+                while xf < n and yf < m and a[alo + xf] == b[blo + yf]:
+                    xf += 1
+                    yf += 1
+                vf[kf_offset] = xf
+                if xf > n:
+                    # ran off the right of the graph
+                    kf_end += 2
+                elif yf > m:
+                    # ran off the bottom of the graph
+                    kf_start += 2
+                elif front:
+                    kr_offset = v_offset + delta - kf
+                    if 0 <= kr_offset < v_length and vr[kr_offset] != -1:
+                        # mirror xr onto top-left coordinate system
+                        xr = n - vr[kr_offset]
+                        if xf >= xr:
+                            # overlap detected
+                            return (alo + xf, blo + yf)
+            # reverse path
+            for kr in range(-d + kr_start, d + 1 - kr_end, 2):
+                kr_offset = v_offset + kr
+                if kr == -d or (kr != d and vr[kr_offset - 1] < vr[kr_offset + 1]):
+                    xr = vr[kr_offset + 1]
+                else:
+                    xr = vr[kr_offset - 1] + 1
+                yr = xr - kr
+                while xr < n and yr < m and a[ahi - xr - 1] == b[bhi - yr - 1]:
+                    xr += 1
+                    yr += 1
+                vr[kr_offset] = xr
+                if xr > n:
+                    # ran off the left of the graph
+                    kr_end += 2
+                elif yr > m:
+                    # ran off the top of the graph
+                    kr_start += 2
+                elif not front:
+                    kf_offset = v_offset + delta - kr
+                    if 0 <= kf_offset < v_length and vf[kf_offset] != -1:
+                        xf = vf[kf_offset]
+                        yf = v_offset + xf - kf_offset
+                        # mirror xr onto top-left coordinate system
+                        xr = n - xr
+                        if xf >= xr:
+                            # overlap detected
+                            return (alo + xf, blo + yf)
+        # number of differences equals number of elements: no commonality
+        return None
+
+    def get_opcodes(self):
+        """Return list of 5-tuples describing how to turn a into b.
+
+        Each tuple is of the form (tag, i1, i2, j1, j2) in the same way as
+        difflib.SequenceMatcher.get_opcodes().  The tags are 'replace',
+        'delete', 'insert', and 'equal'.
+        """
+
+        if self.opcodes is not None:
+            return self.opcodes
+        i = j = 0
+        self.opcodes = answer = []
+        for ai, bj, size in self.get_matching_blocks():
+            tag = ""
+            if i < ai and j < bj:
+                tag = "replace"
+            elif i < ai:
+                tag = "delete"
+            elif j < bj:
+                tag = "insert"
+            if tag:
+                answer.append((tag, i, ai, j, bj))
+            i, j = ai + size, bj + size
+            # the list of matching blocks is terminated by a sentinel with
+            # size 0
+            if size:
+                answer.append(("equal", ai, i, bj, j))
+        return answer
+
+
+class PatienceMatcher(MyersMatcher):
+    """
+    PatienceMatcher
+
+    A public class to compare 2 sequences of hashable elements with the
+    patience diff algorithm.  Elements which occur exactly once in both
+    sequences are used as anchors.  The longest increasing subsequence of
+    such anchors is matched first and the ranges between anchors are
+    processed recursively.  A range without such anchors is processed by
+    the Myers algorithm.
+
+    This avoids anchoring on frequent lines such as "}", "end" or blank
+    lines which are common in program source code.  The API is the same as
+    MyersMatcher.
+
+    Example:
+    >>> a = ["int f()\\n", "{\\n", "  f1;\\n", "}\\n", "\\n",
+    ...      "int g()\\n", "{\\n", "  g1;\\n", "}\\n"]
+    >>> b = ["int g()\\n", "{\\n", "  g1;\\n", "}\\n", "\\n",
+    ...      "int f()\\n", "{\\n", "  f1;\\n", "}\\n"]
+    >>> PatienceMatcher(None, a, b).get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('insert', 0, 0, 0, 5), ('equal', 0, 3, 5, 8), ('delete', 3, 8, 8, 8),
+     ('equal', 8, 9, 8, 9)]
+    >>> MyersMatcher(None, a, b).get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('replace', 0, 1, 0, 1), ('equal', 1, 2, 1, 2), ('replace', 2, 3, 2, 3),
+     ('equal', 3, 5, 3, 5), ('replace', 5, 6, 5, 6), ('equal', 6, 7, 6, 7),
+     ('replace', 7, 8, 7, 8), ('equal', 8, 9, 8, 9)]
+    """
+
+    def _find_blocks(self, alo, ahi, blo, bhi, blocks):
+        """
+        Append matching blocks of a[alo:ahi] and b[blo:bhi] to blocks using
+        the patience algorithm
+        """
+        a = self.a
+        b = self.b
+        stack = [(alo, ahi, blo, bhi)]
+        while stack:
+            alo, ahi, blo, bhi = self._trim(*stack.pop(), blocks)
+            if alo == ahi or blo == bhi:
+                continue
+            # count elements: [count in a, count in b, index in a]
+            counts = {}
+            for i in range(alo, ahi):
+                count = counts.get(a[i])
+                if count is None:
+                    counts[a[i]] = [1, 0, i]
+                else:
+                    count[0] += 1
+            for j in range(blo, bhi):
+                count = counts.get(b[j])
+                if count is not None:
+                    count[1] += 1
+            # unique pairs (i, j) sorted by j
+            pairs = []
+            for j in range(blo, bhi):
+                count = counts.get(b[j])
+                if count is not None and count[0] == 1 and count[1] == 1:
+                    pairs.append((count[2], j))
+            if not pairs:
+                MyersMatcher._find_blocks(self, alo, ahi, blo, bhi, blocks)
+                continue
+            # longest subsequence of pairs increasing also in i
+            anchors = [pairs[n] for n in longest_increasing([i for i, _ in pairs])]
+            # matched anchors and ranges between them
+            i0 = alo
+            j0 = blo
+            for i, j in anchors:
+                stack.append((i0, i, j0, j))
+                blocks.append((i, j, 1))
+                i0 = i + 1
+                j0 = j + 1
+            stack.append((i0, ahi, j0, bhi))
+        return
+
+
+class HistogramMatcher(MyersMatcher):
+    """
+    HistogramMatcher
+
+    A public class to compare 2 sequences of hashable elements with the
+    histogram diff algorithm.  This is an extension of the patience diff
+    algorithm which also works without unique elements.  The common element
+    with the lowest occurrence count in a is used as an anchor.  Its
+    matching block is extended as long as possible, and the ranges before
+    and after it are processed recursively.  Elements occurring more than
+    HISTOGRAM_MAX_CHAIN times are never used as anchors.  A range without
+    anchors is processed by the Myers algorithm.
+
+    The API is the same as MyersMatcher.
+
+    Example:
+    >>> a = ["}\\n", "a\\n", "}\\n", "b\\n", "}\\n", "c\\n", "}\\n"]
+    >>> b = ["}\\n", "c\\n", "}\\n", "b\\n", "}\\n", "a\\n", "}\\n"]
+    >>> HistogramMatcher(None, a, b).get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('equal', 0, 1, 0, 1), ('replace', 1, 2, 1, 2), ('equal', 2, 5, 2, 5),
+     ('replace', 5, 6, 5, 6), ('equal', 6, 7, 6, 7)]
+    >>> SequenceMatcher(None, a, b).get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('insert', 0, 0, 0, 4), ('equal', 0, 3, 4, 7), ('delete', 3, 7, 7, 7)]
+    """
+
+    def _find_blocks(self, alo, ahi, blo, bhi, blocks):
+        """
+        Append matching blocks of a[alo:ahi] and b[blo:bhi] to blocks using
+        the histogram algorithm
+        """
+        a = self.a
+        b = self.b
+        stack = [(alo, ahi, blo, bhi)]
+        while stack:
+            alo, ahi, blo, bhi = self._trim(*stack.pop(), blocks)
+            if alo == ahi or blo == bhi:
+                continue
+            # occurrences of each element in a
+            occurrences = {}
+            for i in range(alo, ahi):
+                occurrences.setdefault(a[i], []).append(i)
+            best_count = HISTOGRAM_MAX_CHAIN + 1
+            best_n = 0
+            best_i = best_j = 0
+            j = blo
+            while j < bhi:
+                j_next = j + 1
+                indexes = occurrences.get(b[j])
+                if indexes is not None and len(indexes) <= best_count:
+                    for i in indexes:
+                        # extend the match backward and forward
+                        si = i
+                        sj = j
+                        while si > alo and sj > blo and a[si - 1] == b[sj - 1]:
+                            si -= 1
+                            sj -= 1
+                        ei = i + 1
+                        ej = j + 1
+                        while ei < ahi and ej < bhi and a[ei] == b[ej]:
+                            ei += 1
+                            ej += 1
+                        n = ei - si
+                        if len(indexes) < best_count or n > best_n:
+                            best_count = len(indexes)
+                            best_n = n
+                            best_i = si
+                            best_j = sj
+                        # skip elements in this matched block
+                        j_next = max(j_next, ej)
+                j = j_next
+            if best_n == 0:
+                MyersMatcher._find_blocks(self, alo, ahi, blo, bhi, blocks)
+                continue
+            blocks.append((best_i, best_j, best_n))
+            stack.append((best_i + best_n, ahi, best_j + best_n, bhi))
+            stack.append((alo, best_i, blo, best_j))
+        return
+
+
+if __name__ == "__main__":
+    import doctest
+
+    flags = doctest.REPORT_NDIFF | doctest.FAIL_FAST
+    fail, total = doctest.testmod(optionflags=flags)
+    print("{} failures out of {} tests -- ".format(fail, total), end="")
+    if fail == 0:
+        sys.exit(0)
+    else:
+        sys.exit(1)
@@ -25,14 +25,24 @@ Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301, USA.
 """
 
-from difflib import SequenceMatcher
-from imediff.lines2lib import LineMatcher
+from imediff.diff2lib import get_sequence_matcher
+from imediff.lines2lib import (
+    PreparedLines,
+    append_opcode,
+    find_anchors,
+    line_matcher_opcodes,
+)
+from imediff.fastlib import common_prefix, common_suffix
+from imediff.utils import run_parallel
 
 import sys
 import logging
 
 logger = logging.getLogger(__name__)
 
+# minimum number of lines of b to run b-a and b-c matching in parallel
+JOBS_MIN_LINES = 2000
+
 
 class SequenceMatcher3:
 
@@ -118,13 +128,14 @@ class SequenceMatcher3:
      * 'e'    a[j1:j2] != b[i1:i2] != c[k1:k2] == a[j1:j2]
      * 'N'    a[j1:j2] != b[i1:i2] != c[k1:k2] != a[j1:j2]
 
-    For matcher=0, this uses bare SequenceMatcher class from difflib as the
-    backend tool.  This uses returned tag of SequenceMatcher which are:
+    For matcher=0, this uses bare SequenceMatcher class from difflib (or
+    the matcher class from diff2lib.py selected by engine) as the backend
+    tool.  This uses returned tag of SequenceMatcher which are:
 
     * 'equal'  ------------------ for a[j1:j2] == b[i1:i2]
     * 'delete' 'insert' 'replace' for other cases
 
-    For matcher=1, this uses LineMatcher class from diff2lib.py instead as the
+    For matcher=1, this uses LineMatcher class from lines2lib.py instead as the
     backend tool. This uses returned tag of LineMatcher which are:
 
     * 'E' ----------------------- for a[j1:j2] == b[i1:i2]
@@ -156,6 +167,11 @@ class SequenceMatcher3:
     E a[36:37],b[37:38],c[34:35] => ';', ';', ';'
     C a[37:37],b[38:38],c[35:39] => '', '', 'tail'
 
+    To handle each tuple as soon as it is found, use .iter_opcodes():
+
+    >>> next(s.iter_opcodes())
+    ('E', 0, 6, 0, 6, 0, 6)
+
     Example 2: comparing three strings, and considering blanks to be "junk" and
     matcher=0.
 
@@ -275,6 +291,11 @@ class SequenceMatcher3:
         line_factor=8,  # length shortening factor
         check_same_ac=True,  # check a vs. c for tag == 'e'
         # 8 for 80% of length_before every 2 steps
+        coalesce=False,  # LineMatcher returns 'E' lines as a single range
+        engine="difflib",  # diff2 engine: "difflib", "myers", ...
+        jobs=1,  # number of processes for b-a and b-c matching
+        partition=False,  # partition large inputs at anchor lines
+        fuzzy="shrink",  # LineMatcher fuzzy matching mode
     ):
         """Construct a SequenceMatcher3.
 
@@ -304,6 +325,34 @@ class SequenceMatcher3:
         Optional arg autojunk should be set to False to disable the
         "automatic junk heuristic" that treats popular elements as junk
         (see module documentation for more information).
+
+        Optional arg coalesce should be set to True to let LineMatcher
+        (matcher=1) return contiguous exactly matching lines as a single
+        'E' range.  This makes the resulting 'E' opcodes span multiple lines.
+
+        Optional arg engine selects the diff2 engine used for both b-a and
+        b-c comparisons: "difflib" (the default), "myers", "patience" or
+        "histogram".  Engines other than "difflib" ignore isjunk and autojunk.
+
+        With matcher=1, the common prefix and suffix lines shared by a, b and
+        c are returned as 'E' without running the matchers.  Since they are
+        aligned first, changes next to repeated lines may be placed
+        differently from the matchers alone.
+
+        Optional arg jobs may be set to 2 or more to run b-a and b-c line
+        matching (matcher=1) in parallel worker processes when b has at least
+        JOBS_MIN_LINES lines.  The results are the same.
+
+        With matcher=1 and partition=True, large inputs
+        (lines2lib.PARTITION_MIN_LINES or more lines) are partitioned into
+        segments at anchor lines occurring once in each of a, b and c.
+        Segments are matched independently on the same prepared b, in up to
+        jobs worker processes.  The result may differ from the one without
+        partitioning.
+
+        Optional arg fuzzy selects how LineMatcher (matcher=1) finds fuzzy
+        matches in blocks of lines not matched after filtering: "shrink"
+        (the default), "sketch" or "ratio".  See LineMatcher.
         """
 
         # Members:
@@ -339,6 +388,11 @@ class SequenceMatcher3:
         self.line_min = line_min
         self.line_factor = line_factor
         self.check_same_ac = check_same_ac
+        self.coalesce = coalesce
+        self.engine = engine
+        self.jobs = jobs
+        self.partition = partition
+        self.fuzzy = fuzzy
         self.opcodes = None
 
     def set_seq1(self, a):
@@ -406,22 +460,181 @@ class SequenceMatcher3:
         e a[9:10] (p) / b[10:10] () / c[10:11] (p)
         """
 
+        self.opcodes = list(self.iter_opcodes())
+        return self.opcodes
+
+    def iter_opcodes(self):
+        """Yield 7-tuples of get_opcodes() one by one.
+
+        Each tuple is yielded as soon as the walk over the b-a and b-c
+        matches settles it, without building the whole list.
+        """
+
         a = self.a
         b = self.b
         c = self.c
+        len_a = len(a)
+        len_b = len(b)
+        len_c = len(c)
+        # trim common prefix and suffix lines shared by all of a, b and c
+        # (not for matcher=0 to keep the character matching by difflib)
+        n_max = min(len_a, len_b, len_c)
+        if self.matcher == 0:
+            n_max = 0
+        if a == b and b == c:
+            # identical inputs
+            n_pre = n_max
+        else:
+            n_pre = common_prefix([a, b, c], n_max)
+        n_suf = common_suffix([a, b, c], n_max - n_pre)
+        logger.debug(
+            "  common prefix=%s suffix=%s for len_a=%s len_b=%s len_c=%s",
+            n_pre,
+            n_suf,
+            len_a,
+            len_b,
+            len_c,
+        )
+        a_middle = a[n_pre : len_a - n_suf]
+        b_middle = b[n_pre : len_b - n_suf]
+        c_middle = c[n_pre : len_c - n_suf]
+        anchors = []
+        if self.matcher == 1 and self.partition:
+            anchors = find_anchors([b_middle, a_middle, c_middle])
+        if anchors:
+            middle = self._iter_opcodes_segments(a_middle, b_middle, c_middle, anchors)
+        else:
+            middle = self._iter_opcodes_middle(
+                a_middle, b_middle, c_middle, self.jobs, self.partition
+            )
+        yield from self._equal_opcodes(0, 0, 0, n_pre)
+        for tag, i1, i2, j1, j2, k1, k2 in middle:
+            yield (
+                tag,
+                i1 + n_pre,
+                i2 + n_pre,
+                j1 + n_pre,
+                j2 + n_pre,
+                k1 + n_pre,
+                k2 + n_pre,
+            )
+        yield from self._equal_opcodes(
+            len_a - n_suf, len_b - n_suf, len_c - n_suf, n_suf
+        )
+
+    def _equal_opcodes(self, i1, j1, k1, n):
+        """Return list of 'E' 7-tuples for n common elements from a[i1],
+        b[j1] and c[k1].
+
+        Lines with matcher=1 are returned one by one unless coalesce is set.
+        """
+
+        if n == 0:
+            return []
+        elif self.matcher == 1 and not self.coalesce:
+            return [
+                ("E", i1 + x, i1 + x + 1, j1 + x, j1 + x + 1, k1 + x, k1 + x + 1)
+                for x in range(n)
+            ]
+        else:
+            return [("E", i1, i1 + n, j1, j1 + n, k1, k1 + n)]
+
+    def _iter_opcodes_segments(self, a, b, c, anchors):
+        """Yield 7-tuples describing how a, b, c matches segment by segment
+        between anchor lines (index in b, a, c).
+        """
+
+        ends = anchors + [(len(b), len(a), len(c))]
+        # share prepared b (filtered lines and their interned IDs) among
+        # segments
+        prepared_b = PreparedLines(b, self.line_rule)
+        tasks = []
+        ib0 = ia0 = ic0 = 0
+        for ib, ia, ic in ends:
+            args = (a[ia0:ia], prepared_b.segment(ib0, ib), c[ic0:ic])
+            tasks.append((self._segment_opcodes, args))
+            ib0 = ib + 1
+            ia0 = ia + 1
+            ic0 = ic + 1
+        # the last opcode is kept pending until it can not be merged
+        answer = []
+        ib0 = ia0 = ic0 = 0
+        for n, opcodes in enumerate(run_parallel(tasks, self.jobs)):
+            for tag, i1, i2, j1, j2, k1, k2 in opcodes:
+                append_opcode(
+                    answer,
+                    (tag, ia0 + i1, ia0 + i2, ib0 + j1, ib0 + j2, ic0 + k1, ic0 + k2),
+                    self.coalesce,
+                )
+                if len(answer) > 1:
+                    yield answer.pop(0)
+            ib, ia, ic = ends[n]
+            if n < len(anchors):
+                # anchor line
+                append_opcode(
+                    answer, ("E", ia, ia + 1, ib, ib + 1, ic, ic + 1), self.coalesce
+                )
+                if len(answer) > 1:
+                    yield answer.pop(0)
+            ib0 = ib + 1
+            ia0 = ia + 1
+            ic0 = ic + 1
+        yield from answer
+
+    def _segment_opcodes(self, a, b, c):
+        """Return list of 7-tuples describing how a, b, c of a segment
+        matches as a task for run_parallel().
+        """
+
+        return list(self._iter_opcodes_middle(a, b, c, 1, False))
+
+    def _iter_opcodes_middle(self, a, b, c, jobs, partition):
+        """Yield 7-tuples describing how a, b, c matches without common
+        prefix and suffix.
+
+        With matcher=1, b may be given as a PreparedLines object.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+
         matcher = self.matcher
         if matcher == 0:
-            opcodes_ba = SequenceMatcher(self.isjunk, b, a).get_opcodes()
-            opcodes_bc = SequenceMatcher(self.isjunk, b, c).get_opcodes()
+            opcodes_ba = get_sequence_matcher(
+                self.engine, self.isjunk, b, a
+            ).get_opcodes()
+            opcodes_bc = get_sequence_matcher(
+                self.engine, self.isjunk, b, c
+            ).get_opcodes()
             tag_equal = "equal"
             matcher_logic = "SequenceMatcher"
         else:  # matcher == 1
-            opcodes_ba = LineMatcher(
-                b, a, self.line_rule, self.line_max, self.line_min, self.line_factor
-            ).get_opcodes()
-            opcodes_bc = LineMatcher(
-                b, c, self.line_rule, self.line_max, self.line_min, self.line_factor
-            ).get_opcodes()
+            # share prepared b (filtered lines and their interned IDs)
+            # between b-a and b-c matching
+            if isinstance(b, PreparedLines):
+                prepared_b = b
+            else:
+                prepared_b = PreparedLines(b, self.line_rule)
+            pairwise_args = [
+                (
+                    prepared_b,
+                    x,
+                    self.line_rule,
+                    self.line_max,
+                    self.line_min,
+                    self.line_factor,
+                    self.coalesce,
+                    self.engine,
+                    None,  # line_ids
+                    1,  # jobs
+                    partition,
+                    self.fuzzy,
+                )
+                for x in (a, c)
+            ]
+            if len(b) < JOBS_MIN_LINES:
+                jobs = 1
+            opcodes_ba, opcodes_bc = run_parallel(
+                [(line_matcher_opcodes, args) for args in pairwise_args], jobs
+            )
             tag_equal = "E"
             matcher_logic = "LineMatcher"
         # index for 3-file merge
@@ -433,37 +646,48 @@ class SequenceMatcher3:
         len_ba = len(opcodes_ba)
         len_bc = len(opcodes_bc)
         logger.debug(
-            "  matcher_logic={} tag_equal={} len_ba={} len_bc={}".format(
-                matcher_logic, tag_equal, len_ba, len_bc
-            ),
+            "  matcher_logic=%s tag_equal=%s len_ba=%s len_bc=%s",
+            matcher_logic,
+            tag_equal,
+            len_ba,
+            len_bc,
         )
-        answer = list()
         tag = ""
         # loop start
         while n_ba < len_ba or n_bc < len_bc:
-            logger.debug(
-                "  loop tag_equal='{}' / j=[{}:{}] / i=[{}:{}] / k=[{}:{}] / n_ba={}, n_bc={}".format(
-                    tag_equal, jl, jh, il, ih, kl, kh, n_ba, n_bc
-                ),
-            )
+            if debug:
+                logger.debug(
+                    "  loop tag_equal='%s' / j=[%s:%s] / i=[%s:%s] / k=[%s:%s] / n_ba=%s, n_bc=%s",
+                    tag_equal,
+                    jl,
+                    jh,
+                    il,
+                    ih,
+                    kl,
+                    kh,
+                    n_ba,
+                    n_bc,
+                )
             ############################################################
             # n_ba = walking index for opcodes_ba
             ############################################################
             # (il_ba for opcodes_ba[n_ba]) == (ih_ba of previous opcodes_ba[n_ba -1]¶)
             if n_ba < len_ba:
                 (tag_ba, _, ih_ba, jl_ba, jh_ba) = opcodes_ba[n_ba]
-                logger.debug(
-                    "      NORMAL   (n_ba={}) <  (len_ba={})".format(n_ba, len_ba)
-                )
+                if debug:
+                    logger.debug(
+                        "      NORMAL   (n_ba=%s) <  (len_ba=%s)", n_ba, len_ba
+                    )
             elif len_ba == 0:  # ... underflow
                 # treat as equal of zero range list at start
                 (tag_ba, _, ih_ba, jl_ba, jh_ba) = (tag_equal, 0, 0, 0, 0)
                 # tag_ba = tag_equal
                 # ih_ba and ih_ba are the same and == 0
                 # jh_ba and jh_ba are the same and == 0
-                logger.debug(
-                    "      UNDERRUN (n_ba={}) == (len_ba={}) == 0".format(n_ba, len_ba)
-                )
+                if debug:
+                    logger.debug(
+                        "      UNDERRUN (n_ba=%s) == (len_ba=%s) == 0", n_ba, len_ba
+                    )
             else:  # n_ba == len_ba ... overflow
                 # treat as equal of zero range list at the end
                 # check the last match
@@ -478,23 +702,26 @@ class SequenceMatcher3:
                     jh_ba,
                     jh_ba,
                 )
-                logger.debug(
-                    "      OVERRUN  (n_ba={}) == (len_ba={}) > 0".format(n_ba, len_ba)
-                )
+                if debug:
+                    logger.debug(
+                        "      OVERRUN  (n_ba=%s) == (len_ba=%s) > 0", n_ba, len_ba
+                    )
             ############################################################
             # n_bc = walking index for opcodes_bc
             ############################################################
             # (il_bc for opcodes_bc[n_bc]) == (ih_bc of previous opcodes_ba[n_bc -1]¶)
             if n_bc < len_bc:
                 (tag_bc, _, ih_bc, kl_bc, kh_bc) = opcodes_bc[n_bc]
-                logger.debug(
-                    "      NORMAL   (n_bc={}) <  (len_bc={})".format(n_bc, len_bc)
-                )
+                if debug:
+                    logger.debug(
+                        "      NORMAL   (n_bc=%s) <  (len_bc=%s)", n_bc, len_bc
+                    )
             elif len_bc == 0:
                 (tag_bc, _, ih_bc, kl_bc, kh_bc) = (tag_equal, 0, 0, 0, 0)
-                logger.debug(
-                    "      UNDERRUN (n_bc={}) == (len_bc={}) == 0".format(n_bc, len_bc)
-                )
+                if debug:
+                    logger.debug(
+                        "      UNDERRUN (n_bc=%s) == (len_bc=%s) == 0", n_bc, len_bc
+                    )
             else:
                 (tag_bc, _, ih_bc, kl_bc, kh_bc) = opcodes_bc[len_bc - 1]
                 (tag_bc, _, ih_bc, kl_bc, kh_bc) = (
@@ -504,9 +731,10 @@ class SequenceMatcher3:
                     kh_bc,
                     kh_bc,
                 )
-                logger.debug(
-                    "      OVERRUN  (n_bc={}) == (len_bc={}) > 0".format(n_bc, len_bc)
-                )
+                if debug:
+                    logger.debug(
+                        "      OVERRUN  (n_bc=%s) == (len_bc=%s) > 0", n_bc, len_bc
+                    )
             ############################################################
             # get tag for this set of opcodes if high range value is available
             ############################################################
@@ -556,11 +784,17 @@ class SequenceMatcher3:
                 else:
                     kh = None  # undecided
             if (jh is None) or (kh is None):
-                logger.debug(
-                    "    UNDECIDED tag={}, jl={}, jh={}, il={}, ih={}, kl={}, kh={}".format(
-                        tag, jl, jh, il, ih, kl, kh
-                    ),
-                )
+                if debug:
+                    logger.debug(
+                        "    UNDECIDED tag=%s, jl=%s, jh=%s, il=%s, ih=%s, kl=%s, kh=%s",
+                        tag,
+                        jl,
+                        jh,
+                        il,
+                        ih,
+                        kl,
+                        kh,
+                    )
                 # pass to next iteration
                 tag = "N"
             else:
@@ -568,19 +802,23 @@ class SequenceMatcher3:
                 if tag == "N" and self.check_same_ac:
                     if a[jl:jh] == c[kl:kh]:  # exact match need to be changed
                         tag = "e"
-                answer.append((tag, jl, jh, il, ih, kl, kh))
-                logger.debug(
-                    "    APPEND    tag={}, jl={}, jh={}, il={}, ih={}, kl={}, kh={}".format(
-                        tag, jl, jh, il, ih, kl, kh
-                    ),
-                )
+                if debug:
+                    logger.debug(
+                        "    APPEND    tag=%s, jl=%s, jh=%s, il=%s, ih=%s, kl=%s, kh=%s",
+                        tag,
+                        jl,
+                        jh,
+                        il,
+                        ih,
+                        kl,
+                        kh,
+                    )
+                yield (tag, jl, jh, il, ih, kl, kh)
                 # refresh 3-file merge section
                 il = ih
                 jl = jh
                 kl = kh
                 tag = ""
-        self.opcodes = answer
-        return answer
 
 
 if __name__ == "__main__":
@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+Module fastlib -- line comparison helpers with optional NumPy acceleration
+
+Function common_prefix:
+    Count leading lines shared by all sequences.
+
+Function common_suffix:
+    Count trailing lines shared by all sequences.
+
+Function equal_runs:
+    Split aligned ranges into runs of equal and non-equal lines.
+
+If NumPy is importable, lines are compared in blocks of NumPy object arrays
+instead of one by one in Python.  Results are the same without NumPy.  Lines
+of LineStore objects are compared as their raw bytes without decoding them.
+
+Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+from bisect import bisect_left, bisect_right
+from imediff.filelib import LineStore, get_numpy
+
+import sys
+
+# set False to force the pure Python code (NumPy is used only if available)
+USE_NUMPY = True
+
+# minimum number of lines to compare with NumPy (also the first block size)
+NUMPY_MIN_LINES = 256
+
+# first block size of bytes to compare raw bytes of LineStore objects
+BYTES_MIN_BLOCK = 4096
+
+
+def common_prefix(seqs, n_max):
+    """
+    Return the number of leading items equal in all of 2 or 3 seqs
+
+    The result is at most n_max which should not exceed the length of any
+    of seqs.
+
+    >>> common_prefix([["a", "b", "c"], ["a", "b", "d"]], 3)
+    2
+    >>> common_prefix([["a", "b", "c"], ["a", "b", "c"], ["a", "x", "c"]], 3)
+    1
+    >>> common_prefix([LineStore(b"a\\nb\\nc"), LineStore(b"a\\nb\\ncd")], 3)
+    2
+    """
+    if _is_raw(seqs):
+        return _common_prefix_bytes(seqs, n_max)
+    if _use_numpy(n_max):
+        return _common_prefix_numpy(seqs, n_max)
+    n = 0
+    if len(seqs) == 2:
+        a, b = seqs
+        while n < n_max and a[n] == b[n]:
+            n += 1
+    else:
+        a, b, c = seqs
+        while n < n_max and a[n] == b[n] and b[n] == c[n]:
+            n += 1
+    return n
+
+
+def common_suffix(seqs, n_max):
+    """
+    Return the number of trailing items equal in all of 2 or 3 seqs
+
+    The result is at most n_max which should not exceed the length of any
+    of seqs.
+
+    >>> common_suffix([["a", "b", "c"], ["x", "b", "c"]], 3)
+    2
+    >>> common_suffix([["a", "b", "c"], ["b", "c"], ["c"]], 1)
+    1
+    >>> common_suffix([LineStore(b"a\\nb\\nc"), LineStore(b"xa\\nb\\nc")], 3)
+    2
+    """
+    if _is_raw(seqs):
+        return _common_suffix_bytes(seqs, n_max)
+    if _use_numpy(n_max):
+        return _common_suffix_numpy(seqs, n_max)
+    n = 0
+    if len(seqs) == 2:
+        a, b = seqs
+        len_a = len(a)
+        len_b = len(b)
+        while n < n_max and a[len_a - n - 1] == b[len_b - n - 1]:
+            n += 1
+    else:
+        a, b, c = seqs
+        len_a = len(a)
+        len_b = len(b)
+        len_c = len(c)
+        while (
+            n < n_max
+            and a[len_a - n - 1] == b[len_b - n - 1]
+            and b[len_b - n - 1] == c[len_c - n - 1]
+        ):
+            n += 1
+    return n
+
+
+def equal_runs(a, b):
+    """
+    Return list of (x1, x2, equal) for runs of a[x] == b[x] or a[x] != b[x]
+
+    The sequences a and b have the same length.  The runs cover all of them
+    in order.
+
+    >>> equal_runs(["a", "b", "c", "d"], ["a", "b", "x", "d"])
+    [(0, 2, True), (2, 3, False), (3, 4, True)]
+    >>> equal_runs([], [])
+    []
+    """
+    n = len(a)
+    if _use_numpy(n):
+        numpy = get_numpy()
+        mask = _object_array(a) == _object_array(b)
+        starts = numpy.flatnonzero(mask[1:] != mask[:-1]) + 1
+        x1s = [0] + starts.tolist()
+        x2s = starts.tolist() + [n]
+        equals = mask[x1s].tolist()
+        return list(zip(x1s, x2s, equals))
+    runs = []
+    x1 = 0
+    for x in range(n):
+        equal = a[x] == b[x]
+        if x == x1:
+            equal_run = equal
+        elif equal != equal_run:
+            runs.append((x1, x, equal_run))
+            x1 = x
+            equal_run = equal
+    if n > 0:
+        runs.append((x1, n, equal_run))
+    return runs
+
+
+def _use_numpy(n):
+    """Return True if n items should be compared with NumPy"""
+    return USE_NUMPY and n >= NUMPY_MIN_LINES and get_numpy() is not None
+
+
+def _object_array(seq):
+    """Return 1-dimensional NumPy object array of items in seq"""
+    array = get_numpy().empty(len(seq), dtype=object)
+    array[:] = seq
+    return array
+
+
+def _equal_mask(seqs):
+    """Return NumPy bool array of positions equal in all of seqs"""
+    arrays = [_object_array(seq) for seq in seqs]
+    mask = arrays[0] == arrays[1]
+    for n in range(2, len(arrays)):
+        mask &= arrays[n - 1] == arrays[n]
+    return mask
+
+
+def _common_prefix_numpy(seqs, n_max):
+    """common_prefix() comparing blocks of growing size with NumPy"""
+    n = 0
+    block = NUMPY_MIN_LINES
+    while n < n_max:
+        m = min(n + block, n_max)
+        mask = _equal_mask([seq[n:m] for seq in seqs])
+        if not mask.all():
+            return n + int(mask.argmin())
+        n = m
+        block *= 2
+    return n
+
+
+def _common_suffix_numpy(seqs, n_max):
+    """common_suffix() comparing blocks of growing size with NumPy"""
+    n = 0
+    block = NUMPY_MIN_LINES
+    while n < n_max:
+        m = min(n + block, n_max)
+        mask = _equal_mask([seq[len(seq) - m : len(seq) - n] for seq in seqs])
+        mask = mask[::-1]
+        if not mask.all():
+            return n + int(mask.argmin())
+        n = m
+        block *= 2
+    return n
+
+
+def _is_raw(seqs):
+    """Return True if seqs can be compared as raw bytes"""
+    if not all(isinstance(seq, LineStore) for seq in seqs):
+        return False
+    return all(
+        seq.encoding == seqs[0].encoding and seq.errors == "surrogateescape"
+        for seq in seqs
+    )
+
+
+def _common_bytes(buffers, size, backward):
+    """Return the number of leading (or trailing if backward) bytes equal in
+    all of buffers up to size"""
+
+    def equal(n1, n2):
+        if backward:
+            parts = [buffer[len(buffer) - n2 : len(buffer) - n1] for buffer in buffers]
+        else:
+            parts = [buffer[n1:n2] for buffer in buffers]
+        return all(part == parts[0] for part in parts[1:])
+
+    n = 0
+    block = BYTES_MIN_BLOCK
+    while n < size:
+        m = min(n + block, size)
+        if not equal(n, m):
+            # bisect for the first different byte in n:m
+            while m - n > 1:
+                mid = (n + m) // 2
+                if equal(n, mid):
+                    n = mid
+                else:
+                    m = mid
+            return n
+        n = m
+        block *= 2
+    return n
+
+
+def _common_prefix_bytes(seqs, n_max):
+    """common_prefix() comparing raw bytes of LineStore seqs"""
+    buffers = [seq.buffer for seq in seqs]
+    n_bytes = _common_bytes(buffers, min(len(buffer) for buffer in buffers), False)
+    # lines of seqs[0] ending within the common bytes
+    offsets = seqs[0].offsets
+    n = bisect_right(offsets, n_bytes) - 1
+    if (
+        n > 0
+        and buffers[0][offsets[n] - 1] != 10  # b"\n"
+        and any(len(buffer) != n_bytes for buffer in buffers)
+    ):
+        n -= 1  # the last line of seqs[0] is a part of longer lines
+    return min(n, n_max)
+
+
+def _common_suffix_bytes(seqs, n_max):
+    """common_suffix() comparing raw bytes of LineStore seqs"""
+    buffers = [seq.buffer for seq in seqs]
+    n_bytes = _common_bytes(buffers, min(len(buffer) for buffer in buffers), True)
+    # lines of seqs[0] starting within the common bytes
+    offsets = seqs[0].offsets
+    len_lines = len(offsets) - 1
+    start = len(buffers[0]) - n_bytes
+    i = bisect_left(offsets, start, 0, len_lines)
+    n = len_lines - i
+    if (
+        n > 0
+        and offsets[i] == start
+        and not all(
+            len(buffer) == n_bytes or buffer[len(buffer) - n_bytes - 1] == 10
+            for buffer in buffers
+        )
+    ):
+        n -= 1  # the first line of seqs[0] is a part of longer lines
+    return min(n, n_max)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    flags = doctest.REPORT_NDIFF | doctest.FAIL_FAST
+    fail, total = doctest.testmod(optionflags=flags)
+    print("{} failures out of {} tests -- ".format(fail, total), end="")
+    if fail == 0:
+        sys.exit(0)
+    else:
+        sys.exit(1)
@@ -0,0 +1,200 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+Module filelib -- lines of input files read as bytes
+
+Class LineStore:
+    A read-only sequence of lines of a bytes-like buffer.
+
+Function get_numpy:
+    Import NumPy on demand.
+
+Function is_binary:
+    Check bytes read from a file for binary data.
+
+Function decode_lines:
+    Decode bytes read from a file into a list of lines.
+
+Input files are read as bytes and split only at b"\n".  Lines are decoded
+with the "surrogateescape" error handler so that encoding them back gives
+the same bytes.  Lines of a LineStore are decoded only when they are
+accessed, so a huge input file costs its line offset index instead of one
+str object per line.
+
+Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+from array import array
+from collections.abc import Sequence
+
+import io
+import locale
+import sys
+
+# NumPy module imported by get_numpy() (False until it is called)
+_numpy = False
+
+# minimum file size to use LineStore instead of a list of lines
+MMAP_MIN_BYTES = 64 * 1024 * 1024
+
+# number of bytes scanned at once for newlines with NumPy
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+# number of leading bytes checked for NUL to find binary files (as git)
+BINARY_CHECK_BYTES = 8000
+
+
+def get_numpy():
+    """
+    Return NumPy module or None if it isn't available
+
+    NumPy is imported on the first call since importing it takes longer
+    than starting imediff without it.
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+def is_binary(data):
+    """
+    Return True if data looks like the content of a binary file
+
+    >>> is_binary(b"foo\\0bar\\n"), is_binary(b"foo bar\\n")
+    (True, False)
+    """
+    return b"\0" in data[:BINARY_CHECK_BYTES]
+
+
+def decode_lines(data, encoding=None):
+    """
+    Return list of lines of bytes data split at b"\\n" and decoded
+
+    >>> decode_lines(b"foo\\r\\nbar\\rbaz\\n\\xff", "utf-8")
+    ['foo\\r\\n', 'bar\\rbaz\\n', '\\udcff']
+    """
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    text = data.decode(encoding, "surrogateescape")
+    return io.StringIO(text, newline="\n").readlines()
+
+
+def line_offsets(buffer):
+    """
+    Return array('Q') of start offsets of lines in buffer followed by the
+    length of buffer
+
+    Lines end with b"\\n" except the last line which may lack it.
+
+    >>> line_offsets(b"foo\\nbar\\nbaz")
+    array('Q', [0, 4, 8, 11])
+    >>> line_offsets(b"foo\\n")
+    array('Q', [0, 4])
+    >>> line_offsets(b"")
+    array('Q', [0])
+    """
+    size = len(buffer)
+    offsets = array("Q", [0])
+    numpy = get_numpy()
+    if numpy is not None:
+        data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+        for start in range(0, size, SCAN_BLOCK_BYTES):
+            block = data[start : start + SCAN_BLOCK_BYTES]
+            ends = numpy.flatnonzero(block == 10) + (start + 1)
+            offsets.frombytes(ends.astype(numpy.uint64).tobytes())
+    else:
+        pos = buffer.find(b"\n")
+        while pos >= 0:
+            offsets.append(pos + 1)
+            pos = buffer.find(b"\n", pos + 1)
+    if offsets[-1] != size:
+        offsets.append(size)  # last line without b"\n"
+    return offsets
+
+
+class LineStore(Sequence):
+    """
+    Read-only sequence of lines of a bytes-like buffer
+
+    Each line is decoded with encoding when it is accessed.  An integer
+    index returns a str and a slice returns a list of str, so a LineStore
+    can be used where a list of lines is expected.  get_raw() returns lines
+    as bytes without decoding them.
+
+    >>> lines = LineStore(b"foo\\r\\nbar\\n\\xffbaz", "utf-8")
+    >>> len(lines)
+    3
+    >>> lines[0], lines[-1]
+    ('foo\\r\\n', '\\udcffbaz')
+    >>> bytes(lines.get_raw(0, 2))
+    b'foo\\r\\nbar\\n'
+    >>> lines[1:]
+    ['bar\\n', '\\udcffbaz']
+    >>> "bar\\n" in lines
+    True
+    """
+
+    def __init__(self, buffer, encoding=None, errors="surrogateescape"):
+        self.buffer = buffer
+        self.offsets = line_offsets(buffer)
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        self.encoding = encoding
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _get_line(self, index):
+        line = self.buffer[self.offsets[index] : self.offsets[index + 1]]
+        return line.decode(self.encoding, self.errors)
+
+    def get_raw(self, i1, i2):
+        """Return memoryview of bytes of lines from i1 to i2 (exclusive)"""
+        return memoryview(self.buffer)[self.offsets[i1] : self.offsets[i2]]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_line(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("LineStore index out of range")
+        return self._get_line(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._get_line(index)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    flags = doctest.REPORT_NDIFF | doctest.FAIL_FAST
+    fail, total = doctest.testmod(optionflags=flags)
+    print("{} failures out of {} tests -- ".format(fail, total), end="")
+    if fail == 0:
+        sys.exit(0)
+    else:
+        sys.exit(1)
@@ -0,0 +1,550 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+Module gitime -- git-ime: split changes of a git commit into multiple commits
+
+Function main:
+    Entry point for git-ime command.
+
+Class GitIme:
+    Split the commit from HEAD^ to HEAD.
+
+This is a Python version of the git-ime shell script.  Instead of checking
+out files and running "git commit" and imediff for each split commit, it
+reads blobs through a long-lived "git cat-file --batch" process, writes
+blobs through a long-lived "git hash-object --stdin-paths" process, builds
+commits on a temporary index with "git update-index", "git write-tree" and
+"git commit-tree", and runs imediff in this process.  The working tree is
+not touched.
+
+Copyright (C) 2015--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+from imediff import __version__
+from imediff.filelib import decode_lines, is_binary
+from imediff.initialize_args import initialize_args
+from imediff.initialize_confs import initialize_confs
+from imediff.utils import write_lines
+
+import argparse
+import locale
+import logging
+import os
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# index entry to remove a path with "git update-index --index-info"
+NULL_ENTRY = "0 " + "0" * 40
+
+
+def initialize_gitime_args(argv=None):
+    """Parse command line options of git-ime"""
+    pa = argparse.ArgumentParser(
+        prog="git-ime",
+        description="Split changes into multiple git commits",
+        epilog="Version: {}".format(__version__),
+    )
+    pa.add_argument(
+        "-a",
+        "--auto",
+        action="store_true",
+        help="force to auto-split for line-block-split by imediff",
+    )
+    pa.add_argument(
+        "-d", "--delete", action="store_true", help="remove all git-ime tags"
+    )
+    pa.add_argument(
+        "-D",
+        "--debug",
+        action="store_true",
+        help="run imediff with --loglevel=DEBUG --logfile=.git/imediff.log",
+    )
+    pa.add_argument(
+        "-k",
+        "--keep",
+        action="store_true",
+        help="keep original commit message text as much",
+    )
+    pa.add_argument("-n", "--notag", action="store_true", help="don't make git tags")
+    pa.add_argument(
+        "-q", "--quiet", action="store_true", help="run git command with -q"
+    )
+    pa.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="verbose print to STDERR for internal details",
+    )
+    return pa.parse_args(argv)
+
+
+def time_stamp():
+    return time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+
+
+def parse_raw_diff(output):
+    """
+    Return list of (status, src, dst, mode_a, mode_b, sha_a, sha_b) from
+    the output of "git diff --raw -z --no-abbrev"
+
+    >>> parse_raw_diff(
+    ...     b":100644 100755 " + b"1" * 40 + b" " + b"2" * 40 + b" M\\0foo\\0"
+    ...     + b":100644 100644 " + b"1" * 40 + b" " + b"3" * 40 + b" R090\\0a\\0b\\0"
+    ... )  # doctest: +ELLIPSIS
+    [('M', 'foo', 'foo', '100644', '100755', '111...', '222...'), ('R', 'a', 'b', ...)]
+    """
+    changes = []
+    fields = output.split(b"\0")
+    n = 0
+    while n < len(fields) and fields[n].startswith(b":"):
+        mode_a, mode_b, sha_a, sha_b, status = fields[n][1:].decode().split(" ")
+        src = os.fsdecode(fields[n + 1])
+        if status[:1] in ["R", "C"]:
+            dst = os.fsdecode(fields[n + 2])
+            n += 3
+        else:
+            dst = src
+            n += 2
+        changes.append((status[:1], src, dst, mode_a, mode_b, sha_a, sha_b))
+    return changes
+
+
+class GitIme:
+    """
+    Split the commit from HEAD^ to HEAD
+
+    Split commits are created on a temporary index starting from HEAD^ and
+    HEAD is moved to the last of them.
+
+    Unlike the shell version running "git commit", split commits are made
+    with "git commit-tree", so commit hooks such as pre-commit and
+    commit-msg are not run.
+    """
+
+    def __init__(self, args):
+        self.auto = args.auto
+        self.keep = args.keep
+        self.quiet = args.quiet
+        self.verbose = args.verbose
+        self.imediff_log = "DEBUG" if args.debug else "WARNING"
+        self.git_dir = os.path.abspath(self.git("rev-parse", "--git-dir").strip())
+        self.index_env = None
+        self.cat_file = None
+        self.hash_object = None
+        self.confs = None
+
+    ####################################################################
+    # git commands
+    ####################################################################
+    def vecho(self, message):
+        if self.verbose:
+            print(message, file=sys.stderr)
+        return
+
+    def git(self, *args, input=None, env=None, check=True):
+        """Return stdout of git command as str"""
+        self.vecho("I: git {}".format(" ".join(args)))
+        result = subprocess.run(
+            ["git"] + list(args),
+            input=input,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        if check and result.returncode != 0:
+            print("E: git {} failed".format(" ".join(args)), file=sys.stderr)
+            sys.exit(1)
+        return os.fsdecode(result.stdout)
+
+    def git_ok(self, *args):
+        """Return True if git command succeeds quietly"""
+        self.vecho("I: git {}".format(" ".join(args)))
+        return (
+            subprocess.run(
+                ["git"] + list(args),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ).returncode
+            == 0
+        )
+
+    def start(self):
+        """Start long-lived git processes and the temporary index"""
+        self.cat_file = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self.hash_object = subprocess.Popen(
+            ["git", "hash-object", "-w", "--no-filters", "--stdin-paths"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self.index_env = dict(os.environ)
+        self.index_env["GIT_INDEX_FILE"] = os.path.join(self.git_dir, "ime_index")
+        return
+
+    def stop(self):
+        """Stop long-lived git processes and remove temporary files"""
+        for process in [self.cat_file, self.hash_object]:
+            if process is not None:
+                process.stdin.close()
+                process.wait()
+        self.cat_file = None
+        self.hash_object = None
+        for name in ["ime_index", "ime_o"]:
+            path = os.path.join(self.git_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        return
+
+    def read_object(self, name):
+        """Return content of git object as bytes"""
+        self.cat_file.stdin.write(name.encode() + b"\n")
+        self.cat_file.stdin.flush()
+        header = self.cat_file.stdout.readline().split()
+        if len(header) != 3:
+            print("E: git object {} missing".format(name), file=sys.stderr)
+            sys.exit(1)
+        data = self.cat_file.stdout.read(int(header[2]))
+        self.cat_file.stdout.read(1)  # b"\n"
+        return data
+
+    def write_blob(self, path):
+        """Return sha of blob written from file at path"""
+        self.hash_object.stdin.write(os.fsencode(path) + b"\n")
+        self.hash_object.stdin.flush()
+        return self.hash_object.stdout.readline().decode().strip()
+
+    ####################################################################
+    # commits
+    ####################################################################
+    def commit(self, prefix, entries):
+        """
+        Commit the temporary index updated with entries
+
+        entries: [(path, mode, sha), ...] where mode is None to remove path
+        """
+        index_info = ""
+        for path, mode, sha in entries:
+            if mode is None:
+                index_info += "{}\t{}\n".format(NULL_ENTRY, path)
+            else:
+                index_info += "{} {}\t{}\n".format(mode, sha, path)
+        self.git(
+            "update-index",
+            "--index-info",
+            input=os.fsencode(index_info),
+            env=self.index_env,
+        )
+        tree = self.git("write-tree", env=self.index_env).strip()
+        if prefix == "":
+            prefix = time_stamp()
+        if self.keep:
+            message = prefix + ": " + self.message
+        else:
+            message = prefix + "\n"
+        self.parent = self.git(
+            "commit-tree", tree, "-p", self.parent, input=message.encode()
+        ).strip()
+        self.tree = tree
+        if not self.quiet:
+            print("[{} {}] {}".format(self.branch, self.parent[:7], prefix))
+        self.vecho("I: commit {} for {}".format(self.parent, prefix))
+        return
+
+    def split_by_file(self, changes):
+        """Commit each of changes by file"""
+        for status, src, dst, mode_a, mode_b, sha_a, sha_b in changes:
+            self.vecho("I: status='{}' src='{}' dst='{}'".format(status, src, dst))
+            if status == "A":
+                self.commit(src + " (add)", [(src, mode_b, sha_b)])
+            elif status == "M":
+                self.commit(src + " (mod)", [(src, mode_b, sha_b)])
+            elif status == "D":
+                self.commit(src + " (del)", [(src, None, None)])
+            elif status == "T":
+                self.commit(src + " (type)", [(src, mode_b, sha_b)])
+            elif status in ["C", "R"]:
+                if status == "C":
+                    self.commit(
+                        "{} (copy from {})".format(dst, src), [(dst, mode_a, sha_a)]
+                    )
+                else:
+                    self.commit(
+                        "{} (rename from {})".format(dst, src),
+                        [(src, None, None), (dst, mode_a, sha_a)],
+                    )
+                if (mode_a, sha_a) != (mode_b, sha_b):
+                    self.commit(dst + " (mod)", [(dst, mode_b, sha_b)])
+            else:
+                print(
+                    "E: unknown status='{}' src='{}' dst='{}'".format(status, src, dst),
+                    file=sys.stderr,
+                )
+        return
+
+    def split_by_imediff(self, change):
+        """Commit a change of a file by parts selected with imediff and return
+        False if imediff quits before selecting all of them"""
+        status, src, dst, mode_a, mode_b, sha_a, sha_b = change
+        self.vecho("I: status='{}' src='{}' dst='{}'".format(status, src, dst))
+        if status != "M":
+            # copy and rename change 2 paths and never come here
+            self.split_by_file([change])
+            return True
+        if (mode_a, sha_a) == (mode_b, sha_b):
+            self.vecho("I: no looping")
+            return True
+        data_a = self.read_object(sha_a)
+        data_b = self.read_object(sha_b)
+        if data_a == data_b or is_binary(data_a) or is_binary(data_b):
+            self.commit(dst + " #1", [(dst, mode_b, sha_b)])
+            return True
+        if self.auto:
+            self.split_by_hunk(data_a, data_b, change)
+            return True
+        self.vecho("I: ready to loop running imediff auto={}".format(self.auto))
+        repeat = 0
+        while True:
+            repeat += 1
+            file_o = self.run_imediff(data_a, data_b, dst)
+            if file_o is None:
+                print("E: imediff quit without saving {}".format(dst), file=sys.stderr)
+                return False
+            with open(file_o, "rb") as fp:
+                data_o = fp.read()
+            if data_o == data_b:
+                self.vecho("I: no more changes for {}".format(dst))
+                self.commit("{} #{}".format(dst, repeat), [(dst, mode_b, sha_b)])
+                break
+            elif data_o == data_a:
+                self.vecho("I: no commit for {} (try imediff again)".format(dst))
+            else:
+                self.vecho("I: found changes for {}".format(dst))
+                sha_o = self.write_blob(file_o)
+                self.commit("{} #{}".format(dst, repeat), [(dst, mode_b, sha_o)])
+                data_a = data_o
+        self.vecho("I: finish to loop running imediff auto={}".format(self.auto))
+        return True
+
+    def split_by_hunk(self, data_a, data_b, change):
+        """Commit a change of a file by each hunk from the top"""
+        # import here to avoid loading imediff for split by file
+        from imediff.cli import TextData
+
+        status, src, dst, mode_a, mode_b, sha_a, sha_b = change
+        file_o = os.path.join(self.git_dir, "ime_o")
+        args = self.imediff_args(["-o", file_o, dst + ".tmp_a", dst + ".tmp_b"])
+        instance = TextData(
+            decode_lines(data_a), decode_lines(data_b), None, args, self.confs
+        )
+        repeat = 0
+        n_hunks = len(instance.usr_chunk_list)
+        self.vecho("I: split {} into {} hunks".format(dst, n_hunks))
+        for content in instance.iter_split_content():
+            repeat += 1
+            if repeat == n_hunks:
+                self.commit("{} #{}".format(dst, repeat), [(dst, mode_b, sha_b)])
+                break
+            write_lines(file_o, content)
+            sha_o = self.write_blob(file_o)
+            self.commit("{} #{}".format(dst, repeat), [(dst, mode_b, sha_o)])
+        return
+
+    def imediff_args(self, argv):
+        """Return imediff args parsed from argv"""
+        # import here to avoid loading imediff for split by file
+        from imediff.main import set_edit_cmd
+
+        self.vecho("I: imediff {}".format(" ".join(argv)))
+        args = initialize_args(argv)
+        if self.confs is None:
+            self.confs = initialize_confs(args.conf)
+        set_edit_cmd(args, self.confs)
+        return args
+
+    def run_imediff(self, data_a, data_b, path):
+        """Return the output file of imediff merging data_a and data_b or None
+        if imediff quits without saving"""
+        # import here to avoid loading curses for split by file
+        from imediff.tui import TextPad
+
+        file_o = os.path.join(self.git_dir, "ime_o")
+        if os.path.exists(file_o):
+            os.remove(file_o)
+        args = self.imediff_args(["-o", file_o, path + ".tmp_a", path + ".tmp_b"])
+        list_a = decode_lines(data_a)
+        list_b = decode_lines(data_b)
+        instance = TextPad(list_a, list_b, None, args, self.confs)
+        try:
+            instance.main()
+        except SystemExit as _:
+            pass  # quit without saving
+        if not os.path.exists(file_o):
+            return None
+        return file_o
+
+    ####################################################################
+    # main
+    ####################################################################
+    def check_clean(self):
+        """Exit if the working tree isn't clean"""
+        if not self.git_ok("diff", "--cached", "--quiet"):
+            print(
+                "E: staged changes exist.  Commit them or un-stage them first",
+                file=sys.stderr,
+            )
+            print("   --- option 1: git commit")
+            print("   --- option 2: git rm --cached")
+            sys.exit(1)
+        if not self.git_ok("diff", "--quiet"):
+            print(
+                "E: local changes found.  Commit them or reset them first",
+                file=sys.stderr,
+            )
+            print("   --- option 1: git commit --all")
+            print("   --- option 2: git reset --hard HEAD")
+            sys.exit(1)
+        if self.git("ls-files", ".", "--exclude-standard", "--others", "--directory"):
+            print(
+                "E: untracked files exist.  Forcefully clean them all first",
+                file=sys.stderr,
+            )
+            print("   --- option 1: git clean -d -f -x")
+            print("   --- option 2: git add <file> ; git commit (if you need them)")
+            sys.exit(1)
+        return
+
+    def tag(self, prefix):
+        """Tag HEAD if it isn't tagged"""
+        if not self.git_ok("describe", "--tags", "--exact-match", "HEAD"):
+            self.git("tag", "-f", prefix + time_stamp())
+        return
+
+    def split(self, notag):
+        """Split the commit from HEAD^ to HEAD"""
+        self.check_clean()
+        for name in ["rebase-merge", "rebase-apply"]:
+            if os.path.isdir(self.git("rev-parse", "--git-path", name).strip()):
+                notag = True
+        if not notag:
+            self.tag("git-ime-a")
+        head = self.git("rev-parse", "--verify", "--quiet", "HEAD").strip()
+        last = self.git("rev-parse", "--verify", "--quiet", "HEAD^").strip()
+        self.parent = last  # the last split commit
+        self.tree = self.git("rev-parse", last + "^{tree}").strip()
+        self.branch = self.git("symbolic-ref", "--short", "-q", "HEAD", check=False)
+        self.branch = self.branch.strip() or "detached HEAD"
+        changes = parse_raw_diff(
+            os.fsencode(self.git("diff", "--raw", "-z", "--no-abbrev", last, head))
+        )
+        n_paths = 0
+        for status, src, dst, _, _, _, _ in changes:
+            n_paths += 1 if src == dst else 2
+        self.vecho("I: split into {} commits:".format(n_paths))
+        if n_paths == 0:
+            print("E: no changes found from HEAD^ to HEAD", file=sys.stderr)
+            sys.exit(1)
+        self.start()
+        try:
+            # original commit message without comments
+            commit = self.read_object(head)
+            message = commit[commit.find(b"\n\n") + 2 :].decode("utf-8", "replace")
+            self.message = "".join(
+                line
+                for line in message.splitlines(keepends=True)
+                if not line.startswith("#")
+            )
+            if self.message.split("\n", 1)[0] == "-":
+                self.keep = False
+            self.vecho("I: original commit message:")
+            for line in self.message.splitlines():
+                self.vecho("I: > " + line)
+            self.git("read-tree", last, env=self.index_env)
+            if n_paths == 1:
+                done = self.split_by_imediff(changes[0])
+            else:
+                self.split_by_file(changes)
+                done = True
+        finally:
+            # also on sys.exit() from git commands
+            self.stop()
+        if not done and self.parent == last:
+            sys.exit(1)  # keep HEAD since nothing is committed
+        self.git("update-ref", "-m", "git-ime", "HEAD", self.parent, head)
+        if self.tree != self.git("rev-parse", head + "^{tree}").strip():
+            # keep the rest of changes in the working tree
+            self.git("reset", "--quiet")
+            print("E: changes are left uncommitted", file=sys.stderr)
+            done = False
+        if not done:
+            sys.exit(1)
+        if not notag:
+            self.tag("git-ime-z")
+        return
+
+
+##############################################################################
+def main():
+    """
+    Entry point for git-ime command
+
+    Exit value
+        0       normal exit
+        1       error exit
+    """
+    locale.setlocale(locale.LC_ALL, "")
+    args = initialize_gitime_args()
+    result = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        print("Not in the git repository, aborting...", file=sys.stderr)
+        sys.exit(1)
+    os.chdir(os.fsdecode(result.stdout.strip()))
+    gitime = GitIme(args)
+    if args.delete:
+        tags = gitime.git("tag", "--list", "git-ime-*").split()
+        if tags:
+            gitime.git("tag", "-d", *tags)
+        sys.exit(0)
+    logging.basicConfig(
+        format="%(levelname)s: %(filename)s: %(funcName)s: %(message)s",
+        filename=os.path.join(gitime.git_dir, "imediff.log"),
+        level=getattr(logging, gitime.imediff_log),
+    )
+    gitime.split(args.notag)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    flags = doctest.REPORT_NDIFF | doctest.FAIL_FAST
+    fail, total = doctest.testmod(optionflags=flags)
+    print("{} failures out of {} tests -- ".format(fail, total), end="")
+    if fail == 0:
+        sys.exit(0)
+    else:
+        sys.exit(1)
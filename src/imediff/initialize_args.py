@@ -25,16 +25,25 @@ Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301, USA.
 """
 import argparse
+from imediff.constants import ENGINES, FUZZY_MODES
 
 # NO LOGGING YET
 
 
-def initialize_args():
+def positive_int(value):
+    """Return value as int for argparse if it is 1 or more"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("{} is less than 1".format(value))
+    return number
+
+
+def initialize_args(argv=None):
     """
     Parse command line options and arguments
 
     Input:
-        commandline
+        argv    list of arguments (commandline if None)
 
     Return:
         args    argument values
@@ -149,6 +158,36 @@ def initialize_args():
         default=8,
         help="Fuzzy match (partial line length shortening factor/2-depth) x 10, default 8",
     )
+    pa.add_argument(
+        "-E",
+        "--engine",
+        action="store",
+        choices=ENGINES,
+        default=ENGINES[0],
+        help="Line matching diff2 engine (difflib, myers, patience, histogram), default difflib",
+    )
+    pa.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=positive_int,
+        default=1,
+        help="Number of processes to match lines of large files in parallel, default 1",
+    )
+    pa.add_argument(
+        "-P",
+        "--partition",
+        action="store_true",
+        help="Split very large files at unique lines and match them segment by segment",
+    )
+    pa.add_argument(
+        "-Z",
+        "--fuzzy",
+        action="store",
+        choices=FUZZY_MODES,
+        default=FUZZY_MODES[0],
+        help="Fuzzy line matching (shrink: shortened line match, sketch: line similarity, ratio: edit distance), default shrink",
+    )
     pa.add_argument("file_a", nargs="?", help="file for OLDER(diff2), MYFILE(diff3)")
     pa.add_argument(
         "file_b", nargs="?", help="file for NEWER(diff2), OLDFILE=BASE(diff3)"
@@ -159,7 +198,7 @@ def initialize_args():
         help="file for ------------, YOURFILE(diff3) (only for diff3)",
     )
     # pa.add_argument("--poke", "-p", nargs="?", default=None, help=argparse.SUPPRESS)
-    args = pa.parse_args()
+    args = pa.parse_args(argv)
     args.macro_buffer = args.macro
     if args.file_c is not None:
         args.diff_mode = 3
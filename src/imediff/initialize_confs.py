@@ -24,19 +24,129 @@ License along with this program; if not, write to the Free
 Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301, USA.
 """
+from imediff import __version__
 from imediff.config import config_template
 
-import configparser
+import json
 import os
 import sys
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
 
-def initialize_confs(conf):
-    """Process configuration file"""
-    config_file = os.path.expanduser(conf)
+class Confs(dict):
+    """
+    Compiled configuration
+
+    This is a dict of sections of the configuration file.  Each section is
+    a dict of keys to values as str.  Ready-made tables are also kept:
+
+        self.kc:        customized key name to original key name
+        self.rkc:       original key name to customized key name
+        self.attrib:    "color_*" key to list of attribute names
+    """
+
+    def __init__(self, sections):
+        super().__init__(sections)
+        self.kc, self.rkc = compile_keymap(self["key"])
+        self.attrib = dict()
+        for attrib_key, value in self["attrib"].items():
+            self.attrib[attrib_key] = value.split(",")
+
+    def sections(self):
+        return list(self.keys())
+
+
+def compile_keymap(keys):
+    """Return key translation tables (kc, rkc) for [key] section"""
+    # kc converts actual input command keyname to default key bindings command keyname
+    # This affects terminal input only (MACRO uses system key map only)
+    kc = dict()  # customized key code to original key code
+    rkc = dict()  # original key chr to customized key char
+    for select_key, effective_key in keys.items():
+        if select_key[:7] == "select_":
+            typed_key = select_key[7:]
+        else:
+            logger.error("E: unknown select_key: %s", select_key)
+            sys.exit(2)
+        if typed_key == "":
+            typed_key = " "
+        if len(typed_key) > 1:
+            typed_key = typed_key.upper()
+        if effective_key == "":
+            effective_key = " "
+        kc[typed_key] = effective_key
+        rkc[effective_key] = typed_key
+        if (
+            len(typed_key) == 1
+            and len(effective_key) == 1
+            and ord(typed_key) >= ord("a")
+            and ord(typed_key) <= ord("z")
+            and ord(effective_key) >= ord("a")
+            and ord(effective_key) <= ord("z")
+        ):
+            cap_typed_key = typed_key.upper()
+            cap_effective_key = effective_key.upper()
+            kc[cap_typed_key] = cap_effective_key
+            rkc[cap_effective_key] = cap_typed_key
+    return kc, rkc
+
+
+def get_cache_file(config_file):
+    """Return path of cache file for config_file"""
+    cache_dir = os.environ.get("XDG_CACHE_HOME", "")
+    if cache_dir == "":
+        cache_dir = os.path.expanduser("~/.cache")
+    return os.path.join(
+        cache_dir,
+        "imediff",
+        "confs-{:08x}.json".format(zlib.crc32(os.fsencode(config_file))),
+    )
+
+
+def get_cache_key(config_file):
+    """Return list identifying config_file and the template to check cache"""
+    key = [__version__, zlib.crc32(config_template.encode()), config_file]
+    if config_file != "none" and os.path.exists(config_file):
+        stat_result = os.stat(config_file)
+        key += [stat_result.st_mtime_ns, stat_result.st_size]
+    return key
+
+
+def load_cache(cache_file, key):
+    """Return Confs from cache_file or None if it isn't for key"""
+    try:
+        with open(cache_file, encoding="utf-8") as fp:
+            cache = json.load(fp)
+        if cache["key"] == key:
+            return Confs(cache["sections"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # missing or broken cache
+    return None
+
+
+def save_cache(cache_file, key, confs):
+    """Save confs into cache_file (errors are ignored)"""
+    cache = {"key": key, "sections": dict(confs)}
+    temp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_file, "w", encoding="utf-8") as fp:
+            json.dump(cache, fp)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # no cache for read-only home directory etc.
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return
+
+
+def read_confs(conf, config_file):
+    """Return ConfigParser of configuration file (the template if missing)"""
+    import configparser
+
     # Allow inline comment with #
     confs_i = configparser.ConfigParser(inline_comment_prefixes=("#"))
     confs_i.read_string(config_template)
@@ -77,5 +187,28 @@ editing the template obtained by "imediff -t"'''.format(
             sys.exit(2)
     else:
         confs = confs_i
+    return confs
+
+
+def initialize_confs(conf):
+    """
+    Process configuration file and return Confs
+
+    The compiled configuration is cached in ~/.cache/imediff/ and used
+    while the configuration file and the imediff version are unchanged.
+    """
+    config_file = os.path.expanduser(conf)
+    cache_file = get_cache_file(config_file)
+    key = get_cache_key(config_file)
+    confs = load_cache(cache_file, key)
+    if confs is None:
+        confs_parsed = read_confs(conf, config_file)
+        confs = Confs(
+            {
+                section: dict(confs_parsed[section])
+                for section in confs_parsed.sections()
+            }
+        )
+        save_cache(cache_file, key, confs)
     logger.debug("confs: end with len(confs)={}".format(len(confs)))
     return confs
@@ -56,20 +56,24 @@ def install():
     python_dir = os.path.dirname(os.path.dirname(src_dir))
     lib_dir = os.path.dirname(python_dir)
     dest_dir = os.path.dirname(lib_dir)
-    fp = open(dest_dir + "/bin/git-ime", "w")
-    subprocess.run(["mkdir", "-p", dest_dir + "/bin"])
-    subprocess.run(
-        [
-            "sed",
-            "-e",
-            "s/@@version@@/" + __version__ + "/",
-            src_dir + "/data/git-ime.in",
-        ],
-        stdout=fp,
-    )
-    subprocess.run(["rm", "-f", src_dir + "/data/git-ime.in"])
-    subprocess.run(["chmod", "755", dest_dir + "/bin/git-ime"])
-    print("I: successfully installed: " + dest_dir + "/bin/git-ime")
+    if os.path.exists(dest_dir + "/bin/git-ime"):
+        # Python version (imediff.gitime) installed as a script of this package
+        print("I: git-ime is already installed: " + dest_dir + "/bin/git-ime")
+    else:
+        fp = open(dest_dir + "/bin/git-ime", "w")
+        subprocess.run(["mkdir", "-p", dest_dir + "/bin"])
+        subprocess.run(
+            [
+                "sed",
+                "-e",
+                "s/@@version@@/" + __version__ + "/",
+                src_dir + "/data/git-ime.in",
+            ],
+            stdout=fp,
+        )
+        subprocess.run(["rm", "-f", src_dir + "/data/git-ime.in"])
+        subprocess.run(["chmod", "755", dest_dir + "/bin/git-ime"])
+        print("I: successfully installed: " + dest_dir + "/bin/git-ime")
     print("I: manual page for imediff can be found at: " + src_dir + "/imediff.1")
     print("I: manual page for git-ime can be found at: " + src_dir + "/git-ime.1")
     print("I: script for git-mergetool(1) can be found at: " + src_dir + "/imediff")
@@ -7,14 +7,388 @@ Module lines2lib -- matching 2 lines library
 Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
 
 """
-from difflib import SequenceMatcher
+from imediff.constants import FUZZY_MODES
+from imediff.diff2lib import get_sequence_matcher, longest_increasing
+from imediff.fastlib import common_prefix, common_suffix, equal_runs
+from imediff.utils import run_parallel
 
 import re
 import sys
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
+# with partition=True, inputs with at least this number of lines are
+# partitioned at anchor lines
+PARTITION_MIN_LINES = 10000
+
+# minimum number of lines between anchor lines used to partition inputs
+SEGMENT_MIN_LINES = 1000
+
+# length of q-grams and number of their hashes kept in a line sketch
+SKETCH_QGRAM = 3
+SKETCH_SIZE = 16
+
+# minimum sketch similarity to pair lines as fuzzy match
+SKETCH_MIN_SIMILARITY = 0.25
+
+# minimum line_ratio() to pair lines as fuzzy match
+RATIO_MIN = 0.6
+
+# blocks with more line pairs than this are matched by shrinking instead
+FUZZY_MAX_PAIRS = 40000
+
+
+def intern_lines(lines, line_ids):
+    """
+    Return a list of integer IDs for lines
+
+    Each distinct line is mapped to a small integer once and registered in
+    the line_ids dictionary.  Matchers compare these integers instead of
+    rehashing and comparing long strings.  Sharing line_ids across
+    matchers keeps IDs consistent among them.
+
+    >>> line_ids = {}
+    >>> intern_lines(["foo", "bar", "foo"], line_ids)
+    [0, 1, 0]
+    >>> intern_lines(["baz", "bar"], line_ids)
+    [2, 1]
+    """
+    ids = []
+    for line in lines:
+        line_id = line_ids.get(line)
+        if line_id is None:
+            line_id = len(line_ids)
+            line_ids[line] = line_id
+        ids.append(line_id)
+    return ids
+
+
+def line_sketch(line):
+    """
+    Return a sketch of line as a frozenset of q-gram hashes
+
+    The sketch keeps the SKETCH_SIZE smallest CRC-32 values of the q-grams
+    of length SKETCH_QGRAM (bottom-k MinHash).  A line shorter than
+    SKETCH_QGRAM is used as a single q-gram.
+
+    >>> sorted(line_sketch("abcd")) == sorted({zlib.crc32(b"abc"), zlib.crc32(b"bcd")})
+    True
+    >>> line_sketch("") == line_sketch("")
+    True
+    """
+    data = line.encode("utf-8", "surrogateescape")
+    if len(data) <= SKETCH_QGRAM:
+        return frozenset([zlib.crc32(data)])
+    hashes = {
+        zlib.crc32(data[n : n + SKETCH_QGRAM])
+        for n in range(len(data) - SKETCH_QGRAM + 1)
+    }
+    return frozenset(sorted(hashes)[:SKETCH_SIZE])
+
+
+def sketch_similarity(sa, sb):
+    """
+    Return an estimate of the Jaccard similarity of 2 lines from sketches
+
+    The SKETCH_SIZE smallest hashes of the union of the sketches are
+    compared with the hashes found in both sketches.
+
+    >>> sa = line_sketch("value = compute(1, 2)")
+    >>> sketch_similarity(sa, sa)
+    1.0
+    >>> sketch_similarity(sa, line_sketch("value = compute(1, 3)")) > 0.5
+    True
+    >>> sketch_similarity(sa, line_sketch("# comment")) < 0.25
+    True
+    """
+    union = sorted(sa | sb)[:SKETCH_SIZE]
+    common = 0
+    for h in union:
+        if h in sa and h in sb:
+            common += 1
+    return common / len(union)
+
+
+def line_ratio(a, b, cutoff=RATIO_MIN):
+    """
+    Return 1 - (edit distance of a and b) / (length of longer one)
+
+    The edit distance is computed only in a band of the dynamic programming
+    table up to the distance giving cutoff, and stops as soon as a row
+    exceeds it.  If the ratio is below cutoff, 0.0 is returned.
+
+    >>> line_ratio("value=compute(1,2)", "value=compute(1,3)")
+    0.9444444444444444
+    >>> line_ratio("value=compute(1,2)", "#comment")
+    0.0
+    >>> line_ratio("", "")
+    1.0
+    """
+    len_a = len(a)
+    len_b = len(b)
+    len_max = max(len_a, len_b)
+    if len_max == 0:
+        return 1.0
+    k = int((1.0 - cutoff) * len_max)  # maximum edit distance
+    if abs(len_a - len_b) > k:
+        return 0.0
+    big = k + 1
+    # prev[j] and row[j]: edit distance of a[:i] and b[:j] (big if > k)
+    prev = [j if j <= k else big for j in range(len_b + 1)]
+    row = [big] * (len_b + 1)
+    for i in range(1, len_a + 1):
+        lo = max(1, i - k)
+        hi = min(len_b, i + k)
+        row[lo - 1] = i if lo == 1 and i <= k else big
+        row_min = row[lo - 1]
+        char_a = a[i - 1]
+        for j in range(lo, hi + 1):
+            d = prev[j - 1]
+            if char_a != b[j - 1]:
+                d += 1
+            if prev[j] < d:
+                d = prev[j] + 1
+            if row[j - 1] < d:
+                d = row[j - 1] + 1
+            if d > big:
+                d = big
+            row[j] = d
+            if d < row_min:
+                row_min = d
+        if row_min > k:
+            return 0.0
+        prev, row = row, prev
+    if prev[len_b] > k:
+        return 0.0
+    return 1.0 - prev[len_b] / len_max
+
+
+def find_anchors(seqs):
+    """
+    Return list of tuples of indexes of anchor lines to partition seqs
+
+    An anchor line occurs exactly once in each of seqs.  Anchor lines are
+    in the same order in all of seqs, and at least SEGMENT_MIN_LINES lines
+    apart in seqs[0].  Segments between anchor lines can be matched
+    independently.  If seqs[0] has less than PARTITION_MIN_LINES lines,
+    this returns [].
+    """
+    len_seq = len(seqs[0])
+    if len_seq < PARTITION_MIN_LINES:
+        return []
+    # index of unique lines for each of seqs (None for duplicate lines)
+    uniques = []
+    for seq in seqs:
+        index = {}
+        for i, line in enumerate(seq):
+            if line in index:
+                index[line] = None
+            else:
+                index[line] = i
+        uniques.append(index)
+    anchors = []
+    for i, line in enumerate(seqs[0]):
+        if uniques[0][line] is None:
+            continue
+        anchor = [i]
+        for index in uniques[1:]:
+            k = index.get(line)
+            if k is None:
+                break
+            anchor.append(k)
+        else:
+            anchors.append(tuple(anchor))
+    # keep anchors in the same order for all of seqs
+    for n in range(1, len(seqs)):
+        increasing = longest_increasing([anchor[n] for anchor in anchors])
+        anchors = [anchors[x] for x in increasing]
+    # use anchors at least SEGMENT_MIN_LINES lines apart
+    result = []
+    i0 = 0
+    for anchor in anchors:
+        i = anchor[0]
+        if i - i0 >= SEGMENT_MIN_LINES and len_seq - i > SEGMENT_MIN_LINES:
+            result.append(anchor)
+            i0 = i + 1
+    logger.debug("find_anchors: %s anchors for %s lines", len(result), len_seq)
+    return result
+
+
+def append_opcode(opcodes, opcode, coalesce=True):
+    """
+    Append opcode to opcodes
+
+    With coalesce=True, an 'E' opcode contiguous to the last 'E' opcode is
+    merged into it.  This works for both 5-tuples and 7-tuples.
+
+    >>> opcodes = [("N", 0, 1, 0, 2), ("E", 1, 3, 2, 4)]
+    >>> append_opcode(opcodes, ("E", 3, 4, 4, 5))
+    >>> opcodes
+    [('N', 0, 1, 0, 2), ('E', 1, 4, 2, 5)]
+    """
+    if coalesce and opcode[0] == "E" and opcodes and opcodes[-1][0] == "E":
+        last = opcodes[-1]
+        if all(last[n + 1] == opcode[n] for n in range(1, len(opcode), 2)):
+            merged = ["E"]
+            for n in range(1, len(opcode), 2):
+                merged.append(last[n])
+                merged.append(opcode[n + 1])
+            opcodes[-1] = tuple(merged)
+            return
+    opcodes.append(opcode)
+    return
+
+
+class PreparedLines:
+    """
+    PreparedLines
+
+    A public class to hold a list of lines prepared for LineMatcher.  The
+    filtered lines, their head/tail portions, and their interned integer
+    IDs are computed on demand and cached.  A PreparedLines object may be
+    shared by several LineMatcher objects, e.g., the base of 3-way merge
+    used for both b-a and b-c matching.
+
+    The line_rule value is the same as LineMatcher.  With line_rule=None,
+    lines are used without filtering.
+
+    Example:
+    >>> lines = PreparedLines(["  foo bar\\n", "'Baz'\\n"])
+    >>> lines.get_parts(0, 2)
+    ['foobar', 'Baz']
+    >>> lines.get_parts(0, 2, -1, 2)
+    ['ar', 'az']
+    >>> lines.get_ids(0, 2, -1, 2)
+    [0, 1]
+    >>> lines.segment(1, 2).get_ids(0, 1, -1, 2)
+    [1]
+    """
+
+    def __init__(self, lines=[], line_rule=2, line_ids=None):
+        """
+        Construct a PreparedLines
+
+        """
+        self.lines = lines
+        self.line_rule = line_rule
+        if line_ids is None:
+            line_ids = {}
+        self.line_ids = line_ids
+        if line_rule is None:
+            re_preform = None
+        elif not (line_rule >= 0 and line_rule < 20):
+            logger.error("E: line_rule should be between 0 and 19 but %s", line_rule)
+            sys.exit(2)
+        # line_rule:
+        # 0      r""        -- drop none between text, but strip
+        # 1      r"\s+"     -- drop all whitespaces
+        # 2      r"[\s\"']" -- drop all whitespaces and quotes (default)
+        # 3      r"\W+"     -- drop all non-alphanumerics
+        # 10     r""        -- drop none between text, but strip and lowercase
+        # 11     r"\s+"     -- drop all whitespaces and lowercase
+        # 12     r"[\s\"']" -- drop all whitespaces and quotes and lowercase
+        # 13     r"\W+"     -- drop all non-alphanumerics and lowercase
+        elif (line_rule % 10) == 0:
+            re_preform = re.compile(r"")
+        elif (line_rule % 10) == 1:
+            re_preform = re.compile(r"\s+")
+        elif (line_rule % 10) == 2:
+            re_preform = re.compile(r"[\s\"']+")
+        elif (line_rule % 10) == 3:
+            re_preform = re.compile(r"\W+")
+        else:
+            re_preform = re.compile(r"")
+        self.re_preform = re_preform
+        # cache of filtered lines, their parts and IDs for (side, line_max)
+        self.filtered = [None] * len(lines)
+        self.parts = {}
+        self.ids = {}
+        # cache of sketches of filtered lines
+        self.sketches = {}
+        # cache of line_ratio() for pairs of line IDs
+        self.ratios = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def get_filtered(self, i):
+        """Return filtered line of lines[i]"""
+
+        filtered = self.filtered[i]
+        if filtered is None:
+            if self.re_preform is None:
+                filtered = self.lines[i]
+            elif self.line_rule < 10:
+                filtered = self.re_preform.sub("", self.lines[i]).strip()
+            else:
+                filtered = self.re_preform.sub("", self.lines[i]).strip().lower()
+            self.filtered[i] = filtered
+        return filtered
+
+    def get_sketch(self, i):
+        """Return line_sketch() of filtered line of lines[i]"""
+
+        sketch = self.sketches.get(i)
+        if sketch is None:
+            sketch = self.sketches[i] = line_sketch(self.get_filtered(i))
+        return sketch
+
+    def get_parts(self, i1, i2, side=0, line_max=0):
+        """Return list of filtered lines for lines[i1:i2]
+
+        side=0 for full lines, side=1 for heads of length line_max, and
+        side=-1 for tails of length line_max.
+        """
+
+        key = (side, line_max) if side else (0, 0)
+        cache = self.parts.get(key)
+        if cache is None:
+            cache = self.parts[key] = {}
+        parts = []
+        for i in range(i1, i2):
+            part = cache.get(i)
+            if part is None:
+                if side == 0:
+                    part = self.get_filtered(i)
+                elif side == 1:
+                    part = self.get_filtered(i)[:line_max]
+                else:  # side == -1
+                    part = self.get_filtered(i)[-line_max:]
+                cache[i] = part
+            parts.append(part)
+        return parts
+
+    def get_ids(self, i1, i2, side=0, line_max=0):
+        """Return list of interned IDs for get_parts(i1, i2, side, line_max)"""
+
+        key = (side, line_max) if side else (0, 0)
+        cache = self.ids.get(key)
+        if cache is None:
+            cache = self.ids[key] = {}
+        for i in range(i1, i2):
+            if i not in cache:
+                break
+        else:
+            return [cache[i] for i in range(i1, i2)]
+        ids = intern_lines(self.get_parts(i1, i2, side, line_max), self.line_ids)
+        for i in range(i1, i2):
+            cache[i] = ids[i - i1]
+        return ids
+
+    def segment(self, i1, i2):
+        """Return PreparedLines for lines[i1:i2]
+
+        It shares the line_ids dictionary and the cache of line_ratio() with
+        this object, and starts with the filtered lines already computed.
+        """
+
+        prepared = PreparedLines(self.lines[i1:i2], self.line_rule, self.line_ids)
+        prepared.filtered = self.filtered[i1:i2]
+        prepared.ratios = self.ratios
+        return prepared
+
 
 class LineMatcher:
     """
@@ -46,12 +420,57 @@ class LineMatcher:
     * line_min     -- final   length to compare (lower limit, default=1)
     * line_factor  -- length shortening factor (default=8 for x0.8)
 
+    The way to find fuzzy matches in blocks of lines not matched after
+    filtering is selected by the fuzzy value:
+
+    * "shrink" -- match head and tail portions of shrinking length (default)
+    * "sketch" -- pair lines by similarity of their q-gram sketches
+    * "ratio"  -- pair lines by ratio of their edit distance
+
+    In "sketch" mode, a sketch of each filtered line is computed once and
+    lines of a block are paired in order to maximize the sum of their
+    similarity (SKETCH_MIN_SIMILARITY or more) in a single pass.  In
+    "ratio" mode, lines are paired the same way by line_ratio() (RATIO_MIN
+    or more) cached for each pair of lines, and a single line replaced by a
+    single line is 'F' only if its line_ratio() is RATIO_MIN or more.
+    Blocks with more than FUZZY_MAX_PAIRS line pairs are matched by
+    "shrink".
+
     The resulting tag from Linematcher class object are:
 
     * 'E' ----------------------- for a[j1:j2] == b[i1:i2] -- exact match
     * 'N' ----------------------- for a[j1:j2] != b[i1:i2] -- no match
     * 'F' ----------------------- for a[j1:j2] != b[i1:i2] -- fuzzy match
 
+    By default, each 'E' and 'F' opcode covers a single line.  With
+    coalesce=True, contiguous exactly matching lines are returned as a single
+    'E' range opcode while 'F' opcodes stay single-line.  This keeps the
+    number of opcodes proportional to the number of changes instead of the
+    number of lines.
+
+    The underlying diff2 engine is selected by the engine value:
+
+    * "difflib" -- difflib.SequenceMatcher (default)
+    * "myers"   -- Myers O(ND) algorithm (shortest edit script)
+    * "patience" -- patience algorithm (anchor on unique lines first)
+    * "histogram" -- histogram algorithm (anchor on rare lines first)
+
+    The common prefix and suffix lines of a and b are returned as 'E'
+    without matching, and only the remaining middle lines are filtered and
+    matched.  Since they are aligned first, changes next to repeated lines
+    may be placed differently from the engine alone.
+
+    With partition=True, large inputs (PARTITION_MIN_LINES or more lines)
+    are partitioned into segments at anchor lines occurring once in each of
+    a and b.  Segments are matched independently on the same PreparedLines,
+    in up to jobs worker processes.  Since no match may cross an anchor
+    line, the result may differ from the one without partitioning.
+
+    The filtered lines and their head/tail portions are interned to integer
+    IDs before matching.  Each of a and b may be given as a PreparedLines
+    object to share this work among LineMatcher objects.  Otherwise, it is
+    prepared with line_rule and the line_ids dictionary.
+
     Example:
     >>> a = [   "line 1 abcde\\n",
     ...         "line 2 qazws\\n",
@@ -127,6 +546,34 @@ class LineMatcher:
     match: 13 -> 14, tag = F
         a: line Z abcde
         b: l i n e Z 'a b c d' "e
+
+    Example with coalesce=True:
+    >>> a = ["same 1\\n", "same 2\\n", "same 3\\n", "fuzzy 4\\n", "same 5\\n"]
+    >>> b = ["same 1\\n", "same 2\\n", "same 3\\n", " fuzzy  4\\n", "same 5\\n"]
+    >>> LineMatcher(a, b, coalesce=True).get_opcodes()
+    [('E', 0, 3, 0, 3), ('F', 3, 4, 3, 4), ('E', 4, 5, 4, 5)]
+    >>> LineMatcher(a, b).get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('E', 0, 1, 0, 1), ('E', 1, 2, 1, 2), ('E', 2, 3, 2, 3),
+     ('F', 3, 4, 3, 4), ('E', 4, 5, 4, 5)]
+
+    Opcodes can be consumed one by one with iter_opcodes():
+    >>> next(LineMatcher(a, b, coalesce=True).iter_opcodes())
+    ('E', 0, 3, 0, 3)
+
+    Example with fuzzy="sketch":
+    >>> a = ["keep\\n", "value = 1\\n", "total = sum(x)\\n", "keep\\n"]
+    >>> b = ["keep\\n", "# new\\n", "total = sum(y)\\n", "value = 2\\n", "keep\\n"]
+    >>> LineMatcher(a, b, fuzzy="sketch").get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('E', 0, 1, 0, 1), ('N', 1, 1, 1, 3), ('F', 1, 2, 3, 4), ('N', 2, 3, 4, 4),
+     ('E', 3, 4, 4, 5)]
+
+    Example with fuzzy="ratio":
+    >>> a = ["keep\\n", "x = 1\\n", "keep\\n", "total = sum(x)\\n"]
+    >>> b = ["keep\\n", "# new comment\\n", "keep\\n", "total = sum(y)\\n"]
+    >>> LineMatcher(a, b).get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('E', 0, 1, 0, 1), ('F', 1, 2, 1, 2), ('E', 2, 3, 2, 3), ('F', 3, 4, 3, 4)]
+    >>> LineMatcher(a, b, fuzzy="ratio").get_opcodes() # doctest: +NORMALIZE_WHITESPACE
+    [('E', 0, 1, 0, 1), ('N', 1, 2, 1, 2), ('E', 2, 3, 2, 3), ('F', 3, 4, 3, 4)]
     """
 
     def __init__(
@@ -138,6 +585,12 @@ class LineMatcher:
         line_min=1,  # final   length to compare (lower limit)
         line_factor=8,  # length shortening factor
         # 8 for 80% of length_before every 2 steps
+        coalesce=False,  # return contiguous 'E' lines as a single range
+        engine="difflib",  # diff2 engine: "difflib", "myers", ...
+        line_ids=None,  # shared dictionary to intern lines to integer IDs
+        jobs=1,  # number of processes to match segments
+        partition=False,  # partition large inputs at anchor lines
+        fuzzy="shrink",  # fuzzy matching mode: one of FUZZY_MODES
     ):
         """
         Construct a LineMatcher object using whitespace filtered object and _LineMatcher internal object
@@ -146,79 +599,202 @@ class LineMatcher:
         """
 
         # initialize
-        self.a = a
-        self.b = b
-        if not (line_rule >= 0 and line_rule < 20):
-            logger.error(
-                "E: line_rule should be between 0 and 19 but {}".format(line_rule)
-            )
+        if isinstance(a, PreparedLines):
+            prepared_a = a
+            if line_ids is None:
+                line_ids = prepared_a.line_ids
+        else:
+            prepared_a = None
+        if isinstance(b, PreparedLines):
+            prepared_b = b
+            if line_ids is None:
+                line_ids = prepared_b.line_ids
+        else:
+            prepared_b = None
+        if line_ids is None:
+            line_ids = {}
+        if prepared_a is None:
+            prepared_a = PreparedLines(a, line_rule, line_ids)
+        if prepared_b is None:
+            prepared_b = PreparedLines(b, line_rule, line_ids)
+        self.prepared_a = prepared_a
+        self.prepared_b = prepared_b
+        self.a = a = prepared_a.lines
+        self.b = b = prepared_b.lines
+        self.line_rule = line_rule
+        self.line_max = line_max
+        self.line_min = line_min
+        self.line_factor = line_factor
+        self.coalesce = coalesce
+        self.engine = engine
+        self.line_ids = line_ids
+        self.jobs = jobs
+        if fuzzy not in FUZZY_MODES:
+            logger.error("E: fuzzy should be one of %s but %s", FUZZY_MODES, fuzzy)
             sys.exit(2)
-        # line_rule:
-        # 0      r""        -- drop none between text, but strip
-        # 1      r"\s+"     -- drop all whitespaces
-        # 2      r"[\s\"']" -- drop all whitespaces and quotes (default)
-        # 3      r"\W+"     -- drop all non-alphanumerics
-        # 10     r""        -- drop none between text, but strip and lowercase
-        # 11     r"\s+"     -- drop all whitespaces and lowercase
-        # 12     r"[\s\"']" -- drop all whitespaces and quotes and lowercase
-        # 13     r"\W+"     -- drop all non-alphanumerics and lowercase
-        if (line_rule % 10) == 0:
-            re_preform = re.compile(r"")
-        elif (line_rule % 10) == 1:
-            re_preform = re.compile(r"\s+")
-        elif (line_rule % 10) == 2:
-            re_preform = re.compile(r"[\s\"']+")
-        elif (line_rule % 10) == 3:
-            re_preform = re.compile(r"\W+")
+        self.fuzzy = fuzzy
+        # trim common prefix and suffix of exact match lines
+        len_a = len(a)
+        len_b = len(b)
+        n_max = min(len_a, len_b)
+        if a == b:
+            # identical inputs
+            n_pre = n_max
         else:
-            re_preform = re.compile(r"")
-        self.a_int = []
-        for ax in a:
-            if line_rule < 10:
-                filtered_ax = re_preform.sub("", ax).strip()
-            else:
-                filtered_ax = re_preform.sub("", ax).strip().lower()
-            self.a_int.append(filtered_ax)
-        self.b_int = []
-        for bx in b:
-            if line_rule < 10:
-                filtered_bx = re_preform.sub("", bx).strip()
-            else:
-                filtered_bx = re_preform.sub("", bx).strip().lower()
-            self.b_int.append(filtered_bx)
+            n_pre = common_prefix([a, b], n_max)
+        n_suf = common_suffix([a, b], n_max - n_pre)
+        self.n_pre = n_pre
+        self.n_suf = n_suf
+        # anchor lines in the middle to partition large inputs
+        self.anchors = []
+        if partition:
+            for i, j in find_anchors(
+                [a[n_pre : len_a - n_suf], b[n_pre : len_b - n_suf]]
+            ):
+                self.anchors.append((n_pre + i, n_pre + j))
+        if self.anchors:
+            # segments are matched in iter_opcodes()
+            self.int = None
+            return
+        # only lines between them are filtered and matched
         self.int = _LineMatcher(
-            self.a_int,
-            self.b_int,
-            0,
-            len(self.a_int),
-            0,
-            len(self.b_int),
+            self.prepared_a,
+            self.prepared_b,
+            n_pre,
+            len_a - n_suf,
+            n_pre,
+            len_b - n_suf,
             line_max=line_max,
             line_min=line_min,
             line_factor=line_factor,
+            coalesce=coalesce,
+            engine=engine,
+            fuzzy=fuzzy,
         )
 
     def get_opcodes(self):
+        return list(self.iter_opcodes())
+
+    def iter_opcodes(self):
+        """
+        Yield opcodes one by one in the same order as get_opcodes()
+        """
+        n_pre = self.n_pre
+        n_suf = self.n_suf
+        # common prefix
+        if self.coalesce:
+            if n_pre > 0:
+                yield ("E", 0, n_pre, 0, n_pre)
+        else:
+            for i in range(n_pre):
+                yield ("E", i, i + 1, i, i + 1)
+        if self.int is None:
+            yield from self._iter_opcodes_segments()
+        else:
+            yield from self._iter_opcodes_middle()
+        # common suffix
+        i0 = len(self.a) - n_suf
+        j0 = len(self.b) - n_suf
+        if self.coalesce:
+            if n_suf > 0:
+                yield ("E", i0, i0 + n_suf, j0, j0 + n_suf)
+        else:
+            for i in range(n_suf):
+                yield ("E", i0 + i, i0 + i + 1, j0 + i, j0 + i + 1)
+
+    def _iter_opcodes_segments(self):
+        """
+        Yield opcodes for the middle lines matched segment by segment
+        between anchor lines
+        """
+        ends = self.anchors + [(len(self.a) - self.n_suf, len(self.b) - self.n_suf)]
+        tasks = []
+        i0 = j0 = self.n_pre
+        for i, j in ends:
+            tasks.append((self._segment_opcodes, (i0, i, j0, j)))
+            i0 = i + 1
+            j0 = j + 1
+        # the last opcode is kept pending until it can not be merged
         match = []
-        for tag, i1, i2, j1, j2 in self.int.get_opcodes():
-            # this is match for self.int only
-            if tag == "E":
-                if self.a[i1] == self.b[j1]:
+        for n, opcodes in enumerate(run_parallel(tasks, self.jobs)):
+            for opcode in opcodes:
+                append_opcode(match, opcode, self.coalesce)
+                if len(match) > 1:
+                    yield match.pop(0)
+            if n < len(self.anchors):
+                # anchor line
+                i, j = ends[n]
+                append_opcode(match, ("E", i, i + 1, j, j + 1), self.coalesce)
+                if len(match) > 1:
+                    yield match.pop(0)
+        yield from match
+
+    def _segment_opcodes(self, i1, i2, j1, j2):
+        """
+        Return opcodes for a[i1:i2] and b[j1:j2] matched on the shared
+        PreparedLines as a task for run_parallel()
+        """
+        matcher = _LineMatcher(
+            self.prepared_a,
+            self.prepared_b,
+            i1,
+            i2,
+            j1,
+            j2,
+            line_max=self.line_max,
+            line_min=self.line_min,
+            line_factor=self.line_factor,
+            coalesce=self.coalesce,
+            engine=self.engine,
+            fuzzy=self.fuzzy,
+        )
+        return list(self._iter_opcodes_split(matcher))
+
+    def _iter_opcodes_middle(self):
+        """
+        Yield opcodes for the middle lines from _LineMatcher
+        """
+        return self._iter_opcodes_split(self.int)
+
+    def _iter_opcodes_split(self, matcher):
+        """
+        Yield opcodes from _LineMatcher matcher with its filtered matches
+        split into exact and fuzzy matches
+        """
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            # this is match for matcher only
+            if tag != "E":
+                yield (tag, i1, i2, j1, j2)
+                continue
+            # split filtered match into runs of real exact match and
+            # single-line fuzzy match (match after filter)
+            for x1, x2, equal in equal_runs(self.a[i1:i2], self.b[j1:j2]):
+                if equal and self.coalesce:
                     # real exact match
-                    tag = "E"
-                else:
-                    # match after filter is fuzzy match
-                    tag = "F"
-            match.append((tag, i1, i2, j1, j2))
-        return match
+                    yield ("E", i1 + x1, i1 + x2, j1 + x1, j1 + x2)
+                    continue
+                for x in range(x1, x2):
+                    if equal:
+                        # real exact match
+                        yield ("E", i1 + x, i1 + x + 1, j1 + x, j1 + x + 1)
+                    else:
+                        # match after filter is fuzzy match
+                        yield ("F", i1 + x, i1 + x + 1, j1 + x, j1 + x + 1)
 
     def _dump_opcodes(self):
         """
         private function to dump internal data state of class object for
         LineMatcher class
         """
-        for tag, i1, i2, j1, j2 in self.get_opcodes():
-            if (i1 + 1) == i2 and (j1 + 1) == j2:
+        for tag, i1, i2, j1, j2 in self.iter_opcodes():
+            if tag == "E" and (i2 - i1) > 1:
+                # expand coalesced exact match range
+                for i in range(i1, i2):
+                    j = j1 + (i - i1)
+                    print("match: {} -> {}, tag = {}".format(i, j, tag))
+                    print("    a: {}".format(self.a[i]).rstrip())
+                    print("    b: {}".format(self.b[j]).rstrip())
+            elif (i1 + 1) == i2 and (j1 + 1) == j2:
                 print("match: {} -> {}, tag = {}".format(i1, j1, tag))
                 print("    a: {}".format(self.a[i1]).rstrip())
                 print("    b: {}".format(self.b[j1]).rstrip())
@@ -226,12 +802,20 @@ class LineMatcher:
                 print("UNmatch: {}:{} -> {}:{}, tag = {}".format(i1, i2, j1, j2, tag))
 
 
+def line_matcher_opcodes(*args):
+    """Return LineMatcher(*args).get_opcodes() as a task for run_parallel()"""
+
+    return LineMatcher(*args).get_opcodes()
+
+
 class _LineMatcher:
     """
     _LineMatcher
 
     A private class to help manage 2 lists of similar lines by finding
-    matching lines including partial line matches.
+    matching lines including partial line matches.  The lines a and b are
+    PreparedLines objects sharing line_ids.  Lists of lines are used as
+    they are without filtering.
 
     Example:
     >>> a = [   "line1abcde",
@@ -323,6 +907,9 @@ class _LineMatcher:
         line_min=1,  # final   length to compare (lower limit)
         line_factor=8,  # length shortening factor
         # 8 for 80% of length_before every 2 steps
+        coalesce=False,  # return contiguous 'E' lines as a single range
+        engine="difflib",  # diff2 engine: "difflib", "myers", ...
+        fuzzy="shrink",  # fuzzy matching mode: one of FUZZY_MODES
     ):
         """
         Construct a _LineMatcher
@@ -330,6 +917,10 @@ class _LineMatcher:
         """
 
         # initialize
+        if not isinstance(a, PreparedLines):
+            a = PreparedLines(a, None)
+        if not isinstance(b, PreparedLines):
+            b = PreparedLines(b, None, a.line_ids)
         self.a = a
         self.b = b
         self.is1 = is1
@@ -339,108 +930,130 @@ class _LineMatcher:
         self.depth = depth
         self.line_min = line_min
         self.line_factor = line_factor
+        self.coalesce = coalesce
+        self.engine = engine
+        self.fuzzy = fuzzy
+        self.ratios = a.ratios
         maxlen = 0
-        for i in range(is1, is2):
-            len_a = len(a[i])
+        for line in a.get_parts(is1, is2):
+            len_a = len(line)
             if len_a > maxlen:
                 maxlen = len_a
-        for j in range(js1, js2):
-            len_b = len(b[j])
+        for line in b.get_parts(js1, js2):
+            len_b = len(line)
             if len_b > maxlen:
                 maxlen = len_b
         self.line_max = min(line_max, maxlen // 2)
 
     def get_opcodes(self):
+        debug = logger.isEnabledFor(logging.DEBUG)
         if self.depth == 0:  # depth = 0
             side = 0
             logger.debug(
-                "{}_LineMatcher ===  a[{}:{}]/b[{}:{}]  ===  line_full[:]  ===".format(
-                    "    " * self.depth, self.is1, self.is2, self.js1, self.js2
-                ),
+                "%s_LineMatcher ===  a[%s:%s]/b[%s:%s]  ===  line_full[:]  ===",
+                "    " * self.depth,
+                self.is1,
+                self.is2,
+                self.js1,
+                self.js2,
             )
         elif self.depth > 0:  # depth > 0
             if self.depth % 2 == 1:  # depth = 1, 3, 5, ...
                 side = +1
                 logger.debug(
-                    "{}_LineMatcher ===  a[{}:{}]/b[{}:{}]  ===  line_head[:{:02d}] ===".format(
-                        "    " * self.depth,
-                        self.is1,
-                        self.is2,
-                        self.js1,
-                        self.js2,
-                        self.line_max,
-                    ),
+                    "%s_LineMatcher ===  a[%s:%s]/b[%s:%s]  ===  line_head[:%02d] ===",
+                    "    " * self.depth,
+                    self.is1,
+                    self.is2,
+                    self.js1,
+                    self.js2,
+                    self.line_max,
                 )
             else:  # self.depth % 2 == 0:  # depth = 2, 4, 6, ...
                 side = -1
                 logger.debug(
-                    "{}_LineMatcher ===  a[{}:{}]/b[{}:{}]  ===  line_tail[-{:02d}:] ===".format(
-                        "    " * self.depth,
-                        self.is1,
-                        self.is2,
-                        self.js1,
-                        self.js2,
-                        self.line_max,
-                    ),
+                    "%s_LineMatcher ===  a[%s:%s]/b[%s:%s]  ===  line_tail[-%02d:] ===",
+                    "    " * self.depth,
+                    self.is1,
+                    self.is2,
+                    self.js1,
+                    self.js2,
+                    self.line_max,
                 )
         else:
             logger.error(
-                "{}_LineMatcher ===  a[{}:{}]/b[{}:{}]  ===  depth should not be negative".format(
-                    "!!!!" * self.depth, self.is1, self.is2, self.js1, self.js2
-                )
+                "%s_LineMatcher ===  a[%s:%s]/b[%s:%s]  ===  depth should not be negative",
+                "!!!!" * self.depth,
+                self.is1,
+                self.is2,
+                self.js1,
+                self.js2,
             )
             sys.exit(2)
         if side == 0:
-            # self.is1, self.is2, self.js1, self.js2 are known to cover all
             side_id = "full"
-            am = self.a
-            bm = self.b
         elif side == 1:  # left side match (odd-depth)
             side_id = "head"
-            am = []
-            bm = []
-            for i in range(self.is1, self.is2):
-                am.append(self.a[i][: self.line_max])
-            for j in range(self.js1, self.js2):
-                bm.append(self.b[j][: self.line_max])
         else:  # side == -1, right side match (even-depth)
             side_id = "tail"
-            am = []
-            bm = []
+        am = self.a.get_parts(self.is1, self.is2, side, self.line_max)
+        bm = self.b.get_parts(self.js1, self.js2, side, self.line_max)
+        if debug:
             for i in range(self.is1, self.is2):
-                am.append(self.a[i][-self.line_max :])
+                logger.debug(
+                    "%s_LineMatcher_filter a[%s] -> %s:am[%s]='%s'",
+                    "    " * self.depth,
+                    i,
+                    side_id,
+                    i - self.is1,
+                    am[i - self.is1],
+                )
             for j in range(self.js1, self.js2):
-                bm.append(self.b[j][-self.line_max :])
-        for i in range(self.is1, self.is2):
-            logger.debug(
-                "{}_LineMatcher_filter a[{}] -> {}:am[{}]='{}'".format(
-                    "    " * self.depth, i, side_id, i - self.is1, am[i - self.is1]
-                ),
-            )
-        for j in range(self.js1, self.js2):
-            logger.debug(
-                "{}_LineMatcher_filter b[{}] -> {}:bm[{}]='{}'".format(
-                    "    " * self.depth, j, side_id, j - self.js1, bm[j - self.js1]
-                ),
-            )
-        seq = SequenceMatcher(None, am, bm)
+                logger.debug(
+                    "%s_LineMatcher_filter b[%s] -> %s:bm[%s]='%s'",
+                    "    " * self.depth,
+                    j,
+                    side_id,
+                    j - self.js1,
+                    bm[j - self.js1],
+                )
+        # compare interned integer IDs instead of strings
+        seq = get_sequence_matcher(
+            self.engine,
+            None,
+            self.a.get_ids(self.is1, self.is2, side, self.line_max),
+            self.b.get_ids(self.js1, self.js2, side, self.line_max),
+        )
         match = []
         for tag, i1, i2, j1, j2 in seq.get_opcodes():
-            logger.debug(
-                "{}<< SequenceMatcher_tag={}  ===  a[{}:{}]/b[{}:{}]".format(
+            if debug:
+                logger.debug(
+                    "%s<< SequenceMatcher_tag=%s  ===  a[%s:%s]/b[%s:%s]",
                     "    " * self.depth,
                     tag,
                     i1 + self.is1,
                     i2 + self.is1,
                     j1 + self.js1,
                     j2 + self.js1,
-                ),
-            )
+                )
             ip1 = self.is1 + i1
             ip2 = self.is1 + i2
             jp1 = self.js1 + j1
             jp2 = self.js1 + j2
-            if tag == "equal":
+            if tag == "equal" and side == 0 and self.coalesce:
+                # multi line section and equal for filtered lines
+                # full match on filtered lines as a single range
+                match.append(("E", ip1, ip2, jp1, jp2))
+                if debug:
+                    logger.debug(
+                        "%s>> _LineMatcher_tag=E  ===  a[%s:%s]/b[%s:%s]  === full match",
+                        "    " * self.depth,
+                        ip1,
+                        ip2,
+                        jp1,
+                        jp2,
+                    )
+            elif tag == "equal":
                 # multi line section and equal for filtered lines
                 for i in range(i1, i2):
                     ip = self.is1 + i
@@ -448,45 +1061,87 @@ class _LineMatcher:
                     if side == 0:
                         # full match on filtered line
                         match.append(("E", ip, ip + 1, jp, jp + 1))
-                        logger.debug(
-                            "{}>> _LineMatcher_tag=E  ===  a[{}:{}]/b[{}:{}]  === full match".format(
-                                "    " * self.depth, ip, ip + 1, jp, jp + 1
-                            ),
-                        )
+                        if debug:
+                            logger.debug(
+                                "%s>> _LineMatcher_tag=E  ===  a[%s:%s]/b[%s:%s]  === full match",
+                                "    " * self.depth,
+                                ip,
+                                ip + 1,
+                                jp,
+                                jp + 1,
+                            )
                     else:
                         # partial match only (F for fuzzy)
                         match.append(("F", ip, ip + 1, jp, jp + 1))
-                        logger.debug(
-                            "{}>> _LineMatcher_tag=F  ===  a[{}:{}]/b[{}:{}]  === fuzzy match".format(
-                                "    " * self.depth, ip, ip + 1, jp, jp + 1
-                            ),
-                        )
+                        if debug:
+                            logger.debug(
+                                "%s>> _LineMatcher_tag=F  ===  a[%s:%s]/b[%s:%s]  === fuzzy match",
+                                "    " * self.depth,
+                                ip,
+                                ip + 1,
+                                jp,
+                                jp + 1,
+                            )
             elif i1 == i2 or j1 == j2:
                 # delete "a" or delete "b" for filtered lines
                 match.append(("N", ip1, ip2, jp1, jp2))
-                logger.debug(
-                    "{}>> _LineMatcher_tag=N  ===  a[{}:{}]/b[{}:{}]  === delete one side".format(
-                        "    " * self.depth, ip1, ip2, jp1, jp2
-                    ),
-                )
-            elif (i1 + 1) == i2 and (j1 + 1) == j2:
+                if debug:
+                    logger.debug(
+                        "%s>> _LineMatcher_tag=N  ===  a[%s:%s]/b[%s:%s]  === delete one side",
+                        "    " * self.depth,
+                        ip1,
+                        ip2,
+                        jp1,
+                        jp2,
+                    )
+            elif (
+                (i1 + 1) == i2
+                and (j1 + 1) == j2
+                and (self.fuzzy != "ratio" or self._get_ratio(ip1, jp1) > 0.0)
+            ):
                 # single line match -> assume fuzzy match without checking
-                # even though this is not equal
+                # even though this is not equal (checked with "ratio")
                 match.append(("F", ip1, ip2, jp1, jp2))
-                logger.debug(
-                    "{}>> _LineMatcher_tag=N  ===  a[{}:{}]/b[{}:{}]  === fuzzy non-match (single line)".format(
-                        "    " * self.depth, ip1, ip2, jp1, jp2
-                    ),
-                )
+                if debug:
+                    logger.debug(
+                        "%s>> _LineMatcher_tag=N  ===  a[%s:%s]/b[%s:%s]  === fuzzy non-match (single line)",
+                        "    " * self.depth,
+                        ip1,
+                        ip2,
+                        jp1,
+                        jp2,
+                    )
             else:  # fuzzy match was not resolved
                 # dig deeper for multi-line changes to find fuzzy matches
-                if side == 0:  # full
+                if (
+                    side == 0
+                    and self.fuzzy != "shrink"
+                    and (ip2 - ip1) * (jp2 - jp1) <= FUZZY_MAX_PAIRS
+                ):
+                    # pair lines by similarity in a single pass
+                    if debug:
+                        logger.debug(
+                            "%s>> _LineMatcher_tag=?  ===  a[%s:%s]/b[%s:%s]  === pair by %s",
+                            "    " * self.depth,
+                            ip1,
+                            ip2,
+                            jp1,
+                            jp2,
+                            self.fuzzy,
+                        )
+                    match.extend(self._get_paired_opcodes(ip1, ip2, jp1, jp2))
+                elif side == 0:  # full
                     # full -> left side
-                    logger.debug(
-                        "{}>> _LineMatcher_tag=?  ===  a[{}:{}]/b[{}:{}]  === dig deeper depth={} from full".format(
-                            "    " * self.depth, ip1, ip2, jp1, jp2, self.depth + 1
-                        ),
-                    )
+                    if debug:
+                        logger.debug(
+                            "%s>> _LineMatcher_tag=?  ===  a[%s:%s]/b[%s:%s]  === dig deeper depth=%s from full",
+                            "    " * self.depth,
+                            ip1,
+                            ip2,
+                            jp1,
+                            jp2,
+                            self.depth + 1,
+                        )
                     match.extend(
                         _LineMatcher(
                             a=self.a,
@@ -497,15 +1152,23 @@ class _LineMatcher:
                             js2=jp2,
                             line_max=self.line_max,
                             depth=self.depth + 1,
+                            coalesce=self.coalesce,
+                            engine=self.engine,
+                            fuzzy=self.fuzzy,
                         ).get_opcodes()
                     )
                 elif side == +1:  # head side
                     # left side -> right side
-                    logger.debug(
-                        "{}>> _LineMatcher_tag=?  ===  a[{}:{}]/b[{}:{}]  === dig deeper depth={} from full/tail".format(
-                            "    " * self.depth, ip1, ip2, jp1, jp2, self.depth + 1
-                        ),
-                    )
+                    if debug:
+                        logger.debug(
+                            "%s>> _LineMatcher_tag=?  ===  a[%s:%s]/b[%s:%s]  === dig deeper depth=%s from full/tail",
+                            "    " * self.depth,
+                            ip1,
+                            ip2,
+                            jp1,
+                            jp2,
+                            self.depth + 1,
+                        )
                     match.extend(
                         _LineMatcher(
                             a=self.a,
@@ -516,12 +1179,16 @@ class _LineMatcher:
                             js2=jp2,
                             line_max=self.line_max,
                             depth=self.depth + 1,
+                            coalesce=self.coalesce,
+                            engine=self.engine,
+                            fuzzy=self.fuzzy,
                         ).get_opcodes()
                     )
                 elif self.line_max > self.line_min:  # tail side: side == -1
                     # right side -> left side (shorter)
-                    logger.debug(
-                        "{}>> _LineMatcher_tag=?  ===  a[{}:{}]/b[{}:{}]  === dig deeper depth={} from tail with shorter line_max ={}".format(
+                    if debug:
+                        logger.debug(
+                            "%s>> _LineMatcher_tag=?  ===  a[%s:%s]/b[%s:%s]  === dig deeper depth=%s from tail with shorter line_max =%s",
                             "    " * self.depth,
                             ip1,
                             ip2,
@@ -529,8 +1196,7 @@ class _LineMatcher:
                             jp2,
                             self.depth + 1,
                             self.line_max * self.line_factor // 10,
-                        ),
-                    )
+                        )
                     match.extend(
                         _LineMatcher(
                             a=self.a,
@@ -541,12 +1207,16 @@ class _LineMatcher:
                             js2=jp2,
                             line_max=self.line_max * self.line_factor // 10,
                             depth=self.depth + 1,
+                            coalesce=self.coalesce,
+                            engine=self.engine,
+                            fuzzy=self.fuzzy,
                         ).get_opcodes()
                     )
                 else:
                     # no more shorter, give up as multi-line block change
-                    logger.debug(
-                        "{}>> _LineMatcher_tag=N  ===  a[{}:{}]/b[{}:{}]  === no more depth with line_max {} <= line_min {}".format(
+                    if debug:
+                        logger.debug(
+                            "%s>> _LineMatcher_tag=N  ===  a[%s:%s]/b[%s:%s]  === no more depth with line_max %s <= line_min %s",
                             "    " * self.depth,
                             ip1,
                             ip2,
@@ -554,8 +1224,7 @@ class _LineMatcher:
                             jp2,
                             self.line_max,
                             self.line_min,
-                        ),
-                    )
+                        )
                     match.append(
                         (
                             "N",
@@ -567,6 +1236,76 @@ class _LineMatcher:
                     )
         return match
 
+    def _get_ratio(self, i, j):
+        """Return line_ratio() of filtered a[i] and b[j] cached by line IDs"""
+
+        key = (self.a.get_ids(i, i + 1)[0], self.b.get_ids(j, j + 1)[0])
+        ratio = self.ratios.get(key)
+        if ratio is None:
+            ratio = line_ratio(self.a.get_filtered(i), self.b.get_filtered(j))
+            self.ratios[key] = ratio
+        return ratio
+
+    def _get_paired_opcodes(self, i1, i2, j1, j2):
+        """
+        Return opcodes for a[i1:i2] and b[j1:j2] pairing lines in order to
+        maximize the sum of similarity of paired lines
+
+        The similarity is sketch_similarity() for fuzzy="sketch" and
+        line_ratio() for fuzzy="ratio".
+        """
+        if self.fuzzy == "sketch":
+            sa = [self.a.get_sketch(i) for i in range(i1, i2)]
+            sb = [self.b.get_sketch(j) for j in range(j1, j2)]
+        n = i2 - i1
+        m = j2 - j1
+        # score[x][y]: best sum of similarity for a[i1:i1+x] and b[j1:j1+y]
+        score = [[0.0] * (m + 1) for x in range(n + 1)]
+        for x in range(n):
+            row = score[x]
+            next_row = score[x + 1]
+            for y in range(m):
+                best = row[y + 1]
+                if next_row[y] > best:
+                    best = next_row[y]
+                if self.fuzzy == "sketch":
+                    similarity = sketch_similarity(sa[x], sb[y])
+                    if similarity < SKETCH_MIN_SIMILARITY:
+                        similarity = 0.0
+                else:  # "ratio" (0.0 below RATIO_MIN)
+                    similarity = self._get_ratio(i1 + x, j1 + y)
+                if similarity > 0.0 and row[y] + similarity > best:
+                    best = row[y] + similarity
+                next_row[y + 1] = best
+        # trace back paired lines
+        pairs = []
+        x = n
+        y = m
+        while x > 0 and y > 0:
+            if score[x][y] == score[x - 1][y]:
+                x -= 1
+            elif score[x][y] == score[x][y - 1]:
+                y -= 1
+            else:
+                x -= 1
+                y -= 1
+                pairs.append((x, y))
+        pairs.reverse()
+        pairs.append((n, m))  # sentinel
+        match = []
+        x0 = y0 = 0
+        for x, y in pairs:
+            if (x0 + 1) == x and (y0 + 1) == y and self.fuzzy == "sketch":
+                # single line -> assume fuzzy match as _LineMatcher does
+                match.append(("F", i1 + x0, i1 + x, j1 + y0, j1 + y))
+            elif x0 < x or y0 < y:
+                match.append(("N", i1 + x0, i1 + x, j1 + y0, j1 + y))
+            if x < n:
+                match.append(("F", i1 + x, i1 + x + 1, j1 + y, j1 + y + 1))
+            x0 = x + 1
+            y0 = y + 1
+        return match
+
     def _dump_opcodes(self):
         """
         private function to dump internal data state of class object for
@@ -575,8 +1314,8 @@ class _LineMatcher:
         for tag, i1, i2, j1, j2 in self.get_opcodes():
             if (i1 + 1) == i2 and (j1 + 1) == j2:
                 print("match: {} -> {}, tag = {}".format(i1, j1, tag))
-                print("    a: {}".format(self.a[i1]))
-                print("    b: {}".format(self.b[j1]))
+                print("    a: {}".format(self.a.get_filtered(i1)))
+                print("    b: {}".format(self.b.get_filtered(j1)))
             else:
                 print("UNmatch: {}:{} -> {}:{}, tag = {}".format(i1, i2, j1, j2, tag))
 
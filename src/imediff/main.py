@@ -27,9 +27,6 @@ Boston, MA 02110-1301, USA.
 # utility imediff functions
 from imediff import __version__, __package__
 from imediff.utils import read_lines
-from imediff.config import create_template
-from imediff.cli import TextData
-from imediff.tui import TextPad
 from imediff.initialize_confs import initialize_confs
 from imediff.initialize_args import initialize_args
 
@@ -87,6 +84,21 @@ Type "q" to quit this program.
 )
 
 
+##############################################################################
+def set_edit_cmd(args, confs):
+    """Set args.edit_cmd to the external editor command"""
+    editor = "editor"
+    if "EDITOR" in os.environ:
+        editor = os.environ["EDITOR"]
+    if "editor" in confs["config"].keys():
+        editor = confs["config"]["editor"]
+    args.edit_cmd = shutil.which(editor)
+    if args.edit_cmd is None:
+        args.edit_cmd = "/usr/bin/editor"  # safe fall back
+    logger.debug("external editor {} found as {}".format(editor, args.edit_cmd))
+    return
+
+
 ##############################################################################
 def main():
     """
@@ -110,6 +122,8 @@ def main():
         "============================== start of main =============================="
     )
     if args.template:
+        from imediff.config import create_template
+
         create_template(args.conf)
         sys.exit(0)
 
@@ -120,15 +134,7 @@ def main():
             logger.debug(
                 "confs['{}'] >>> key='{}' value='{}'".format(section, key, value)
             )
-    editor = "editor"
-    if "EDITOR" in os.environ:
-        editor = os.environ["EDITOR"]
-    if "editor" in confs["config"].keys():
-        editor = confs["config"]["editor"]
-    args.edit_cmd = shutil.which(editor)
-    if args.edit_cmd is None:
-        args.edit_cmd = "/usr/bin/editor"  # safe fall back
-    logger.debug("external editor {} found as {}".format(editor, args.edit_cmd))
+    set_edit_cmd(args, confs)
 
     # normalize and process non-standard situation
     if args.version:
@@ -181,12 +187,17 @@ def main():
         logger.error("imediff normally takes 2 or 3 files")
         sys.exit(2)
 
+    # import here to start quickly without loading what isn't used
     if not args.non_interactive:
+        from imediff.tui import TextPad
+
         display_instance = TextPad(list_a, list_b, list_c, args, confs)
         # set textpad size
         display_instance.main()
         del display_instance
     else:  # non-interactive
+        from imediff.cli import TextData
+
         text_instance = TextData(list_a, list_b, list_c, args, confs)
         text_instance.main()
         del text_instance
@@ -23,10 +23,14 @@ Boston, MA 02110-1301, USA.
 """
 
 import logging
+import locale
 import curses
 
 logger = logging.getLogger(__name__)
 
+# encoding of input files and the terminal
+ENCODING = locale.getpreferredencoding(False)
+
 
 def get_keycode(keyname):
     if len(keyname) == 1:
@@ -258,6 +262,17 @@ def display_content(win, row, col, content, clrtoeol=False):
                 win1row.addstr(line[i_b:i_e], attrib)
             except curses.error as _:
                 pass
+            except UnicodeEncodeError as _:
+                # undecodable bytes of input are kept as surrogates
+                try:
+                    win1row.addstr(
+                        line[i_b:i_e].encode(ENCODING, "surrogateescape").decode(
+                            ENCODING, "replace"
+                        ),
+                        attrib,
+                    )
+                except (curses.error, UnicodeError) as _:
+                    pass
         try:
             _, col = win1row.getyx()
         except curses.error as _:
@@ -25,14 +25,15 @@ Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301, USA.
 """
 
-from difflib import SequenceMatcher
 from imediff import __version__
-from imediff.diff3lib import SequenceMatcher3
-from imediff.utils import write_file, s_number
+from imediff.utils import write_lines, s_number
 from imediff.cli import TextData
 from imediff.safe_curses import get_keyname, display_content
+from array import array
+from bisect import bisect_right
 
 import curses
+import os
 import sys
 import logging
 
@@ -47,358 +48,14 @@ merges and making them as manually edited merged data.
 This requirement can be disabled by starting this program as
 "imediff --sloppy ...", too."""
 
-# Keep this under 76 char/line to fit this in the 80 char terminal
-tutorial = """\
-Quick start:
-  * Use cursor keys and h/j/k/l/n/p/0/9/SPACE to read this tutorial screen.
-  * Type "q" to exit this tutorial screen to the interactive TUI screen.
-  * Type "t" to get back to this tutorial screen.
-  * Type "/" in the interactive TUI screen to see the key commands.
-  * Type "SPACE" to exit POPUP without specific input key prompt.
 
----------------------------------------------------------------------------
-    Tutorial for imediff (Interactive Merge Editor)   (ver. {})
-                        Copyright (C) 2025 Osamu Aoki <osamu@debian.org>
----------------------------------------------------------------------------
-
-The imediff command interactively merges contents from 2 slightly different
-files with an optional base file into an output file using the in-place
-alternating display of the changed content on a single-pane full screen
-terminal user interface (TUI).
-
-(The original program by Jarno Elonen <elonen@iki.fi> was called "imediff2".
-I changed its command name to "imediff" when I made major updates to handle
-not only operations on 2 files but also handle operations on 3 files in
-version 2.0.)
-
-In this tutorial, diff2 indicates "operation on 2 files" and diff3 indicates
-"operation on 3 files".
-
-Each minimal line portion of the imediff merge operation is called as
-"chunk" in the imediff terminology.  Some changed chunks (internally tracked
-as "usr_chunk") can accept user's "action_request" as key commands (or
-MACRO) to change the outcome of the merge operation.  The result of
-"action_request" is recorded as "action" for each "chunk".
-
-The focused chunk for the active merge operation is clearly identified by
-the TUI with the reversed characters and always located at around the top
-1/3 position whenever possible.  The source and state of all the displayed
-chunks are clearly identified.
-
-The advantage of this user interface is the minimal movement of the line of
-sight for the user.  Other great tools such as vimdiff, xxdiff, meld and
-kdiff3 require you to look at different points of display to find the exact
-position of changes.  This makes imediff the most stress-free tool.
-
-Terminal
-========
-
-The imediff program is compatible with any terminal window sizes.  It
-supports both monochrome and color terminals.  For comfortable user
-experience, color terminals with their width of 80 characters/line or more
-and their height of 24 lines or more are desirable.
-
-Interactive TUI explained
-=========================
-
-The interactive TUI of the imediff program accepts following key commands
-in the default state.
-
- key commands          induced actions
- w,x                   write and exit
- q                     quit without saving
- a/b/c/d/e/f/g         set a chunk to a/b/c/d/e/f/g action
- 1/2/3/4/5/6/7         set a chunk to a/b/c/d/e/f/g action (alternative)
- A/B/C/D/E/F/G         set all chunks to a/b/c/d/e/f/g action
- enter                 toggle action of a chunk
- m                     modify a chunk with editor: /usr/bin/nvim
- M                     remove a editor result buffer
- arrows/pgdn,j/pgup,k  move scope of the display
- space,n /backspace,p  select the next/previous usr_chunk
- tab,N   /shift-tab,P  select the next/previous unresolved usr_chunk
- 0       /9            select the first/last usr_chunk
- ),home  /(,end        select the first/last unresolved usr_chunk
- ?,/                   show this help
- t                     show tutorial
-
-The first column of the interactive TUI is used to indicate the source and
-state of the displayed chunk. (version 3.3.0+)
-
- * "=" means the displayed chunk underwent no changes for all sources and
-   its merge state is resolved:
-   * diff2: file_a == file_b
-   * diff3: file_a == file_b == file_c
- * "#" means the displayed chunk underwent the same set of changes from the
-   base file and its merge state is resolved:
-   * diff2: N/A
-   * diff3: file_a == file_c
- * Independent "A", "C", and "G" mean the displayed chunk is auto-merged
-   using the corresponding source and its merge state is resolved. (only for
-   diff3)
-   * A: only file_a changed and selected for output
-   * C: only file_c changed and selected for output
-   * G: both file_a and file_c changed and auto-merged for output
- * Independent "a", "b", "c" and "e" means the displayed chunk from the
-   corresponding source is manually merged and its merge state is resolved.
- * Diff-marker identified "a", "b", "c" means the merge state of the
-   displayed chunk is unresolved
- * Wdiff display line with "f" means the merge state of the displayed chunk
-   is unresolved
- * Deleted line is displayed as "??? (*)" on display
-
-Focus jumping has 2 modes:
- * Jump to any "usr_chunks": n, p, SPACE, BACKSPACE
- * Jump to unreolved "usr_chunks": N, P, TAB, BTAB
-
-Example: Merge with 2 files (diff2)
-===================================
-
-Let's try to merge 2 almost identical files, "file_a" (OLDER) and "file_b"
-(NEWER), into an output file, "file_o".  You can do this with the following.
-
-    $ imediff -o file_o file_a file_b
-
-This mode starts with action "d" as the default behavior.  Initially all the
-different lines in "file_a" and "file_b" are grouped in "usr_chunk" list and
-displayed as action "d" which combines the corresponding "file_a" and
-"file_b" content separated by marker lines.
-
-You can move focus to the next "usr_chunk" by pressing "SPACE", or "n" keys.
-You can move focus to the previous "usr_chunk" by pressing "BACKSPACE", or
-"p" keys.
-
-You can change the resulting portion of the output file "file_o" by applying
-a single key command.  Pressing "a" displays and outputs the "file_a"
-content.  Pressing "b" displays and outputs the "file_b" content.
-
-By alternating "a" and "b" keys, you can see the difference in place which
-is easy on you with the constant line of sight.  (This is the key design
-feature inherited from the original imediff2 program.)
-
-You can display both the "file_a" content and the "file_b" content with 2
-key commands.  Pressing "d" displays 2 blocks of lines organized somewhat
-like "diff -u" (action "d").  Pressing "f" on a single line chunk displays
-intermixed 1 block of lines organized somewhat like "wdiff" (action "f").
-
-Pressing "m" starts an editor to edit the focused chunk from any modes to
-create a manually merged content.  Upon exiting the editor, its result is
-kept in the "merge_buffer".  Even after pressing "a", "b", "d", or "f", the
-content of the "merge_buffer" can be recalled and displayed by pressing "e".
-
-Pressing "M" in action "e" removes the content of the "merge_buffer".
-
-When you press one of the upper case "A", "B", "D", "E", "F", this sets all
-chunks to the corresponding lower case action.
-
-Type "w" or "x" to write the displayed content to "file_o" and exit the
-imediff program. Here, all changed chunks listed in "usr_chunk" must select
-"a", "b", or "e" (excluding "d" and "f") for "action" before writing the
-merge result unless "--sloppy" is specified.
-
-This requirement of the clean merge for 'save and exit' can be disabled by
-specifying the "--sloppy" option to the imediff command.  Alternatively, you
-can effectively evade this requirement by pressing "m" on all non-clean
-merges to make them as the manually merged data with "e" for "action".
-
-Although the imediff program is practically WYSIWYG, there are some
-exceptions. The imediff program displays a place holder marker "???" line
-for the deleted chunk for the action "a" or "b", separator marker lines for
-the action "d", and separator characters for the action "f".
-
-Example: Merge with 3 files (diff3)
-===================================
-
-Let's try to merge 2 almost identical files, "file_a" (MYFILE) and "file_c"
-(YOURFILE), both of which are based on the file, "file_b" (OLDFILE, base
-file), into an output file, "file_o".  You can do this with the following.
-
-    $ imediff -o file_o file_a file_b file_c
-
-This mode starts with "-g" as the default starting option and displays a
-full screen of the content for the intended output "file_o".  Since this
-uses extra "file_b" (OLDFILE), it can automatically megrge non-identical
-chunks of "file_a" (MYFILE) and "file_c" (YOURFILE) using line.
-
-Key commands of "Merge with 3 files" are almost the same as ones of "Merge
-with 2 files".
-
-One notable exception is the key command "g". This is also the default
-starting mode for "Merge with 3 files".  This takes advantage of the extra
-base file to help auto-merge and acts in the following order:
- * If the "merge_buffer" has a previously stored manually generated merge
-   result, "action" is set to "e".
- * If a chunk is auto-merged cleanly by line-by-line comparison or more fine
-   grained character comparison, "action" is set to "=", "#", "A", "C", or
-   "G".  The meaning of each "action" is described in the above. Since it is
-   already merged properly, it isn't listed in the "usr_chunk" list.
- * The unresolved chunk is listed in "usr_chunk" and "action" is set to "d".
-
-Please note that even for the non-overlapping changes on the same line,
-imediff can yield the clean merge with action "G". (This is the great
-feature of the imediff command over tools such as "diff3 -m ..." and "git
-merge ..." which operate only by line-by-line comparison.)
-
-Command line options
-====================
-
-The complete list of command line options is available by "imediff -h" but
-the explanation on them are terse.  Please read the following for details.
-
-Starting action
-===============
-
-The imediff program may be stared with a command option which specifies the
-default starting action and subsequent merge action behavior.
-
-With 2 files (diff2), one of 4 optins can be specified:
- * "-a": select file_a, if different
- * "-b": select file_b, if different
- * "-d": select diff2(file_a, file_b), if different
- * "-f": select wdiff2(file_a, file_b) if different and single line
-         select diff2(file_a, file_b) if different and not single line
-
-If no option is specified, imediff uses "-d" for diff2.
-
-With 3 files (diff3), one of 6 optins can be specified:
- * "-a": select file_a, if different (*)
- * "-b": select file_b, if different (*)
- * "-c": select file_c, if different (*)
- * "-d": select diff2(file_a, file_b) if different (*)
- * "-f": select wdiff2(file_a, file_b) if not merged and single line
-         select diff2(file_a, file_b) if not merged and not single line
- * "-g": select good merges (w)diff2(file_a, file_b) if not merged
-
-If no option is specified, imediff uses "-g" for diff3.
-
-For diff3 cases with (*), the interactive action request can change chunks
-normally considered merged (=auto-resolved to "A", "C", "G") when imediff is
-started under "-f" or "-g".
-
-The default behavior without using any one of command options should serve
-in typical use cases.  Besides, you can change merge behavior interactively.
-
-For merging 2 functioning changed files with a common base file,
-imediff(diff3) with "-g" or "-f" should be good for the task.
-
-For cherry-picking changes from 2 failing changed files, any one of "-a",
-"-b", or "-c" under imediff(diff3) may be useful. (TBH, I don't know how
-useful these are.)
-
-Customization TUI
-=================
-
-The imediff program can customize its key command binding and its color
-setting using the "~/.imediff" file in the ini file format.  You can create
-its template file by the "imediff -t" command.  If this file is missing,
-default settings are used.
-
-The left side of this configuration file is the keys described in the above.
-The right side is your configuration choices.  The current settings can be
-confirmed by the "/" key dialog on the interactive TUI.
-
-You can disable the existing "~/.imediff" file without renaming it by
-specifying "none" as "imediff -C none ...". Then, only the internal default
-values of the imediff program are used.
-
-Key MACRO
-=========
-
-Automatic processing with imediff can be enabled using key MACRO featurs
-with the "-M" option.
-
-For TUI mode, TUI is started after processing the MACRO.
-
-For CLI mode, you must add "w" at the end of to the MACRO command to write
-the result to a file.  For example, "imediff -n -MAbw ...".
-
-Log file
-========
-
-After version 3.4.0, imediff doesn't create log file as its default
-behavior.
-
-When "--force-logging" option is specified, imediff forces to generate
-"imediff.log" at the current directory as the log file with its log level at
-"INFO".
-
-You may explicitly set the log file and its log level with "--logfile" and
-"--loglevel" options.
-
-The "git-ime" command invokes "imediff --logfile=.git/imediff.log ..." to
-generate the log file in the "./git/" directory and avoid interfarence with
-the git repository.
-
-Internal logic
-==============
-
-Here is a brief overview of the internal logic of imediff.  Normally, you
-don't need to tweak it.
-
-The imediff command internally uses "difflib.SequenceMatch" class provided
-by the Python Standard Library.  The sequence may be a sequence of string
-for line matching or a sequence of character for character matching
-depending on its usage point.  "isjunk" parameter for the SequenceMatch
-instance may be tweaked using "--isjunk" option.
-
-The imediff tries its best to match lines using 2 step approach.
-
- * Step 1: full line match on lines after removing whitespaces etc.
- * Step 2: shortened line match for non-identical lines (head or tail).
-
-Step 1 can be tweaked using the "--line-rule=N" option to set the line
-filtering rule.
-
- * N=0:  strip leading and tailing whitespaces
- * N=1:  strip all whitespaces
- * N=2:  strip all whitespaces and quotation marks (default)
- * N=3:  strip all non-alphanumerics
- * N=10: strip leading and tailing whitespaces and lowecase all characters
- * N=11: strip all whitespaces and lowecase all characters
- * N=12: strip all whitespaces and quotation marks and lowecase all
-         characters
- * N=13: strip all non-alphanumerics and lowecase all characters
-
-Step 2 can be tweaked using:
-
- * "--line-min LINE_MIN" option to set the minimum partial line match length
- * "--line-max LINE_MAX" option to set the maximum partial line match length
- * "--line-factor LINE_FACTOR" option to set the shortening factor (1-9) for
-   the partial line match length.  default=8 meaning 80% per step
-
-git-ime
-========
-
-The git-ime command is a companion script provided with imediff.  It is a
-wrapper tool for git and imediff to disect a single commit containing many
-changes.
-
-When a commit contains changes to multiple files, it splits the commit into
-many commits of single file changes.
-
-When a commit contains changes to a single file, it splits the commit into
-many minimum commits using "imediff -n -MAbw ..." repeatedly.
-
-Use of git-ime and imediff along with "git rebase -i ..." can clean
-intertwined change history.  This may be useful for debugging.
-
-Note
-====
-
-The version 3.0 is a major rewrite to address file size limitation caused by
-the underlying curses library and to limit wdiff to operate only within a
-single line.
-
-The version 3.4.0 changes logging behavior and redesigns short command
-options for imediff.
-
-The "diff3 -m file_a file_b file_c" has an odd feature of showing diff2
-between "file_b" and "file_c" for the portion of changes in which both
-"file_a" and "file_c" underwent identical changes from "file_b". This
-imediff program results is a more intuitive one with the clean merge.  If
-you are after such identical changes, you may use "-b" option with imediff
-(diff3).""".format(
-    __version__
-)
+def get_tutorial():
+    """Return tutorial text read from data/tutorial.txt"""
+    # Keep tutorial.txt under 76 char/line to fit it in the 80 char terminal
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    with open(os.path.join(path, "tutorial.txt"), encoding="utf-8") as fp:
+        text = fp.read()
+    return text.rstrip("\n").replace("@@version@@", __version__)
 
 
 class TextPad(TextData):  # TUI data
@@ -407,7 +64,8 @@ class TextPad(TextData):  # TUI data
     ####################################################################
     # Externally exposed initializer method
     ####################################################################
-    #  self.chunk_list[chunk_index] = (                # for CLI and TUI
+    #  self.chunk_list: ChunkStore in chunklib.py        # for CLI and TUI
+    #  self.chunk_list[chunk_index] = (                # read as a tuple
     #      tag,             # diff opcode tag EeNFAC
     #      i1,              # self.list_a (start)-index
     #      i2,              # self.list_a (end+1)-index
@@ -428,13 +86,13 @@ class TextPad(TextData):  # TUI data
         super().__init__(list_a, list_b, list_c, args, confs)
         logger.debug("starting ...")
         self.init_args_confs_tui(args, confs)
-        self.chunk_to_virt = list()
-        self.virt_to_chunk = list()
+        self.chunk_to_virt = array("Q")
+        self.virt_row_max = 0
         logger.debug("finished")
         return
 
     def init_args_confs_tui(self, args, confs):
-        self.attrib = confs["attrib"]
+        self.attrib = confs.attrib  # "color_*" key to list of attribute names
         # self.poke = args.poke
 
     ####################################################################
@@ -470,21 +128,21 @@ class TextPad(TextData):  # TUI data
     #     * chunk_list[chunk_index]: -> chunk_list item tuple
     #     * usr_chunk_list[usr_chunk_index]: -> chunk_index
     #   * TUI
-    #     * chunk_to_virt[chunk_index] = virt_row
-    #     * virt_to_row[virt_row] = (chunk_index, chunk_subindex, action)
+    #     * chunk_to_virt[chunk_index] = virt_row (the first one)
+    #     * get_virt_to_chunk(virt_row) = (chunk_index, chunk_subindex, action)
     # Terminal size: 80 col x 24 row required
     #
     ####################################################################
 
     def main(self):  # for curses TUI (wrapper)
         """Interactive driven by CURSES-TUI"""
-        logger.debug("start with macro = '{}'".format(self.macro))
+        logger.debug("start with macro = '%s'", self.macro)
         curses.wrapper(self.tui_loop)
         logger.debug("finished")
         return
 
     def tui_loop(self, stdscr):  # for curses TUI (core)
-        logger.debug("start with macro = '{}'".format(self.macro))
+        logger.debug("start with macro = '%s'", self.macro)
         # initialize
         curses.curs_set(0)  # cursor off
         self.init_curses(stdscr)
@@ -496,9 +154,9 @@ class TextPad(TextData):  # TUI data
             self.remap_chunk_virt()
             if len(self.chunk_list) != len(self.chunk_to_virt):
                 logger.error(
-                    "E: insane: len(chunk_list) != len(chunk_to_virt): {} {}".format(
-                        len(self.chunk_list), len(self.virt_to_chunk)
-                    )
+                    "E: insane: len(chunk_list) != len(chunk_to_virt): %s %s",
+                    len(self.chunk_list),
+                    len(self.chunk_to_virt),
                 )
                 sys.exit(2)
             if flag_update_corner:
@@ -518,9 +176,10 @@ class TextPad(TextData):  # TUI data
                             focused_virt_row - ((stdscr_row_max - 1) // 3), 0
                         )
                         logger.debug(
-                            "focused_chunk_index={} >> focused_virt_row={} >> corner_virt_row={}".format(
-                                focused_chunk_index, focused_virt_row, corner_virt_row
-                            )
+                            "focused_chunk_index=%s >> focused_virt_row=%s >> corner_virt_row=%s",
+                            focused_chunk_index,
+                            focused_virt_row,
+                            corner_virt_row,
                         )
             flag_update_corner = False
             self.display_data(corner_virt_row, corner_virt_col)
@@ -554,7 +213,7 @@ class TextPad(TextData):  # TUI data
                         ],
                         ["y", "Y", "N", "n", "SPACE", "ESCAPE"],
                     ) in ["y", "Y"]:
-                        write_file(self.file_o, self.get_string_from_content_for_file())
+                        write_lines(self.file_o, self.iter_content_for_file())
                         break
                 else:
                     self.display_content_win(
@@ -626,7 +285,9 @@ class TextPad(TextData):  # TUI data
                 )
             elif keyname == "t":
                 # Show tutorial screen (long so no-exit with SPACE)
-                self.display_popup_win(tutorial, ["ESCAPE", "q", "Q"], "color_white")
+                self.display_popup_win(
+                    get_tutorial(), ["ESCAPE", "q", "Q"], "color_white"
+                )
             # Moves in document
             elif keyname in ["j", "DOWN"]:
                 corner_virt_row += 1
@@ -730,153 +391,109 @@ class TextPad(TextData):  # TUI data
     # This may be updated to update only data affected
 
     def remap_chunk_virt(self):
-        virt_row_next = 0
-        self.chunk_to_virt = list()
-        # [ virt_row, ...]
-        self.virt_to_chunk = list()
-        # [(chunk_index, chunk_subindex, action), ...]
+        # chunk_to_virt: array of the first virt_row of each chunk
+        # The rows within a chunk are resolved by get_virt_to_chunk().
+        virt_row = 0
+        self.chunk_to_virt = array("Q")
         for chunk_index in range(len(self.chunk_list)):
-            virt_row = virt_row_next
             self.chunk_to_virt.append(virt_row)
-            (
-                tag,
+            virt_row += self.get_virt_range(chunk_index)
+        self.virt_row_max = virt_row
+        # debug
+        if logger.isEnabledFor(logging.DEBUG):
+            for chunk_index, virt_row in enumerate(self.chunk_to_virt):
+                logger.debug("chunk[%s] --> virt_row[%s]", chunk_index, virt_row)
+
+            for virt_row in range(self.virt_row_max):
+                chunk_index, chunk_subindex, action = self.get_virt_to_chunk(
+                    virt_row
+                )
+                logger.debug(
+                    "virt_row[%s] --> (chunk[%s], chunk_subindex=%s, action:%s)",
+                    virt_row,
+                    chunk_index,
+                    chunk_subindex,
+                    action,
+                )
+        logger.debug(
+            "len(chunk_list)=%s, len(usr_chunk_list)=%s, virt_row_max=%s, len(chunk_to_virt)=%s",
+            len(self.chunk_list),
+            len(self.usr_chunk_list),
+            self.virt_row_max,
+            len(self.chunk_to_virt),
+        )
+        return
+
+    def get_virt_range(self, chunk_index):
+        """Return number of virt_rows to display chunk"""
+        action = self.chunk_list.get_action(chunk_index)
+        (i1, i2, j1, j2, k1, k2) = self.chunk_list.get_range(chunk_index)
+        merge_buffer = self.chunk_list.get_merge_buffer(chunk_index)
+        if action == "=" or action == "#" or action == "a" or action == "A":
+            # no content consumes 1 line for "???"
+            virt_range = max(i2 - i1, 1)
+        elif action == "b" or action == "B":
+            virt_range = max(j2 - j1, 1)
+        elif action == "c" or action == "C":
+            virt_range = max(k2 - k1, 1)
+        elif action == "d" and self.diff_mode == 2:
+            # diff2 consumes 3 extra lines as separators
+            virt_range = (i2 - i1) + (j2 - j1) + 3
+        elif action == "d" and self.diff_mode == 3:
+            # diff3 consumes 4 extra lines as separators
+            virt_range = (i2 - i1) + (j2 - j1) + (k2 - k1) + 4
+        elif (action == "e" or action == "G") and len(merge_buffer) > 0:
+            virt_range = len(merge_buffer)
+        elif (
+            action == "f" and i2 - i1 == 1 and j2 - j1 == 1 and self.diff_mode == 2
+        ) or (
+            action == "f"
+            and i2 - i1 == 1
+            and j2 - j1 == 1
+            and k2 - k1 == 1
+            and self.diff_mode == 3
+        ):
+            virt_range = 1
+        else:
+            logger.error(
+                "E: bad combination - diff%s action: %s, tag: %s, a[%s:%s] b[%s:%s] c[%s:%s] len[e]=%s",
+                self.diff_mode,
+                action,
+                self.chunk_list.get_tag(chunk_index),
                 i1,
                 i2,
                 j1,
                 j2,
                 k1,
                 k2,
-                action,
-                merge_buffer,
-            ) = self.chunk_list[chunk_index]
-            # virt_range
-            if action == "=" or action == "#":
-                virt_range = i2 - i1
-                if virt_range > 0:
-                    for virt_row_index in range(virt_row, virt_row + virt_range):
-                        chunk_subindex = virt_row_index - virt_row
-                        self.virt_to_chunk.append((chunk_index, chunk_subindex, action))
-                else:
-                    # no content consumes 1 line for "???"
-                    virt_range = 1
-                    self.virt_to_chunk.append((chunk_index, 0, action))
-            elif action == "a" or action == "A":
-                virt_range = i2 - i1
-                if virt_range > 0:
-                    for virt_row_index in range(virt_row, virt_row + virt_range):
-                        chunk_subindex = virt_row_index - virt_row
-                        self.virt_to_chunk.append((chunk_index, chunk_subindex, action))
-                else:
-                    # no content consumes 1 line for "???"
-                    virt_range = 1
-                    self.virt_to_chunk.append((chunk_index, 0, action))
-            elif action == "b" or action == "B":
-                virt_range = j2 - j1
-                if virt_range > 0:
-                    for virt_row_index in range(virt_row, virt_row + virt_range):
-                        chunk_subindex = virt_row_index - virt_row
-                        self.virt_to_chunk.append((chunk_index, chunk_subindex, action))
-                else:
-                    # no content consumes 1 line for "???"
-                    virt_range = 1
-                    self.virt_to_chunk.append((chunk_index, 0, action))
-            elif action == "c" or action == "C":
-                virt_range = k2 - k1
-                if virt_range > 0:
-                    for virt_row_index in range(virt_row, virt_row + virt_range):
-                        chunk_subindex = virt_row_index - virt_row
-                        self.virt_to_chunk.append((chunk_index, chunk_subindex, action))
-                else:
-                    # no content consumes 1 line for "???"
-                    virt_range = 1
-                    self.virt_to_chunk.append((chunk_index, 0, action))
-            elif action == "d" and self.diff_mode == 2:
-                self.virt_to_chunk.append((chunk_index, 0, "d20"))
-                virt_range_a = i2 - i1
-                for virt_row_index in range(virt_row, virt_row + virt_range_a):
-                    chunk_subindex = virt_row_index - virt_row
-                    self.virt_to_chunk.append((chunk_index, chunk_subindex, "a"))
-                self.virt_to_chunk.append((chunk_index, 0, "d21"))
-                virt_range_b = j2 - j1
-                for virt_row_index in range(virt_row, virt_row + virt_range_b):
-                    chunk_subindex = virt_row_index - virt_row
-                    self.virt_to_chunk.append((chunk_index, chunk_subindex, "b"))
-                self.virt_to_chunk.append((chunk_index, 0, "d22"))
-                # diff2 consumes 3 extra lines as separators
-                virt_range = virt_range_a + virt_range_b + 3
-            elif action == "d" and self.diff_mode == 3:
-                self.virt_to_chunk.append((chunk_index, 0, "d30"))
-                virt_range_a = i2 - i1
-                for virt_row_index in range(virt_row, virt_row + virt_range_a):
-                    chunk_subindex = virt_row_index - virt_row
-                    self.virt_to_chunk.append((chunk_index, chunk_subindex, "a"))
-                self.virt_to_chunk.append((chunk_index, 0, "d31"))
-                virt_range_b = j2 - j1
-                for virt_row_index in range(virt_row, virt_row + virt_range_b):
-                    chunk_subindex = virt_row_index - virt_row
-                    self.virt_to_chunk.append((chunk_index, chunk_subindex, "b"))
-                self.virt_to_chunk.append((chunk_index, 0, "d32"))
-                virt_range_c = k2 - k1
-                for virt_row_index in range(virt_row, virt_row + virt_range_c):
-                    chunk_subindex = virt_row_index - virt_row
-                    self.virt_to_chunk.append((chunk_index, chunk_subindex, "c"))
-                self.virt_to_chunk.append((chunk_index, 0, "d33"))
-                # diff2 consumes 3 extra lines as separators
-                virt_range = virt_range_a + virt_range_b + virt_range_c + 4
-            elif (action == "e" or action == "G") and len(merge_buffer) > 0:
-                virt_range = len(merge_buffer)
-                for chunk_subindex in range(virt_range):
-                    self.virt_to_chunk.append((chunk_index, chunk_subindex, action))
-            elif (
-                action == "f" and i2 - i1 == 1 and j2 - j1 == 1 and self.diff_mode == 2
-            ) or (
-                action == "f"
-                and i2 - i1 == 1
-                and j2 - j1 == 1
-                and k2 - k1 == 1
-                and self.diff_mode == 3
-            ):
-                virt_range = 1
-                self.virt_to_chunk.append((chunk_index, 0, "f"))
-            else:
-                logger.error(
-                    "E: bad combination - diff{} action: {}, tag: {}, a[{}:{}] b[{}:{}] c[{}:{}] len[e]={}".format(
-                        self.diff_mode,
-                        action,
-                        tag,
-                        i1,
-                        i2,
-                        j1,
-                        j2,
-                        k1,
-                        k2,
-                        len(merge_buffer),
-                    )
-                )
-                sys.exit(2)
-            # This increments virt_row for virt_range per loop
-            virt_row_next = virt_row + virt_range
-        # debug
-        for chunk_index, virt_row in enumerate(self.chunk_to_virt):
-            logger.debug("chunk[{}] --> virt_row[{}]".format(chunk_index, virt_row))
-
-        for virt_row, (chunk_index, chunk_subindex, action) in enumerate(
-            self.virt_to_chunk
-        ):
-            logger.debug(
-                "virt_row[{}] --> (chunk[{}], chunk_subindex={}, action:{})".format(
-                    virt_row, chunk_index, chunk_subindex, action
-                )
-            )
-        logger.debug(
-            "len(chunk_list)={}, len(usr_chunk_list)={}, len(virt_to_chunk)={}, len(chunk_to_virt)={}".format(
-                len(self.chunk_list),
-                len(self.usr_chunk_list),
-                len(self.virt_to_chunk),
-                len(self.chunk_to_virt),
+                len(merge_buffer),
             )
-        )
-        return
+            sys.exit(2)
+        return virt_range
+
+    def get_virt_to_chunk(self, virt_row):
+        """Return (chunk_index, chunk_subindex, action) to display virt_row"""
+        chunk_index = bisect_right(self.chunk_to_virt, virt_row) - 1
+        chunk_subindex = virt_row - self.chunk_to_virt[chunk_index]
+        action = self.chunk_list.get_action(chunk_index)
+        if action != "d":
+            return (chunk_index, chunk_subindex, action)
+        # diff2: d20, a..., d21, b..., d22
+        # diff3: d30, a..., d31, b..., d32, c..., d33
+        (i1, i2, j1, j2, k1, k2) = self.chunk_list.get_range(chunk_index)
+        if self.diff_mode == 2:
+            parts = [("a", i2 - i1), ("b", j2 - j1)]
+        else:
+            parts = [("a", i2 - i1), ("b", j2 - j1), ("c", k2 - k1)]
+        marker = "d{}".format(self.diff_mode)
+        for n, (part_action, part_range) in enumerate(parts):
+            if chunk_subindex == 0:
+                return (chunk_index, 0, marker + str(n))
+            chunk_subindex -= 1
+            if chunk_subindex < part_range:
+                return (chunk_index, chunk_subindex, part_action)
+            chunk_subindex -= part_range
+        return (chunk_index, 0, marker + str(len(parts)))
 
     ####################################################################
     # Internally used utility methods (initializer within tui_main)
@@ -886,9 +503,7 @@ class TextPad(TextData):  # TUI data
         stdscr_row_max, stdscr_col_max = self.stdscr.getmaxyx()
         if stdscr_row_max < 20 or stdscr_col_max < 60:
             logger.error(
-                "E: terminal size too small: {} {}".format(
-                    stdscr_row_max, stdscr_col_max
-                )
+                "E: terminal size too small: %s %s", stdscr_row_max, stdscr_col_max
             )
             sys.exit(2)
         self.stdscr.clear()
@@ -954,24 +569,27 @@ class TextPad(TextData):  # TUI data
             self.curses_value["MAGENTA/WHITE"] = curses.color_pair(0)
             self.curses_value["CYAN/WHITE"] = curses.color_pair(0)
 
+        # attribute table for get_attr(): (data_type, focus) -> attribute
+        self.attr_default = self.curses_value["WHITE"] | self.curses_value["NORMAL"]
+        self.attr_table = dict()
+        for attrib_key, names in self.attrib.items():
+            attr = 0
+            for name in names:
+                attr |= self.curses_value[name]
+            self.attr_table[(attrib_key, False)] = attr
+            if attrib_key[-6:] == "_focus":
+                self.attr_table[(attrib_key[:-6], True)] = attr
+
     ####################################################################
     # Color
     ####################################################################
 
     def get_attr(self, data_type, focus):
-        #
-        if focus:
-            attrib_key = data_type + "_" + "focus"
-        else:
-            attrib_key = data_type
-        value = self.attrib.get(attrib_key, "WHITE,NORMAL").split(",")
-        attrib = 0
-        for a in value:
-            attrib |= self.curses_value[a]
-        return attrib
+        # data_type + "_focus" for focus
+        return self.attr_table.get((data_type, focus), self.attr_default)
 
     def get_color(self, data_type):
-        color = self.attrib.get(data_type, "WHITE,NORMAL").split(",")[0]
+        color = self.attrib.get(data_type, ["WHITE"])[0]
         return color
 
     def get_macro_command(self):  # overriding for TUI
@@ -993,7 +611,7 @@ class TextPad(TextData):  # TUI data
             except Exception as _:
                 keyname = ""  # quit w/o saving for ^C
             keyname = self.kc.get(keyname, "IGNORE")
-        logger.debug("key={}".format(keyname))
+        logger.debug("key=%s", keyname)
         return keyname
 
     def get_helptext(self):
@@ -1213,18 +831,25 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
     #                   "color_zero"
 
     def display_data(self, corner_virt_row, corner_virt_col):
+        debug = logger.isEnabledFor(logging.DEBUG)
         stdscr_row_max, stdscr_col_max = self.stdscr.getmaxyx()
         # text_data 0 ................... < stdscr_row_max - 1
         # stat_data stdscr_row_max -1 ... < stdscr_row_max
         for row_index in range(stdscr_row_max - 1):
             virt_row_index = row_index + corner_virt_row
-            if virt_row_index < len(self.virt_to_chunk):
-                chunk_index, chunk_subindex, action = self.virt_to_chunk[virt_row_index]
-                logger.debug(
-                    "virt_row_index={} row_index={} chunk_index={} chunk_subindex={} action:{}".format(
-                        virt_row_index, row_index, chunk_index, chunk_subindex, action
-                    )
+            if virt_row_index < self.virt_row_max:
+                chunk_index, chunk_subindex, action = self.get_virt_to_chunk(
+                    virt_row_index
                 )
+                if debug:
+                    logger.debug(
+                        "virt_row_index=%s row_index=%s chunk_index=%s chunk_subindex=%s action:%s",
+                        virt_row_index,
+                        row_index,
+                        chunk_index,
+                        chunk_subindex,
+                        action,
+                    )
                 (
                     tag,  # tag
                     i1,
@@ -1246,17 +871,16 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 else:
                     focus = False
                 if action == "=" and self.diff_mode == 2:
-                    logger.debug(
-                        "action:{} row_index={} with i1={}".format(
-                            action, row_index, i1
+                    if debug:
+                        logger.debug(
+                            "action:%s row_index=%s with i1=%s", action, row_index, i1
                         )
-                    )
                     self.display_imediff_content(
                         self.stdscr,
                         row_index,
                         [
                             (
-                                self.list_a[i1],
+                                self.list_a[i1 + chunk_subindex],
                                 corner_virt_col,
                                 corner_virt_col + stdscr_col_max,
                                 self.get_attr("color_merge_ab", focus),
@@ -1267,17 +891,19 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "=" and self.diff_mode == 3:
                     if i1 < i2:
-                        logger.debug(
-                            "action:{} row_index={} with i1={}".format(
-                                action, row_index, i1
+                        if debug:
+                            logger.debug(
+                                "action:%s row_index=%s with i1=%s",
+                                action,
+                                row_index,
+                                i1,
                             )
-                        )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
                             [
                                 (
-                                    self.list_a[i1],
+                                    self.list_a[i1 + chunk_subindex],
                                     corner_virt_col,
                                     corner_virt_col + stdscr_col_max,
                                     self.get_attr("color_merge_abc", focus),
@@ -1286,9 +912,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with i1={} i2={}".format(row_index, i1, i2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with i1=%s i2=%s", row_index, i1, i2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1305,17 +932,19 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "#" and self.diff_mode == 3:
                     if i1 < i2:
-                        logger.debug(
-                            "action:{} row_index={} with i1={}".format(
-                                action, row_index, i1
+                        if debug:
+                            logger.debug(
+                                "action:%s row_index=%s with i1=%s",
+                                action,
+                                row_index,
+                                i1,
                             )
-                        )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
                             [
                                 (
-                                    self.list_a[i1],
+                                    self.list_a[i1 + chunk_subindex],
                                     corner_virt_col,
                                     corner_virt_col + stdscr_col_max,
                                     self.get_attr("color_merge_ac", focus),
@@ -1324,9 +953,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with i1={} i2={}".format(row_index, i1, i2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with i1=%s i2=%s", row_index, i1, i2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1343,9 +973,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "A":
                     if i1 < i2:
-                        logger.debug(
-                            "row_index={} with i1={} i2={}".format(row_index, i1, i2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with i1=%s i2=%s", row_index, i1, i2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1360,9 +991,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with i1={} i2={}".format(row_index, i1, i2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with i1=%s i2=%s", row_index, i1, i2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1379,9 +1011,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "C" and self.diff_mode == 3:
                     if k1 < k2:
-                        logger.debug(
-                            "row_index={} with k1={} k2={}".format(row_index, k1, k2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with k1=%s k2=%s", row_index, k1, k2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1396,9 +1029,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with k1={} k2={}".format(row_index, k1, k2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with k1=%s k2=%s", row_index, k1, k2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1447,9 +1081,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "a":
                     if i1 < i2:
-                        logger.debug(
-                            "row_index={} with i1={} i2={}".format(row_index, i1, i2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with i1=%s i2=%s", row_index, i1, i2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1464,9 +1099,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with i1={} i2={}".format(row_index, i1, i2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with i1=%s i2=%s", row_index, i1, i2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1483,9 +1119,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "b" and self.diff_mode == 2:  #
                     if j1 < j2:
-                        logger.debug(
-                            "row_index={} with j1={} j2={}".format(row_index, j1, j2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with j1=%s j2=%s", row_index, j1, j2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1500,9 +1137,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with j1={} j2={}".format(row_index, j1, j2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with j1=%s j2=%s", row_index, j1, j2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1519,9 +1157,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "b" and self.diff_mode == 3:  #
                     if j1 < j2:
-                        logger.debug(
-                            "row_index={} with j1={} j2={}".format(row_index, j1, j2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with j1=%s j2=%s", row_index, j1, j2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1536,9 +1175,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with j1={} j2={}".format(row_index, j1, j2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with j1=%s j2=%s", row_index, j1, j2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1555,9 +1195,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif action == "c" and self.diff_mode == 3:
                     if k1 < k2:
-                        logger.debug(
-                            "row_index={} with k1={} k2={}".format(row_index, k1, k2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with k1=%s k2=%s", row_index, k1, k2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1572,9 +1213,10 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                             action,
                         )
                     else:  # i1 == i2
-                        logger.debug(
-                            "row_index={} with k1={} k2={}".format(row_index, k1, k2)
-                        )
+                        if debug:
+                            logger.debug(
+                                "row_index=%s with k1=%s k2=%s", row_index, k1, k2
+                            )
                         self.display_imediff_content(
                             self.stdscr,
                             row_index,
@@ -1730,272 +1372,24 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 #
                 elif (
                     action == "f"
-                    and self.diff_mode == 2
-                    and i2 - i1 == 1
-                    and j2 - j1 == 1
-                ):
-                    # logic is from get_merge_wdiff2(chunk_index)
-                    """Return content for wdiff by line (2 files)"""
-                    (
-                        tag,
-                        i1,
-                        i2,
-                        j1,
-                        j2,
-                        k1,
-                        k2,
-                        action,
-                        merge_buffer,
-                    ) = self.chunk_list[
-                        chunk_index
-                    ]  # chunk_list item tuple (9 param)
-                    logger.debug(
-                        "chunk[{}]: tag={} === a[{}:{}]/b[{}:{}]/_[{}:{}] action='{}' len(merge_buffer)={}".format(
-                            chunk_index,
-                            tag,
-                            i1,
-                            i2,
-                            j1,
-                            j2,
-                            k1,
-                            k2,
-                            action,
-                            len(merge_buffer),
-                        ),
-                    )
-                    line_a = self.list_a[i1]
-                    line_b = self.list_b[j1]
-                    if self.isjunk:
-                        isjunk = None
-                    else:
-                        isjunk = self.whitespace_is_junk
-                    matcher_internal = SequenceMatcher(isjunk, line_a, line_b, False)
-                    chunk_list_internal = matcher_internal.get_opcodes()
-                    content = list()
-                    for tag, i1, i2, j1, j2 in chunk_list_internal:
-                        if tag == "equal":
-                            # wdiff-clean
-                            content.append(
-                                (
-                                    line_a[i1:i2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_ab", focus),
-                                )
-                            )
-                        else:  # other tags (mark up with word separator)
-                            content.append(
-                                (
-                                    self.ws0,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    line_a[i1:i2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_a", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    self.ws1,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    line_b[j1:j2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_b2", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    self.ws3,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                    del chunk_list_internal
-                    del matcher_internal
-                    # content = basically list of attribute added text of get_merge_wdiff2(chunk_index)
-                    self.display_imediff_content(
-                        self.stdscr,
-                        row_index,
-                        content,
-                        "f",
-                        clrtoeol=True,
-                    )
-                elif (
-                    action == "f"
-                    and self.diff_mode == 3
                     and i2 - i1 == 1
                     and j2 - j1 == 1
-                    and k2 - k1 == 1
+                    and (self.diff_mode == 2 or k2 - k1 == 1)
                 ):
-                    # always non-clean merge (clean merge is in e for merge_buffer)
-                    # logic is from get_merge_wdiff3(chunk_index)
-                    """Return content for wdiff by line (3 files)"""
-                    (
-                        tag,
-                        i1,
-                        i2,
-                        j1,
-                        j2,
-                        k1,
-                        k2,
-                        action,
-                        merge_buffer,
-                    ) = self.chunk_list[
-                        chunk_index
-                    ]  # chunk_list item tuple (9 param)
-                    if i2 - i1 != 1 or j2 - j1 != 1 or k2 - k1 != 1:
-                        logger.error(
-                            "chunk[{}]: tag={} === a[{}:{}]/b[{}:{}]/c[{}:{}] not for wdiff3".format(
-                                chunk_index, tag, i1, i2, j1, j2, k1, k2
-                            ),
+                    # wdiff2 or wdiff3 (always non-clean merge since clean
+                    # merge is in e for merge_buffer) from cached segments of
+                    # get_merge_wdiff2(chunk_index) or
+                    # get_merge_wdiff3(chunk_index)
+                    (_, _, segments) = self.get_wdiff(chunk_index)
+                    content = [
+                        (
+                            text,
+                            corner_virt_col,
+                            corner_virt_col + stdscr_col_max,
+                            self.get_attr(attr, focus),
                         )
-                        sys.exit(2)
-                    logger.debug(
-                        "chunk[{}]: tag={} a[{}:{}]/b[{}:{}]/c[{}:{}] action='{}' wdiff3-merge-try".format(
-                            chunk_index, tag, i1, i2, j1, j2, k1, k2, action
-                        ),
-                    )
-                    line_a = self.list_a[i1]
-                    line_b = self.list_b[j1]
-                    line_c = self.list_c[k1]
-                    if self.isjunk:
-                        isjunk = None
-                    else:
-                        isjunk = self.whitespace_is_junk
-                    # wdiff uses SequenceMatcher
-                    use_SequenceMatcher = 0
-                    matcher_internal = SequenceMatcher3(
-                        line_a, line_b, line_c, use_SequenceMatcher, isjunk, True
-                    )
-                    chunk_list_internal = matcher_internal.get_opcodes()
-                    # logger.debug("wdiff3: \nwchunk_list_internal >>>>> {}".format(wchunk_list_internal))
-                    content = list()
-                    clean_merge = True
-                    for tag, i1, i2, j1, j2, k1, k2 in chunk_list_internal:
-                        if tag == "A":
-                            content.append(
-                                (
-                                    line_a[i1:i2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_a", focus),
-                                )
-                            )
-                        elif tag == "C":
-                            content.append(
-                                (
-                                    line_c[k1:k2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_c", focus),
-                                )
-                            )
-                        elif tag == "E":
-                            content.append(
-                                (
-                                    line_c[k1:k2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_abc", focus),
-                                )
-                            )
-                        elif tag == "e":
-                            content.append(
-                                (
-                                    line_c[k1:k2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_ac", focus),
-                                )
-                            )
-                        else:  # tag == "N" (mark up with word separator)
-                            content.append(
-                                (
-                                    self.ws0,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    line_a[i1:i2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_a", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    self.ws1,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    line_b[j1:j2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_b3", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    self.ws2,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    line_c[k1:k2],
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_c", focus),
-                                )
-                            )
-                            content.append(
-                                (
-                                    self.ws3,
-                                    corner_virt_col,
-                                    corner_virt_col + stdscr_col_max,
-                                    self.get_attr("color_wdiff_marker", focus),
-                                )
-                            )
-                    del matcher_internal
-                    del chunk_list_internal
-                    logger.debug(
-                        "chunk[{}]: clean_merge={} === tag={} a[{}:{}]/b[{}:{}]/c[{}:{}] action='{}'".format(
-                            chunk_index,
-                            clean_merge,
-                            tag,
-                            i1,
-                            i2,
-                            j1,
-                            j2,
-                            k1,
-                            k2,
-                            action,
-                        ),
-                    )
-                    # (clean_merge, content) = self.get_merge_wdiff3(chunk_index)
+                        for text, attr in segments
+                    ]
                     self.display_imediff_content(
                         self.stdscr,
                         row_index,
@@ -2028,17 +1422,16 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
         # * s_chunk_index
         # * len(chunk_list)
         # * self.focused_usr_chunk_index
-        n_merge_E = 0  # = =
-        n_merge_e = 0  #   #
-        n_merge_n = 0  #   G
-        n_merge_A = 0  #   A
-        n_merge_C = 0  #   C
-        n_merge_N = 0  # includes F for diff2
-        n_manual_a = 0
-        n_manual_b = 0
-        n_manual_c = 0
-        n_manual_e = 0
-        n_unresolved = 0
+        n_tags = self.chunk_list.count_tags()
+        n_merge_E = n_tags.get("E", 0)  # = =
+        n_merge_e = n_tags.get("e", 0)  #   #
+        n_merge_n = n_tags.get("n", 0)  #   G
+        n_merge_A = n_tags.get("A", 0)  #   A
+        n_merge_C = n_tags.get("C", 0)  #   C
+        # includes F for diff2
+        n_merge_N = len(self.chunk_list) - (
+            n_merge_E + n_merge_e + n_merge_n + n_merge_A + n_merge_C
+        )
         if self.focused_usr_chunk_index is not None:
             focused_chunk_index = self.get_chunk_index_from_usr_chunk_list(
                 self.focused_usr_chunk_index
@@ -2049,31 +1442,15 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
                 s_virt_row = "*"
             else:
                 s_virt_row = s_number(self.chunk_to_virt[focused_chunk_index])
-            for chunk_index in range(len(self.chunk_list)):
-                tag = self.get_tag(chunk_index)
-                action = self.get_action(chunk_index)
-                if tag == "E":
-                    n_merge_E += 1
-                elif tag == "e":
-                    n_merge_e += 1
-                elif tag == "n":
-                    n_merge_n += 1
-                elif tag == "A":
-                    n_merge_A += 1
-                elif tag == "C":
-                    n_merge_C += 1
-                else:  # N or F
-                    n_merge_N += 1
-                    if action == "a":
-                        n_manual_a += 1
-                    elif action == "b":
-                        n_manual_b += 1
-                    elif action == "c":
-                        n_manual_c += 1
-                    elif action == "e":
-                        n_manual_e += 1
-                    else:
-                        n_unresolved += 1
+            # actions of N or F
+            n_actions = self.chunk_list.count_actions("NF")
+            n_manual_a = n_actions.get("a", 0)
+            n_manual_b = n_actions.get("b", 0)
+            n_manual_c = n_actions.get("c", 0)
+            n_manual_e = n_actions.get("e", 0)
+            n_unresolved = n_merge_N - (
+                n_manual_a + n_manual_b + n_manual_c + n_manual_e
+            )
             s_merge_E = s_number(n_merge_E)
             s_merge_e = s_number(n_merge_e)
             s_merge_n = s_number(n_merge_n)
@@ -2088,21 +1465,6 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
         else:
             s_focused_chunk_index = "*"
             s_focused_usr_chunk_index = "*"
-            for chunk_index in range(len(self.chunk_list)):
-                tag = self.get_tag(chunk_index)
-                action = self.get_action(chunk_index)
-                if tag == "E":
-                    n_merge_E += 1
-                elif tag == "e":
-                    n_merge_e += 1
-                elif tag == "n":
-                    n_merge_n += 1
-                elif tag == "A":
-                    n_merge_A += 1
-                elif tag == "C":
-                    n_merge_C += 1
-                else:  # N or F
-                    n_merge_N += 1
             s_merge_E = s_number(n_merge_E)
             s_merge_e = s_number(n_merge_e)
             s_merge_n = s_number(n_merge_n)
@@ -2121,7 +1483,7 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
         if self.diff_mode == 2:
             status_line = "row[{}/{}] chunk[{}/{}] usr_chunk[{}/{}] / =:{} / N:{}=(a:{},b:{},e:{},u:{}) / @[{}:{}]".format(
                 s_virt_row,
-                len(self.virt_to_chunk),
+                self.virt_row_max,
                 s_focused_chunk_index,
                 len(self.chunk_list),
                 s_focused_usr_chunk_index,
@@ -2138,7 +1500,7 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
         else:
             status_line = "row[{}/{}] chunk[{}/{}] usr_chunk[{}/{}] / =:{},#:{},G:{},A:{},C:{} / N:{}=(a:{},b:{},c:{},e:{},u:{}) / @[{}:{}]".format(
                 s_virt_row,
-                len(self.virt_to_chunk),
+                self.virt_row_max,
                 s_focused_chunk_index,
                 len(self.chunk_list),
                 s_focused_usr_chunk_index,
@@ -2212,9 +1574,7 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
 
     def set_updated_merge_buffer(self, chunk_index):  # override
         logger.debug(
-            "chunk[{}]: exit the curses UI and to invoke editor session".format(
-                chunk_index
-            )
+            "chunk[%s]: exit the curses UI and to invoke editor session", chunk_index
         )
         self.stdscr.keypad(False)  # keys not-processed by curses
         curses.savetty()
@@ -2229,9 +1589,7 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
         self.stdscr.clear()
         self.stdscr.refresh()
         logger.debug(
-            "chunk[{}]: finish editor session and return to the curses UI".format(
-                chunk_index
-            )
+            "chunk[%s]: finish editor session and return to the curses UI", chunk_index
         )
         return
 
@@ -2278,14 +1636,13 @@ tab,{N}   /shift-tab,{P}  select the next/previous unresolved usr_chunk
         span_col = stdscr_col_max - 2 * margin_col
         span_row = stdscr_row_max - 2 * margin_row
         logger.debug(
-            "stdscr={}:{} virt={}:{} span={}:{}".format(
-                stdscr_row_max,
-                stdscr_col_max,
-                virt_row_max,
-                virt_col_max,
-                span_row,
-                span_col,
-            )
+            "stdscr=%s:%s virt=%s:%s span=%s:%s",
+            stdscr_row_max,
+            stdscr_col_max,
+            virt_row_max,
+            virt_col_max,
+            span_row,
+            span_col,
         )
         if msg_row_max == 0 and (virt_row_max + 2 * margin_row) <= stdscr_row_max:
             msg_row_max = virt_row_max
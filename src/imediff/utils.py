@@ -26,11 +26,22 @@ Boston, MA 02110-1301, USA.
 """
 
 import io
+import locale
+import os
+import stat
 import sys
 import logging
+import mmap
+import tempfile
+from imediff.filelib import MMAP_MIN_BYTES, LineStore, decode_lines, is_binary
 
 logger = logging.getLogger(__name__)
 
+# (function, args) tasks for worker processes of run_parallel().  This is set
+# before forking them so they inherit it by copy-on-write instead of
+# receiving pickled data.
+_parallel_tasks = None
+
 # Utility functions
 # Console width with Zenkaku=2, Hankaku=1 (Hankaku=ASCII etc.)
 # Latin-1, CJK focus simplification applied.
@@ -49,33 +60,153 @@ logger = logging.getLogger(__name__)
 
 # file read
 def read_lines(filename):
-    logger.debug("read_lines filename = '{}'".format(filename))
+    logger.debug("read_lines filename = '%s'", filename)
     if filename is None or filename == "":
         lines = []
     else:
         try:
-            with open(filename, buffering=io.DEFAULT_BUFFER_SIZE) as fp:
-                lines = fp.readlines()  # read into list with tailing \n
-        except Exception as _:
-            lines = []
+            with open(filename, mode="rb") as fp:
+                if os.fstat(fp.fileno()).st_size >= MMAP_MIN_BYTES:
+                    data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    data = fp.read()
+        except OSError as err:
+            logger.error("Error %s in reading input file: %s", err, filename)
+            # enhanced visibility
+            print(
+                "E: Error {} in reading input file: {}".format(err, filename),
+                file=sys.stderr,
+            )
+            sys.exit(2)
+        if is_binary(data):
+            logger.error("Binary file can't be merged: %s", filename)
+            # enhanced visibility
+            print(
+                "E: Binary file can't be merged: {}".format(filename), file=sys.stderr
+            )
+            sys.exit(2)
+        if isinstance(data, mmap.mmap):
+            lines = LineStore(data)  # decoded on access
+        else:
+            lines = decode_lines(data)  # read into list with tailing \n
     return lines
 
 
 # file output
-def write_file(filename, output):
-    logger.debug("write_file filename = '{}'".format(filename))
-    if filename is None or filename == "-" or filename == "":
-        sys.stderr.write(output)
+def _write_content(fp, lines):
+    if isinstance(lines, memoryview):  # raw bytes from LineStore
+        fp.flush()
+        fp.buffer.write(lines)
     else:
+        fp.writelines(lines)
+    return
+
+
+def write_lines(filename, contents):
+    """
+    Write contents (iterable of lists of lines or memoryviews of raw bytes)
+    to filename
+
+    A regular file is written as a temporary file in the same directory and
+    renamed to filename at the end, so an interrupted write leaves the old
+    filename intact.  Without filename, contents are written to the binary
+    buffer of stderr encoded as they were decoded by read_lines().
+    """
+    logger.debug("write_lines filename = '%s'", filename)
+    if filename is None or filename == "-" or filename == "":
+        encoding = locale.getpreferredencoding(False)
+        sys.stderr.flush()
+        fp = sys.stderr.buffer
+        for lines in contents:
+            if isinstance(lines, memoryview):  # raw bytes from LineStore
+                fp.write(lines)
+            else:
+                fp.write("".join(lines).encode(encoding, "surrogateescape"))
+        fp.flush()
+        return
+    path = os.path.realpath(filename)  # keep symlink
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = stat.S_IFREG | (0o666 & ~umask)
+    if not stat.S_ISREG(mode):  # such as /dev/null
         try:
-            with open(filename, mode="w", buffering=io.DEFAULT_BUFFER_SIZE) as fp:
-                fp.write(output)
+            with open(
+                path,
+                mode="w",
+                buffering=io.DEFAULT_BUFFER_SIZE,
+                errors="surrogateescape",
+            ) as fp:
+                for lines in contents:
+                    _write_content(fp, lines)
         except OSError as err:
-            logger.error("Error {} in creating output file: {}".format(err, filename))
+            logger.error("Error %s in creating output file: %s", err, filename)
             sys.exit(2)
+        return
+    temp_file_name = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            buffering=io.DEFAULT_BUFFER_SIZE,
+            errors="surrogateescape",
+            suffix=".tmp",
+            prefix=".imediff.",
+            dir=os.path.dirname(path),
+            delete=False,
+        ) as fp:
+            temp_file_name = fp.name
+            for lines in contents:
+                _write_content(fp, lines)
+        os.chmod(temp_file_name, stat.S_IMODE(mode))
+        os.replace(temp_file_name, path)
+        temp_file_name = None
+    except OSError as err:
+        logger.error("Error %s in creating output file: %s", err, filename)
+        sys.exit(2)
+    finally:
+        if temp_file_name is not None:
+            os.remove(temp_file_name)
     return
 
 
+# parallel execution
+def _run_task(n):
+    function, args = _parallel_tasks[n]
+    return function(*args)
+
+
+def run_parallel(tasks, jobs=1):
+    """
+    Return list of function(*args) for each (function, args) of tasks
+
+    With jobs > 1, they are computed in up to jobs forked worker processes.
+    Only the index of each task and its result are pickled.  If fork is not
+    available, they are computed one by one.
+    """
+    global _parallel_tasks
+    if jobs > 1 and len(tasks) > 1:
+        # import here since only "--jobs" needs it
+        import multiprocessing
+
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            logger.debug("run_parallel: fork is not available: run serially")
+            context = None
+        if context is not None:
+            _parallel_tasks = tasks
+            try:
+                with context.Pool(min(jobs, len(tasks))) as pool:
+                    return pool.map(_run_task, range(len(tasks)))
+            except OSError as err:
+                logger.debug("run_parallel: fork failed (%s): run serially", err)
+            finally:
+                _parallel_tasks = None
+    return [function(*args) for function, args in tasks]
+
+
 def s_number(number):
     if number is None:
         ret = "*"
@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+# vim:se tw=79 sts=4 ts=4 et ai fileencoding=utf-8 :
+
+"""
+Module wordlib -- matching words within lines for wdiff
+
+Function tokenize:
+    Split a line into words, whitespace runs and punctuation marks.
+
+Function wdiff2_opcodes:
+    Opcodes to display or merge wdiff of 2 lines.
+
+Function wdiff3_opcodes:
+    Opcodes to display or merge wdiff of 3 lines.
+
+Lines are compared character by character (mode "char") or token by token
+(mode "word").  In both modes, opcode indexes are character offsets.
+
+Copyright (C) 2018--2025 Osamu Aoki <osamu@debian.org>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of
+the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the Free
+Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301, USA.
+"""
+
+from difflib import SequenceMatcher
+from imediff.diff3lib import SequenceMatcher3
+from imediff.lines2lib import intern_lines
+
+import re
+import sys
+
+# wdiff modes: compare characters or tokens
+WDIFF_MODES = ["char", "word"]
+
+# a token is a word, a run of whitespaces or a punctuation mark
+RE_TOKEN = re.compile(r"\w+|\s+|[^\w\s]")
+
+
+def tokenize(line):
+    """
+    Return list of tokens of line
+
+    Joining the tokens gives back line.
+
+    >>> tokenize("foo(bar,  baz)\\n")
+    ['foo', '(', 'bar', ',', '  ', 'baz', ')', '\\n']
+    """
+    return RE_TOKEN.findall(line)
+
+
+def _prepare(lines):
+    """
+    Return list of interned token IDs of each of lines and list of character
+    offsets of their tokens (with the length of line at the end)
+    """
+    token_ids = {}
+    ids = []
+    offsets = []
+    for line in lines:
+        tokens = tokenize(line)
+        ids.append(intern_lines(tokens, token_ids))
+        offset = [0]
+        for token in tokens:
+            offset.append(offset[-1] + len(token))
+        offsets.append(offset)
+    return ids, offsets
+
+
+def wdiff2_opcodes(line_a, line_b, mode="char", isjunk=None):
+    """
+    Return list of (tag, i1, i2, j1, j2) to turn line_a into line_b
+
+    The tag is the same as difflib.SequenceMatcher.  isjunk is a function
+    to check junk characters for mode "char".  Mode "word" ignores isjunk
+    since whitespaces are already separate tokens, and junk whitespace
+    tokens could drop a whitespace from a clean merge.
+
+    >>> wdiff2_opcodes("call foo(1)", "call bar(1)")
+    [('equal', 0, 5, 0, 5), ('replace', 5, 8, 5, 8), ('equal', 8, 11, 8, 11)]
+    >>> wdiff2_opcodes("call foo(1)", "call bar(1)", "word")
+    [('equal', 0, 5, 0, 5), ('replace', 5, 8, 5, 8), ('equal', 8, 11, 8, 11)]
+    >>> wdiff2_opcodes("a stone", "a store", "char")[1:3]
+    [('replace', 5, 6, 5, 6), ('equal', 6, 7, 6, 7)]
+    >>> wdiff2_opcodes("a stone", "a store", "word")
+    [('equal', 0, 2, 0, 2), ('replace', 2, 7, 2, 7)]
+    """
+    if mode == "char":
+        return SequenceMatcher(isjunk, line_a, line_b, False).get_opcodes()
+    (ids_a, ids_b), (offsets_a, offsets_b) = _prepare([line_a, line_b])
+    opcodes = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(
+        None, ids_a, ids_b, False
+    ).get_opcodes():
+        opcodes.append(
+            (tag, offsets_a[i1], offsets_a[i2], offsets_b[j1], offsets_b[j2])
+        )
+    return opcodes
+
+
+def wdiff3_opcodes(line_a, line_b, line_c, mode="char", isjunk=None):
+    """
+    Return list of (tag, i1, i2, j1, j2, k1, k2) to merge line_a and
+    line_c with the base line_b
+
+    The tag is the same as SequenceMatcher3.  isjunk is the same as
+    wdiff2_opcodes().
+
+    >>> wdiff3_opcodes("x = foo(1)", "x = foo(0)", "y = foo(0)", "word")
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [('C', 0, 1, 0, 1, 0, 1), ('E', 1, 8, 1, 8, 1, 8), ('A', 8, 9, 8, 9, 8, 9),
+     ('E', 9, 10, 9, 10, 9, 10)]
+    """
+    if mode == "char":
+        matcher = SequenceMatcher3(line_a, line_b, line_c, 0, isjunk, True)
+        return matcher.get_opcodes()
+    (ids_a, ids_b, ids_c), (offsets_a, offsets_b, offsets_c) = _prepare(
+        [line_a, line_b, line_c]
+    )
+    opcodes = []
+    for tag, i1, i2, j1, j2, k1, k2 in SequenceMatcher3(
+        ids_a, ids_b, ids_c, 0, None, True
+    ).get_opcodes():
+        opcodes.append(
+            (
+                tag,
+                offsets_a[i1],
+                offsets_a[i2],
+                offsets_b[j1],
+                offsets_b[j2],
+                offsets_c[k1],
+                offsets_c[k2],
+            )
+        )
+    return opcodes
+
+
+if __name__ == "__main__":
+    import doctest
+
+    flags = doctest.REPORT_NDIFF | doctest.FAIL_FAST
+    fail, total = doctest.testmod(optionflags=flags)
+    print("{} failures out of {} tests -- ".format(fail, total), end="")
+    if fail == 0:
+        sys.exit(0)
+    else:
+        sys.exit(1)
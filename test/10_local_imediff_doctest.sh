@@ -21,3 +21,21 @@ echo
 python3 ../src/imediff/lines2lib.py
 echo "I: success for doctest on src/imediff/lines2lib.py"
 echo
+python3 ../src/imediff/diff2lib.py
+echo "I: success for doctest on src/imediff/diff2lib.py"
+echo
+python3 ../src/imediff/chunklib.py
+echo "I: success for doctest on src/imediff/chunklib.py"
+echo
+python3 ../src/imediff/fastlib.py
+echo "I: success for doctest on src/imediff/fastlib.py"
+echo
+python3 ../src/imediff/wordlib.py
+echo "I: success for doctest on src/imediff/wordlib.py"
+echo
+python3 ../src/imediff/filelib.py
+echo "I: success for doctest on src/imediff/filelib.py"
+echo
+python3 ../src/imediff/gitime.py
+echo "I: success for doctest on src/imediff/gitime.py"
+echo
@@ -7,7 +7,8 @@
 THISFILE="$(realpath $0)"
 THISDIR="${THISFILE%/*}"
 REPO_DIR="${THISDIR}/repo"
-GIT_IME=$THISDIR/../usr/bin/git-ime.in
+# set GIT_IME="python3 $THISDIR/_git_ime.py" to test the Python version
+GIT_IME="${GIT_IME:-$THISDIR/../usr/bin/git-ime.in}"
 
 if [ "$1" = "-c" ]; then
 	rm -rf "$REPO_DIR"
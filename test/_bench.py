@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Script to benchmark CPU time of the line matching logic of imediff
+
+Use as:
+
+ $ python3 _bench.py [lines [repeat [loglevel]]]
+
+Logging is set up as imediff does by default (WARNING to /dev/null) unless
+loglevel is given.
+"""
+import logging
+import sys
+import time
+import imediff.diff3lib
+import imediff.lines2lib
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+loglevel = sys.argv[3] if len(sys.argv) > 3 else "WARNING"
+logging.basicConfig(
+    filename="/dev/null",
+    level=getattr(logging, loglevel.upper(), logging.WARNING),
+)
+
+# synthetic source code like input with scattered edits
+b = ["    value_{} = compute({}, {})\n".format(i, i % 7, i % 11) for i in range(n)]
+a = b[:]
+c = b[:]
+for i in range(3, n, 17):
+    a[i] = "    value_{} = compute({}, {})  # a\n".format(i, i % 7, i % 11)
+for i in range(5, n, 23):
+    c[i] = "    value_{} = recompute({})\n".format(i, i % 5)
+for i in range(11, n, 97):
+    a[i : i + 1] = []
+    c[i : i + 1] = ["    # new\n", c[i]]
+
+
+def bench(name, function):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        function()
+        cpu = time.process_time() - start
+        if best is None or cpu < best:
+            best = cpu
+    print("{:<16} {:8.3f} s (best of {})".format(name, best, repeat))
+
+
+print("lines={} loglevel={}".format(n, loglevel))
+bench(
+    "LineMatcher",
+    lambda: imediff.lines2lib.LineMatcher(a, b).get_opcodes(),
+)
+bench(
+    "SequenceMatcher3",
+    lambda: imediff.diff3lib.SequenceMatcher3(a, b, c, 1).get_opcodes(),
+)
@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Script to test imediff.gitime module
+
+Use as:
+
+ $ python3 _git_ime.py ...
+
+"""
+import os
+import sys
+import imediff.gitime
+
+print("\nI: _git_ime start >>>", file=sys.stderr)
+cwd_dir = os.getcwd()
+print("I: cwd_dir     = '{}'".format(cwd_dir), file=sys.stderr)
+print("I: test_file   = '{}' (active)".format(__file__), file=sys.stderr)
+if "PYTHONPATH" in os.environ:
+    print("I: PYTHONPATH  = '{}'".format(os.environ["PYTHONPATH"]), file=sys.stderr)
+else:
+    print("I: PYTHONPATH  = <undefined>", file=sys.stderr)
+print("I: _git_ime end   <<<", file=sys.stderr)
+#
+sys.exit(imediff.gitime.main())
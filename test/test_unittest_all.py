@@ -28,9 +28,24 @@ modern algorithm, this test may yield slightly different result.
 """
 import unittest
 import subprocess
+import io
 import os
 import os.path
+import shutil
+import sys
+import tempfile
+import imediff.cli
+import imediff.config
+import imediff.diff2lib
 import imediff.diff3lib
+import imediff.fastlib
+import imediff.filelib
+import imediff.gitime
+import imediff.initialize_args
+import imediff.initialize_confs
+import imediff.lines2lib
+import imediff.utils
+import imediff.wordlib
 
 # Deb package build dh_test
 #
@@ -102,11 +117,34 @@ else:
     print("I: PYTHONPATH  = <undefined>")
 
 
+def init_args_confs(argv):
+    """Return args and confs for TextData as main() does for argv"""
+    args = imediff.initialize_args.initialize_args(argv)
+    args.edit_cmd = "true"  # set by main()
+    confs = imediff.initialize_confs.initialize_confs(args.conf)
+    return args, confs
+
+
 class TestImediff(unittest.TestCase):
     a = "a12b345c6789d"
     b = "123456789"
     c = "a1234b567c89d"
 
+    def setUp(self):
+        # keep compiled configuration caches out of the real home directory
+        self.cache_home = os.environ.get("XDG_CACHE_HOME")
+        self.cache_dir = tempfile.TemporaryDirectory()
+        os.environ["XDG_CACHE_HOME"] = self.cache_dir.name
+        return
+
+    def tearDown(self):
+        if self.cache_home is None:
+            del os.environ["XDG_CACHE_HOME"]
+        else:
+            os.environ["XDG_CACHE_HOME"] = self.cache_home
+        self.cache_dir.cleanup()
+        return
+
     def test_diff3lib_abc(self):
         a = "a12b345c6789d"
         b = "123456789"
@@ -129,6 +167,682 @@ class TestImediff(unittest.TestCase):
         )
         return
 
+    def test_diff3lib_coalesce(self):
+        b = ["line {}\n".format(i) for i in range(10)]
+        a = b[:]
+        c = b[:3] + ["new line\n"] + b[5:]
+        self.assertEqual(
+            imediff.diff3lib.SequenceMatcher3(
+                a, b, c, 1, None, True, 2, 128, 1, 8, True, True
+            ).get_opcodes(),
+            [
+                ("E", 0, 3, 0, 3, 0, 3),
+                ("C", 3, 5, 3, 5, 3, 4),
+                ("E", 5, 10, 5, 10, 4, 9),
+            ],
+        )
+        return
+
+    def test_diff2lib_engines(self):
+        # All engines yield valid edit scripts and Myers engine yields one
+        # which is never longer than the one by difflib for all pairs of
+        # test files
+        names = ["file_a", "file_b", "file_c"]
+        for suffix in ["", "0", "1"]:
+            lists = []
+            for name in names:
+                with open(test_dir + "/" + name + suffix) as fp:
+                    lists.append(fp.readlines())
+            for a, b in [(1, 0), (1, 2), (0, 2)]:
+                list_a = lists[a]
+                list_b = lists[b]
+                edits = {}
+                for engine in imediff.diff2lib.ENGINES:
+                    opcodes = imediff.diff2lib.get_sequence_matcher(
+                        engine, None, list_a, list_b
+                    ).get_opcodes()
+                    list_x = []
+                    edits[engine] = 0
+                    for tag, i1, i2, j1, j2 in opcodes:
+                        if tag == "equal":
+                            self.assertEqual(list_a[i1:i2], list_b[j1:j2])
+                        else:
+                            edits[engine] += (i2 - i1) + (j2 - j1)
+                        list_x += list_b[j1:j2]
+                    self.assertEqual(list_x, list_b)
+                self.assertLessEqual(edits["myers"], edits["difflib"])
+        return
+
+    def test_diff3lib_myers(self):
+        a = "a12b345c6789d"
+        b = "123456789"
+        c = "a1234b567c89d"
+        self.assertEqual(
+            imediff.diff3lib.SequenceMatcher3(
+                a, b, c, 0, None, True, 2, 128, 1, 8, True, False, "myers"
+            ).get_opcodes(),
+            imediff.diff3lib.SequenceMatcher3(a, b, c, 0, None, True).get_opcodes(),
+        )
+        return
+
+    def test_diff3lib_patience(self):
+        # swapped functions should not be matched on "{", "}" and blank lines
+        b = ["int f()\n", "{\n", "  f1;\n", "}\n", "\n"]
+        b += ["int g()\n", "{\n", "  g1;\n", "}\n"]
+        a = b[:]
+        c = b[5:] + ["\n"] + b[:4]
+        opcodes = {
+            "patience": [
+                ("C", 0, 0, 0, 0, 0, 5),
+                ("E", 0, 3, 0, 3, 5, 8),
+                ("C", 3, 8, 3, 8, 8, 8),
+                ("E", 8, 9, 8, 9, 8, 9),
+            ],
+            "histogram": [
+                ("C", 0, 5, 0, 5, 0, 0),
+                ("E", 5, 8, 5, 8, 0, 3),
+                ("C", 8, 8, 8, 8, 3, 8),
+                ("E", 8, 9, 8, 9, 8, 9),
+            ],
+        }
+        for engine in ["patience", "histogram"]:
+            self.assertEqual(
+                imediff.diff3lib.SequenceMatcher3(
+                    a, b, c, 1, None, True, 2, 128, 1, 8, True, True, engine
+                ).get_opcodes(),
+                opcodes[engine],
+            )
+        return
+
+    def test_diff3lib_trim(self):
+        b = ["line {}\n".format(i) for i in range(1000)]
+        a = b[:]
+        a[500] = "line 500 by a\n"
+        c = b[:]
+        c[499:502] = []
+        self.assertEqual(
+            imediff.diff3lib.SequenceMatcher3(
+                a, b, c, 1, None, True, 2, 128, 1, 8, True, True
+            ).get_opcodes(),
+            [
+                ("E", 0, 499, 0, 499, 0, 499),
+                ("C", 499, 500, 499, 500, 499, 499),
+                ("N", 500, 501, 500, 501, 499, 499),
+                ("C", 501, 502, 501, 502, 499, 499),
+                ("E", 502, 1000, 502, 1000, 499, 997),
+            ],
+        )
+        self.assertEqual(
+            imediff.diff3lib.SequenceMatcher3(
+                b, b, b[:], 1, None, True, 2, 128, 1, 8, True, True
+            ).get_opcodes(),
+            [("E", 0, 1000, 0, 1000, 0, 1000)],
+        )
+        # common prefix is aligned first, so the repeated lines are deleted
+        # after it instead of before it (as difflib alone does)
+        a = ["A\n", "B\n", "C\n", "A\n", "B\n", "C\n", "D\n"]
+        b = ["A\n", "B\n", "C\n", "D\n"]
+        self.assertEqual(
+            imediff.lines2lib.LineMatcher(a, b, coalesce=True).get_opcodes(),
+            [("E", 0, 3, 0, 3), ("N", 3, 6, 3, 3), ("E", 6, 7, 3, 4)],
+        )
+        self.assertEqual(
+            imediff.diff3lib.SequenceMatcher3(
+                a, b, b, 1, None, True, 2, 128, 1, 8, True, True
+            ).get_opcodes(),
+            [
+                ("E", 0, 3, 0, 3, 0, 3),
+                ("A", 3, 6, 3, 3, 3, 3),
+                ("E", 6, 7, 3, 4, 3, 4),
+            ],
+        )
+        return
+
+    def test_diff3lib_jobs(self):
+        n = imediff.diff3lib.JOBS_MIN_LINES
+        b = ["line {}\n".format(i) for i in range(n)]
+        a = b[:]
+        c = b[:]
+        for i in range(10, n, 100):
+            a[i] = " line {} by a\n".format(i)
+            c[i + 1] = "line {} by c\n".format(i + 1)
+        c[n // 2 : n // 2] = ["new line\n"]
+        # no common prefix nor suffix to be trimmed
+        a[0] = "line 0 by a\n"
+        c[-1] = "line {} by c\n".format(n - 1)
+        args = (a, b, c, 1, None, True, 2, 128, 1, 8, True, True, "difflib")
+        self.assertEqual(
+            imediff.diff3lib.SequenceMatcher3(*args, 2).get_opcodes(),
+            imediff.diff3lib.SequenceMatcher3(*args, 1).get_opcodes(),
+        )
+        return
+
+    def test_lines2lib_partition(self):
+        n = 300
+        b = ["line {}\n".format(i) for i in range(n)]
+        a = b[:]
+        c = b[:]
+        for i in range(7, n, 20):
+            a[i] = " line {} by a\n".format(i)
+            c[i + 1] = "line {} by c\n".format(i + 1)
+        c[n // 2 : n // 2] = ["new line\n"]
+        a[0] = "line 0 by a\n"
+        c[-1] = "line {} by c\n".format(n - 1)
+        partition_min_lines = imediff.lines2lib.PARTITION_MIN_LINES
+        segment_min_lines = imediff.lines2lib.SEGMENT_MIN_LINES
+        try:
+            imediff.lines2lib.PARTITION_MIN_LINES = 100
+            imediff.lines2lib.SEGMENT_MIN_LINES = 30
+            self.assertNotEqual(imediff.lines2lib.find_anchors([b, a, c]), [])
+            # Partitioning is off by default.  Partitioned results are not
+            # identical to unpartitioned ones in general since no match
+            # crosses an anchor line, but they are identical here since all
+            # changes are single lines apart from anchor lines.
+            for coalesce in (False, True):
+                args = (a, b, 2, 128, 1, 8, coalesce, "difflib", None)
+                matcher = imediff.lines2lib.LineMatcher
+                opcodes = matcher(*args, 1, False).get_opcodes()
+                self.assertEqual(matcher(*args).get_opcodes(), opcodes)
+                self.assertEqual(matcher(*args, 2, True).get_opcodes(), opcodes)
+                self.assertEqual(list(matcher(*args, 1, True).iter_opcodes()), opcodes)
+                args = (a, b, c, 1, None, True, 2, 128, 1, 8, True, coalesce)
+                args += ("difflib",)
+                matcher = imediff.diff3lib.SequenceMatcher3
+                opcodes = matcher(*args, 1, False).get_opcodes()
+                self.assertEqual(matcher(*args).get_opcodes(), opcodes)
+                self.assertEqual(matcher(*args, 2, True).get_opcodes(), opcodes)
+                self.assertEqual(list(matcher(*args, 1, True).iter_opcodes()), opcodes)
+        finally:
+            imediff.lines2lib.PARTITION_MIN_LINES = partition_min_lines
+            imediff.lines2lib.SEGMENT_MIN_LINES = segment_min_lines
+        return
+
+    def test_lines2lib_sketch(self):
+        b = ["    value_{} = compute({})\n".format(i, i) for i in range(40)]
+        a = b[:]
+        a[10:14] = ["    value_11 = compute(11, x)\n", "    # new line\n"]
+        a[20:21] = ["    # other line\n", "    value_22 = recompute(22)\n"]
+        matcher = imediff.lines2lib.LineMatcher
+        opcodes = matcher(a, b, fuzzy="sketch").get_opcodes()
+        # opcodes cover a and b in order
+        i0 = j0 = 0
+        for tag, i1, i2, j1, j2 in opcodes:
+            self.assertEqual((i1, j1), (i0, j0))
+            i0 = i2
+            j0 = j2
+        self.assertEqual((i0, j0), (len(a), len(b)))
+        self.assertIn(("F", 10, 11, 11, 12), opcodes)
+        self.assertIn(("F", 21, 22, 22, 23), opcodes)
+        # sketch mode is threaded through SequenceMatcher3
+        args = (a, b, a, 1, None, True, 2, 128, 1, 8, True, False, "difflib")
+        opcodes3 = imediff.diff3lib.SequenceMatcher3(
+            *args, 1, True, "sketch"
+        ).get_opcodes()
+        self.assertIn(("e", 10, 11, 11, 12, 10, 11), opcodes3)
+        return
+
+    def test_lines2lib_ratio(self):
+        line_ratio = imediff.lines2lib.line_ratio
+        for a, b, ratio in (
+            ("kitten", "sitting", 1 - 3 / 7),
+            ("flaw", "lawn", 0.5),
+            ("abc", "abc", 1.0),
+            ("abc", "", 0.0),
+        ):
+            self.assertAlmostEqual(line_ratio(a, b, 0.0), ratio)
+        # below cutoff
+        self.assertEqual(line_ratio("kitten", "sitting", 0.6), 0.0)
+        b = ["    value_{} = compute({})\n".format(i, i) for i in range(40)]
+        a = b[:]
+        a[10] = "    value_10 = compute(10, x)\n"
+        a[20] = "    # unrelated comment\n"
+        a[30:31] = ["    # new line\n", "    value_30 = compute(3)\n"]
+        opcodes = imediff.lines2lib.LineMatcher(a, b, fuzzy="ratio").get_opcodes()
+        self.assertIn(("F", 10, 11, 10, 11), opcodes)
+        self.assertIn(("N", 20, 21, 20, 21), opcodes)
+        self.assertIn(("N", 30, 31, 30, 30), opcodes)
+        self.assertIn(("F", 31, 32, 30, 31), opcodes)
+        return
+
+    def test_lines2lib_ratio_shrink(self):
+        # a dissimilar single line replaced inside a block matched by
+        # shrinking head and tail portions is still checked by "ratio"
+        a = ["head alpha 1\n", "zzzz qqqq\n", "head alpha 3\n"]
+        b = ["head alpha 1 x\n", "yyyy wwww\n", "head alpha 3 y\n"]
+        fuzzy_max_pairs = imediff.lines2lib.FUZZY_MAX_PAIRS
+        try:
+            imediff.lines2lib.FUZZY_MAX_PAIRS = 1
+            matcher = imediff.lines2lib.LineMatcher
+            opcodes = matcher(a, b, fuzzy="ratio").get_opcodes()
+            self.assertEqual(opcodes[1], ("N", 1, 2, 1, 2))
+            opcodes = matcher(a, b, fuzzy="shrink").get_opcodes()
+            self.assertEqual(opcodes[1], ("F", 1, 2, 1, 2))
+        finally:
+            imediff.lines2lib.FUZZY_MAX_PAIRS = fuzzy_max_pairs
+        return
+
+    @unittest.skipIf(imediff.filelib.get_numpy() is None, "NumPy is not available")
+    def test_fastlib_numpy(self):
+        n = 1000
+        b = ["line {}\n".format(i % 97) for i in range(n)]
+        a = b[:]
+        c = b[:]
+        for i in range(300, 700, 37):
+            a[i] = " line {}\n".format(i % 97)
+            c[i + 1] = "line {} by c\n".format(i + 1)
+        use_numpy = imediff.fastlib.USE_NUMPY
+        numpy_min_lines = imediff.fastlib.NUMPY_MIN_LINES
+        try:
+            imediff.fastlib.NUMPY_MIN_LINES = 16
+            results = []
+            for use in (True, False):
+                imediff.fastlib.USE_NUMPY = use
+                results.append(
+                    (
+                        imediff.fastlib.common_prefix([a, b, c], n),
+                        imediff.fastlib.common_suffix([a, b, c], n),
+                        imediff.fastlib.equal_runs(a, c),
+                        imediff.lines2lib.LineMatcher(a, b).get_opcodes(),
+                        imediff.diff3lib.SequenceMatcher3(a, b, c, 1).get_opcodes(),
+                    )
+                )
+            self.assertEqual(results[0], results[1])
+        finally:
+            imediff.fastlib.USE_NUMPY = use_numpy
+            imediff.fastlib.NUMPY_MIN_LINES = numpy_min_lines
+        return
+
+    def test_fastlib_doctest(self):
+        result = subprocess.call(
+            "python3 " + doctest_dir + "/fastlib.py",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
+    def test_wordlib_word(self):
+        line_a = "total = compute(values, 1) + offset  # by a\n"
+        line_b = "total = compute(values, 0) + offset\n"
+        line_c = "result = compute(values, 0) + offset\n"
+        for line in (line_a, line_b, line_c):
+            self.assertEqual("".join(imediff.wordlib.tokenize(line)), line)
+        for mode in imediff.wordlib.WDIFF_MODES:
+            merged = ""
+            for tag, i1, i2, j1, j2, k1, k2 in imediff.wordlib.wdiff3_opcodes(
+                line_a, line_b, line_c, mode
+            ):
+                self.assertNotEqual(tag, "N")
+                if tag == "C":
+                    merged += line_c[k1:k2]
+                else:
+                    merged += line_a[i1:i2]
+            self.assertEqual(merged, "result = compute(values, 1) + offset  # by a\n")
+            opcodes = imediff.wordlib.wdiff2_opcodes(line_a, line_b, mode)
+            self.assertEqual((opcodes[0][1], opcodes[0][3]), (0, 0))
+            self.assertEqual(opcodes[-1][2], len(line_a))
+            self.assertEqual(opcodes[-1][4], len(line_b))
+        return
+
+    def test_wordlib_doctest(self):
+        result = subprocess.call(
+            "python3 " + doctest_dir + "/wordlib.py",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
+    def test_cli_wdiff_cache(self):
+        files = [os.path.join(test_dir, f) for f in ("file_a", "file_b", "file_c")]
+        args, confs = init_args_confs(["-n", "-f", "-C", "none"] + files)
+        lists = [imediff.utils.read_lines(f) for f in files]
+        text_data = imediff.cli.TextData(*lists, args, confs)
+        self.assertNotEqual(text_data.wdiff_cache, {})
+        for chunk_index in list(text_data.wdiff_cache):
+            wdiff = text_data.get_wdiff(chunk_index)
+            self.assertIs(text_data.get_wdiff(chunk_index), wdiff)
+            (clean_merge, content, segments) = wdiff
+            self.assertEqual("".join(text for text, _ in segments), content[0])
+            self.assertEqual(
+                text_data.get_merge_wdiff3(chunk_index), (clean_merge, content)
+            )
+        return
+
+    def test_cli_set_action_all(self):
+        args, confs = init_args_confs(["-n", "-d", "-C", "none", "a", "b", "c"])
+        list_a = []
+        list_b = []
+        list_c = []
+        for n in range(40):
+            line = "line %d of a few words\n" % n
+            list_a.append(line.replace("few", "many") if n % 4 == 1 else line)
+            list_b.append(line)
+            list_c.append(line.replace("words", "tokens") if n % 4 == 1 else line)
+        text_data = imediff.cli.TextData(list_a, list_b, list_c, args, confs)
+        self.assertEqual(len(text_data.usr_chunk_list), 10)
+        text_data.focused_usr_chunk_index = 3
+        focused_chunk_index = text_data.usr_chunk_list[3]
+        # resolve one chunk before the focused one
+        text_data.set_action(text_data.usr_chunk_list[1], "g")
+        self.assertEqual(len(text_data.usr_chunk_list), 9)
+        self.assertEqual(text_data.usr_chunk_list[2], focused_chunk_index)
+        self.assertEqual(text_data.focused_usr_chunk_index, 2)
+        # an error in the middle keeps usr_chunk_list up to date
+        set_action = text_data.set_action
+        chunk_indexes = []
+
+        def failing_set_action(chunk_index, action_request):
+            chunk_indexes.append(chunk_index)
+            if len(chunk_indexes) == 3:
+                raise RuntimeError("test")
+            set_action(chunk_index, action_request)
+
+        text_data.set_action = failing_set_action
+        with self.assertRaises(RuntimeError):
+            text_data.set_action_all("g")
+        del text_data.set_action
+        self.assertFalse(text_data.defer_reindex)
+        self.assertEqual(len(text_data.usr_chunk_list), 7)
+        # resolve all the rest
+        text_data.set_action_all("g")
+        self.assertEqual(text_data.usr_chunk_list, [])
+        self.assertIsNone(text_data.focused_usr_chunk_index)
+        self.assertEqual(text_data.chunk_list.count_tags()["n"], 10)
+        return
+
+    def test_cli_split_content(self):
+        args, confs = init_args_confs(["-n", "-C", "none", "a", "b"])
+        list_a = ["line %d\n" % n for n in range(20)]
+        list_b = [line.upper() if n % 5 == 2 else line for n, line in enumerate(list_a)]
+        text_data = imediff.cli.TextData(list_a, list_b, None, args, confs)
+        contents = [
+            [line for lines in content for line in lines]
+            for content in text_data.iter_split_content()
+        ]
+        self.assertEqual(len(contents), 4)
+        for n, content in enumerate(contents):
+            self.assertEqual(content[: 5 * n + 3], list_b[: 5 * n + 3])
+            self.assertEqual(content[5 * n + 3 :], list_a[5 * n + 3 :])
+        self.assertEqual(contents[-1], list_b)
+        return
+
+    def test_utils_write_lines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_o = os.path.join(temp_dir, "file_o")
+            link_o = os.path.join(temp_dir, "link_o")
+            with open(file_o, "w") as fp:
+                fp.write("old\n")
+            os.chmod(file_o, 0o640)
+            os.symlink("file_o", link_o)
+            imediff.utils.write_lines(link_o, iter([["a\n", "b\n"], [], ["c\n"]]))
+            self.assertTrue(os.path.islink(link_o))
+            self.assertEqual(os.stat(file_o).st_mode & 0o777, 0o640)
+            self.assertEqual(imediff.utils.read_lines(file_o), ["a\n", "b\n", "c\n"])
+            self.assertEqual(sorted(os.listdir(temp_dir)), ["file_o", "link_o"])
+        return
+
+    def test_filelib_linestore(self):
+        files = [os.path.join(test_dir, f) for f in ("file_a", "file_b", "file_c")]
+        args, confs = init_args_confs(["-n", "-f", "-C", "none"] + files)
+        outputs = []
+        mmap_min_bytes = imediff.utils.MMAP_MIN_BYTES
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_o = os.path.join(temp_dir, "file_o")
+            try:
+                for mmap_min in (mmap_min_bytes, 0):
+                    imediff.utils.MMAP_MIN_BYTES = mmap_min
+                    lists = [imediff.utils.read_lines(f) for f in files]
+                    text_data = imediff.cli.TextData(*lists, args, confs)
+                    imediff.utils.write_lines(
+                        file_o, text_data.iter_content_for_file()
+                    )
+                    with open(file_o, "rb") as fp:
+                        outputs.append(fp.read())
+            finally:
+                imediff.utils.MMAP_MIN_BYTES = mmap_min_bytes
+        self.assertIsInstance(lists[0], imediff.filelib.LineStore)
+        self.assertEqual(list(lists[0]), imediff.utils.read_lines(files[0]))
+        self.assertEqual(outputs[1], outputs[0])
+        return
+
+    def test_utils_read_lines_bytes(self):
+        data = b"foo\r\n\xff\xfe bar\nbaz"
+        mmap_min_bytes = imediff.utils.MMAP_MIN_BYTES
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_a = os.path.join(temp_dir, "file_a")
+            file_o = os.path.join(temp_dir, "file_o")
+            with open(file_a, "wb") as fp:
+                fp.write(data)
+            try:
+                for mmap_min in (mmap_min_bytes, 0):
+                    imediff.utils.MMAP_MIN_BYTES = mmap_min
+                    lines = imediff.utils.read_lines(file_a)
+                    self.assertEqual(len(lines), 3)
+                    imediff.utils.write_lines(file_o, [lines[0:2], lines[2:]])
+                    with open(file_o, "rb") as fp:
+                        self.assertEqual(fp.read(), data)
+            finally:
+                imediff.utils.MMAP_MIN_BYTES = mmap_min_bytes
+            # without filename, written to stderr
+            stderr = sys.stderr
+            try:
+                for mmap_min in (mmap_min_bytes, 0):
+                    imediff.utils.MMAP_MIN_BYTES = mmap_min
+                    lines = imediff.utils.read_lines(file_a)
+                    sys.stderr = io.TextIOWrapper(
+                        io.BytesIO(), errors="backslashreplace"
+                    )
+                    imediff.utils.write_lines(None, [lines[0:2], lines[2:]])
+                    self.assertEqual(sys.stderr.buffer.getvalue(), data)
+            finally:
+                sys.stderr = stderr
+                imediff.utils.MMAP_MIN_BYTES = mmap_min_bytes
+            with open(file_a, "wb") as fp:
+                fp.write(b"\x7fELF\x00\x00\n")
+            with self.assertRaises(SystemExit):
+                imediff.utils.read_lines(file_a)
+            # missing or unreadable files are not read as empty files
+            for path in [temp_dir, os.path.join(temp_dir, "missing")]:
+                with self.assertRaises(SystemExit):
+                    imediff.utils.read_lines(path)
+        return
+
+    def test_filelib_doctest(self):
+        result = subprocess.call(
+            "python3 " + doctest_dir + "/filelib.py",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
+    @unittest.skipIf(shutil.which("git") is None, "git is not available")
+    def test_gitime_auto(self):
+        env = dict(os.environ)
+        for name in ["GIT_AUTHOR", "GIT_COMMITTER"]:
+            env[name + "_NAME"] = "imediff"
+            env[name + "_EMAIL"] = "imediff@example.org"
+        # git-ime runs in the temporary repository, so use absolute paths
+        python_path = [os.path.abspath(os.path.dirname(doctest_dir))]
+        if "PYTHONPATH" in env:
+            for path in env["PYTHONPATH"].split(os.pathsep):
+                if path:
+                    python_path.append(os.path.abspath(path))
+        env["PYTHONPATH"] = os.pathsep.join(python_path)
+        with tempfile.TemporaryDirectory() as repo_dir:
+
+            def git(*args):
+                return subprocess.run(
+                    ["git"] + list(args),
+                    cwd=repo_dir,
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    check=True,
+                ).stdout.decode()
+
+            with open(os.path.join(repo_dir, "FILE"), "w") as fp:
+                fp.writelines("CONTENT {}\n".format(i) for i in range(40))
+            git("init", "-q")
+            git("add", ".")
+            git("commit", "-q", "-m", "initial")
+            with open(os.path.join(repo_dir, "FILE"), "w") as fp:
+                fp.writelines(
+                    "CONTENT {}\n".format("X" if i % 10 == 5 else i) for i in range(40)
+                )
+            git("commit", "-q", "-a", "-m", "data changed")
+            tree = git("rev-parse", "HEAD^{tree}")
+            result = subprocess.call(
+                ["python3", os.path.join(test_dir, "_git_ime.py"), "-a", "-q", "-n"],
+                cwd=repo_dir,
+                env=env,
+            )
+            self.assertEqual(result, 0)
+            self.assertEqual(
+                git("log", "--format=%s").split("\n")[:5],
+                ["FILE #4", "FILE #3", "FILE #2", "FILE #1", "initial"],
+            )
+            self.assertEqual(git("rev-parse", "HEAD^{tree}"), tree)
+            self.assertEqual(git("status", "--porcelain"), "")
+        return
+
+    def test_gitime_doctest(self):
+        result = subprocess.call(
+            "python3 " + doctest_dir + "/gitime.py",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
+    def test_main_importtime(self):
+        # git mergetool and git-ime start imediff many times, so importing
+        # imediff.main shouldn't load the TUI, curses nor NumPy
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import imediff.main"],
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0)
+        import_times = {}
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                import_times[fields[2].strip()] = int(fields[1])
+        print(
+            "I: import time of imediff.main = {} us".format(
+                import_times["imediff.main"]
+            )
+        )
+        for module in ["imediff.tui", "imediff.cli", "curses", "numpy"]:
+            self.assertNotIn(module, import_times)
+        # parsing options shouldn't load the line matchers
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; import imediff.main; "
+                "imediff.main.initialize_args(['file_a', 'file_b']); "
+                "print(' '.join(sorted(sys.modules)))",
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0)
+        modules = result.stdout.split()
+        self.assertIn("imediff.initialize_args", modules)
+        for module in ["imediff.diff2lib", "imediff.lines2lib"]:
+            self.assertNotIn(module, modules)
+        return
+
+    def test_initialize_args_jobs(self):
+        args = imediff.initialize_args.initialize_args(["-j", "2", "a", "b"])
+        self.assertEqual(args.jobs, 2)
+        for jobs in ["0", "-3", "x"]:
+            with self.assertRaises(SystemExit):
+                imediff.initialize_args.initialize_args(["-j", jobs, "a", "b"])
+        return
+
+    def test_initialize_confs_cache(self):
+        # XDG_CACHE_HOME is set to a temporary directory by setUp()
+        conf = os.path.join(self.cache_dir.name, "imediff.conf")
+        with open(conf, "w") as fp:
+            fp.write(
+                imediff.config.config_template.replace("select_a = a ", "select_a = z ")
+            )
+        cache_file = imediff.initialize_confs.get_cache_file(conf)
+        self.assertTrue(cache_file.startswith(self.cache_dir.name))
+        confs = imediff.initialize_confs.initialize_confs(conf)
+        self.assertTrue(os.path.exists(cache_file))
+        self.assertEqual(confs.kc["a"], "z")
+        self.assertEqual(confs.kc["A"], "Z")
+        self.assertEqual(confs.attrib["color_a"], ["GREEN", "BOLD"])
+        # compiled configuration from the cache
+        confs_cached = imediff.initialize_confs.initialize_confs(conf)
+        self.assertEqual(confs_cached, confs)
+        self.assertEqual(confs_cached.kc, confs.kc)
+        self.assertEqual(confs_cached.rkc, confs.rkc)
+        self.assertEqual(confs_cached.attrib, confs.attrib)
+        # updated configuration file
+        with open(conf, "a") as fp:
+            fp.write("# updated\n")
+        os.utime(conf, ns=(0, 0))
+        with open(cache_file) as fp:
+            cache = fp.read()
+        imediff.initialize_confs.initialize_confs(conf)
+        with open(cache_file) as fp:
+            self.assertNotEqual(fp.read(), cache)
+        return
+
+    def test_tui_virt_rows(self):
+        import imediff.tui
+
+        args, confs = init_args_confs(["-n", "-d", "-C", "none", "a", "b"])
+        list_a = ["1\n", "2\n", "3\n", "4\n"]
+        list_b = ["1\n", "x\n", "4\n"]
+        text_pad = imediff.tui.TextPad(list_a, list_b, None, args, confs)
+        text_pad.remap_chunk_virt()
+        # "2" -> "x" and "3" -> (none) are shown as 2 diff chunks
+        self.assertEqual(list(text_pad.chunk_to_virt), [0, 1, 6, 10])
+        self.assertEqual(text_pad.virt_row_max, 11)
+        self.assertEqual(
+            [text_pad.get_virt_to_chunk(v) for v in range(11)],
+            [
+                (0, 0, "="),
+                (1, 0, "d20"),
+                (1, 0, "a"),
+                (1, 0, "d21"),
+                (1, 0, "b"),
+                (1, 0, "d22"),
+                (2, 0, "d20"),
+                (2, 0, "a"),
+                (2, 0, "d21"),
+                (2, 0, "d22"),
+                (3, 0, "="),
+            ],
+        )
+        return
+
+    def test_tui_tutorial(self):
+        import imediff.tui
+
+        tutorial = imediff.tui.get_tutorial()
+        self.assertTrue(tutorial.startswith("Quick start:\n"))
+        self.assertIn("(ver. {})".format(imediff.__version__), tutorial)
+        return
+
+    def test_chunklib_doctest(self):
+        result = subprocess.call(
+            "python3 " + doctest_dir + "/chunklib.py",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
+    def test_diff2lib_doctest(self):
+        result = subprocess.call(
+            "python3 " + doctest_dir + "/diff2lib.py",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
     def test_lines2lib_doctest(self):
         result = subprocess.call(
             "python3 " + doctest_dir + "/lines2lib.py",
@@ -323,6 +1037,20 @@ class TestImediff(unittest.TestCase):
         self.assertEqual(result, 0)
         return
 
+    def test_imediff3_g_jobs(self):
+        result = subprocess.call(
+            "cd "
+            + test_dir
+            + ";python3 _imediff.py -l -g -j 2 -C none --macro=w -n file_a file_b file_c -o z_imediff3_g_jobs.out",
+            shell=True,
+        )
+        result = subprocess.call(
+            "cd " + test_dir + ";diff z_imediff3_g_jobs.out z_imediff3_g.ref >/dev/null",
+            shell=True,
+        )
+        self.assertEqual(result, 0)
+        return
+
     def tearDown(self):
         _ = subprocess.call("cd " + test_dir + ";rm -f z_*.out", shell=True)
         return